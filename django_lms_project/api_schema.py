@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    ".json": "application/json",
+    ".yaml": "application/yaml",
+}
+
+_lock = threading.Lock()
+# Формат -> (mtime файла или None, (содержимое, ETag)): перечитывается,
+# когда generate_api_schema пересобрал файл
+_schemas = {}
+
+
+def schema_path(fmt):
+    return settings.API_SCHEMA_DIR / f"schema-{settings.API_VERSION}{fmt}"
+
+
+def generate_schema():
+    """
+    Строит схему OpenAPI через drf_yasg.
+
+    Returns:
+        dict: формат -> bytes
+    """
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+    from drf_yasg.generators import OpenAPISchemaGenerator
+    from rest_framework.request import Request
+
+    from .urls_docs import API_INFO
+
+    # Запрос анонимного пользователя, как при открытии /swagger.json/,
+    # на разрешённый хост (иначе get_host() отклонит запрос)
+    host = next(
+        (host.lstrip(".") for host in settings.ALLOWED_HOSTS if host != "*"),
+        "localhost",
+    )
+    request = Request(RequestFactory().get("/swagger.json/", HTTP_HOST=host))
+    request.user = AnonymousUser()
+
+    generator = OpenAPISchemaGenerator(API_INFO, url=settings.API_BASE_URL or None)
+    schema = generator.get_schema(request=request, public=True)
+    if not settings.API_BASE_URL:
+        # Без адреса UI и клиенты используют хост, с которого загрузили схему
+        schema.pop("host", None)
+        schema.pop("schemes", None)
+
+    return {
+        ".json": OpenAPICodecJson(validators=[]).encode(schema),
+        ".yaml": OpenAPICodecYaml(validators=[]).encode(schema),
+    }
+
+
+def get_schema(fmt):
+    """
+    Содержимое и ETag схемы или None: из файла generate_api_schema, а если
+    его нет и документация включена - сгенерированная один раз в процессе.
+    Отсутствие схемы не кешируется: появившийся файл будет подхвачен.
+    """
+    mtime = schema_mtime(fmt)
+    cached = _schemas.get(fmt)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _lock:
+        cached = _schemas.get(fmt)
+        if cached is None or cached[0] != mtime:
+            schema = load_schema(fmt)
+            if schema is None:
+                return None
+            cached = _schemas[fmt] = (mtime, schema)
+    return cached[1]
+
+
+def schema_mtime(fmt):
+    try:
+        return schema_path(fmt).stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def load_schema(fmt):
+    path = schema_path(fmt)
+    if path.exists():
+        content = path.read_bytes()
+    elif settings.API_DOCS_ENABLED:
+        logger.warning(
+            "Нет файла %s - схема построена в процессе, "
+            "запустите manage.py generate_api_schema",
+            path,
+        )
+        content = generate_schema()[fmt]
+    else:
+        return None
+    return content, hashlib.sha256(content).hexdigest()[:32]
+
+
+def schema_etag(request, format):
+    schema = get_schema(format) if format in FORMATS else None
+    return schema and schema[1]
+
+
+@condition(etag_func=schema_etag)
+def schema_response(request, format):
+    schema = get_schema(format) if format in FORMATS else None
+    if schema is None:
+        raise Http404
+    return HttpResponse(schema[0], content_type=FORMATS[format])
+
+
+@require_safe
+def schema_view(request, format):
+    """
+    Схема OpenAPI из собранного файла: строгий ETag (304 при совпадении
+    If-None-Match) и кеширование на API_SCHEMA_MAX_AGE.
+    """
+    response = schema_response(request, format)
+    patch_cache_control(response, public=True, max_age=settings.API_SCHEMA_MAX_AGE)
+    return response
@@ -13,4 +13,22 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_lms_project.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    if scope["type"] != "lifespan":
+        return await django_application(scope, receive, send)
+
+    # Django не обрабатывает lifespan: завершение воркера uvicorn
+    # отмечается для метрик prometheus_client здесь
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            from services.metrics import mark_process_dead
+
+            mark_process_dead()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
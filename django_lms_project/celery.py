@@ -1,10 +1,101 @@
 import os
 
 from celery import Celery
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_postrun,
+    task_prerun,
+    task_retry,
+    worker_process_init,
+    worker_process_shutdown,
+)
 
 # Указываем правильный модуль настроек
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_lms_project.settings")
+# Проверки Django (check) при запуске воркера загружают весь URLconf с
+# представлениями; они уже выполняются при деплое веб-процесса (migrate)
+os.environ.setdefault("CELERY_SKIP_CHECKS", "1")
 
 app = Celery("django_lms_project")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
+
+
+@app.task(name="lms.queue_probe", bind=True)
+def queue_probe(self):
+    """
+    Пустая задача для замера задержки очереди (manage.py queue_latency --probe).
+    """
+    from services.queue_latency import task_latency
+
+    return task_latency(self)
+
+
+@before_task_publish.connect
+def stamp_published(**kwargs):
+    from services.queue_latency import stamp_published
+
+    stamp_published(**kwargs)
+
+
+@worker_process_init.connect
+def reset_db_connections(**kwargs):
+    # Воркер prefork не должен использовать соединения и пул родителя
+    from services.db_pool import reset_after_fork
+
+    reset_after_fork()
+
+
+@task_prerun.connect
+@task_postrun.connect
+def close_old_db_connections(task=None, **kwargs):
+    # Как на границах HTTP-запроса: закрыть устаревшие (CONN_MAX_AGE)
+    # и сломанные соединения и включить проверку перед следующей задачей
+    if task is not None and getattr(task.request, "is_eager", False):
+        return
+    from django.db import close_old_connections
+
+    close_old_connections()
+
+
+@task_prerun.connect
+def start_task_stats(**kwargs):
+    from services.task_stats import task_started
+
+    task_started(**kwargs)
+
+
+@task_failure.connect
+def record_task_failure(**kwargs):
+    from services.task_stats import task_failed
+
+    task_failed(**kwargs)
+
+
+@task_retry.connect
+def record_task_retry(**kwargs):
+    from services.task_stats import task_retried
+
+    task_retried(**kwargs)
+
+
+@task_postrun.connect
+def record_task_stats(**kwargs):
+    from services.task_stats import task_finished
+
+    task_finished(**kwargs)
+
+
+@worker_process_shutdown.connect
+def flush_task_stats(**kwargs):
+    from services.task_stats import flush
+
+    flush()
+
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(pid=None, **kwargs):
+    from services.metrics import mark_process_dead
+
+    mark_process_dead(pid)
@@ -7,6 +7,7 @@ from pathlib import Path
 
 from celery.schedules import crontab
 from dotenv import load_dotenv
+from kombu import Queue
 
 load_dotenv()
 
@@ -16,6 +17,9 @@ SECRET_KEY = os.getenv("SECRET_KEY", "django-insecure-fallback-key")
 DEBUG = os.getenv("DEBUG", "False") == "True"
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1").split(",")
 
+# Swagger UI и ReDoc (drf_yasg). Схема OpenAPI отдаётся из файла
+# manage.py generate_api_schema независимо от этого флага
+API_DOCS_ENABLED = os.getenv("API_DOCS_ENABLED", "True") == "True"
 
 INSTALLED_APPS = [
     "django.contrib.admin",
@@ -24,7 +28,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-    "drf_yasg",
+    *(["drf_yasg"] if API_DOCS_ENABLED else []),
     # Third party apps
     "rest_framework",
     "rest_framework_simplejwt",
@@ -37,11 +41,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "services.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "services.db_router.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -63,6 +69,8 @@ TEMPLATES = [
     },
 ]
 
+AUTHENTICATION_BACKENDS = ["users.backends.PooledModelBackend"]
+
 WSGI_APPLICATION = "django_lms_project.wsgi.application"
 
 
@@ -78,12 +86,85 @@ DATABASES = {
     }
 }
 
+# Соединения с БД: постоянные (CONN_MAX_AGE, проверка перед первым запросом
+# в цикле запроса) или пул psycopg3 на процесс (DB_POOL=True, нужен psycopg[pool]).
+# Под ASGI постоянные соединения не подходят: задайте DB_POOL=True
+# или DB_CONN_MAX_AGE=0
+DB_POOL = os.getenv("DB_POOL", "False") == "True"
+DATABASES["default"].update(
+    {
+        # Пул сам хранит соединения, постоянные соединения с ним несовместимы
+        "CONN_MAX_AGE": 0 if DB_POOL else int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
+        # PgBouncer в transaction mode: серверные курсоры (iterator()) живут
+        # дольше транзакции и ломаются. Prepared statements в psycopg3 Django
+        # и так отключает (prepare_threshold=None)
+        "DISABLE_SERVER_SIDE_CURSORS": os.getenv("DB_BOUNCER_TRANSACTION_MODE")
+        == "True",
+    }
+)
+if DB_POOL:
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+            # Сколько секунд ждать свободного соединения до ошибки
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        }
+    }
+
+# Реплики для чтения: DB_REPLICA_HOSTS=host1,host2:5433 (остальные
+# параметры - как у default). Читают с них GET-запросы API и сканы
+# в задачах, см. services/db_router.py
+for number, replica in enumerate(
+    filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")), 1
+):
+    host, _, port = replica.partition(":")
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["services.db_router.ReplicaRouter"]
+# Сколько секунд после записи пользователь читает только с основной БД
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 5))
+
 # Redis (для Celery)
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = os.getenv("REDIS_PORT", "6379")
 REDIS_DB = os.getenv("REDIS_DB", "0")
 REDIS_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
 
+# Кеш: Redis в docker-окружении, память процесса по умолчанию
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem")
+REDIS_CACHE_URL = os.getenv("REDIS_CACHE_URL", f"redis://{REDIS_HOST}:{REDIS_PORT}/1")
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.5))  # секунды
+if CACHE_BACKEND == "redis":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Многоуровневый кеш (services/tiered_cache.py): LRU процесса перед общим
+# кешем. Сброс локальных уровней на других узлах - через pub/sub Redis
+TIERED_CACHE_PUBSUB = (
+    os.getenv("TIERED_CACHE_PUBSUB", str(CACHE_BACKEND == "redis")) == "True"
+)
+TIERED_CACHE_LOCAL_SIZE = int(os.getenv("TIERED_CACHE_LOCAL_SIZE", 1024))
+TIERED_CACHE_LOCAL_TIMEOUT = int(os.getenv("TIERED_CACHE_LOCAL_TIMEOUT", 30))
+# Курс с уроками в кеше, секунды
+COURSE_CACHE_TIMEOUT = int(os.getenv("COURSE_CACHE_TIMEOUT", 600))
+
 # Celery settings
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL)
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", REDIS_URL)
@@ -91,12 +172,57 @@ CELERY_ACCEPT_CONTENT = ["application/json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "Europe/Moscow"
+# Celery закрывает соединения с БД после каждой задачи, если не задано,
+# через сколько задач это делать. Устаревшие и сломанные соединения
+# закрываются по CONN_MAX_AGE (django_lms_project/celery.py)
+CELERY_DB_REUSE_MAX = int(os.getenv("CELERY_DB_REUSE_MAX", 1000))
+
+# Очереди по классам нагрузки: рассылка писем не задерживает платежи
+# и обслуживание. Воркеры и их concurrency/prefetch - в docker-compose.yaml
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_QUEUES = [
+    Queue(name) for name in ("default", "notifications", "payments", "maintenance")
+]
+CELERY_TASK_ROUTES = {
+    "materials.tasks.send_course_update_email": {"queue": "notifications"},
+    "users.tasks.deactivate_inactive_users": {"queue": "maintenance"},
+    "users.tasks.clear_expired_idempotency_keys": {"queue": "maintenance"},
+    "users.tasks.clear_stale_uploads": {"queue": "maintenance"},
+    # Задачи платежей (объявлять с acks_late=True и идемпотентными)
+    "*payment*": {"queue": "payments"},
+}
+# Задачи с acks_late подтверждаются после выполнения: если воркер не
+# подтвердил задачу за это время, Redis выдаст её повторно
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "visibility_timeout": int(os.getenv("CELERY_VISIBILITY_TIMEOUT", 6 * 60 * 60))
+}
+
+# Статистика задач (manage.py celery_stats): последние TASK_STATS_SAMPLES
+# событий каждой задачи в Redis, без Redis - в файле SQLite узла
+TASK_STATS_BACKEND = os.getenv(
+    "TASK_STATS_BACKEND", "redis" if CACHE_BACKEND == "redis" else "sqlite"
+)
+TASK_STATS_SQLITE_PATH = os.getenv(
+    "TASK_STATS_SQLITE_PATH", str(BASE_DIR / "task_stats.sqlite3")
+)
+TASK_STATS_SAMPLES = int(os.getenv("TASK_STATS_SAMPLES", 1000))
+# Запись пачкой: по числу событий или раз в интервал, секунды
+TASK_STATS_FLUSH_SIZE = int(os.getenv("TASK_STATS_FLUSH_SIZE", 200))
+TASK_STATS_FLUSH_INTERVAL = float(os.getenv("TASK_STATS_FLUSH_INTERVAL", 2))
 
 CELERY_BEAT_SCHEDULE = {
     "deactivate-inactive-users-daily": {
         "task": "users.tasks.deactivate_inactive_users",
         "schedule": crontab(hour=0, minute=0),  # Каждый день в полночь
     },
+    "clear-expired-idempotency-keys-hourly": {
+        "task": "users.tasks.clear_expired_idempotency_keys",
+        "schedule": crontab(minute=30),  # Каждый час
+    },
+    "clear-stale-uploads-hourly": {
+        "task": "users.tasks.clear_stale_uploads",
+        "schedule": crontab(minute=45),  # Каждый час
+    },
 }
 
 # Password validation
@@ -131,43 +257,149 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Загрузка изображений через /api/uploads/ (services/uploads.py): файл
+# принимается потоком, формат и размеры проверяются по заголовку.
+# Больше IMAGE_UPLOAD_MAX_SIZE - 413 до чтения тела запроса
+IMAGE_UPLOAD_MAX_SIZE = int(os.getenv("IMAGE_UPLOAD_MAX_SIZE", 50 * 2**20))  # байт
+IMAGE_UPLOAD_MAX_PIXELS = int(os.getenv("IMAGE_UPLOAD_MAX_PIXELS", 50_000_000))
+# Максимум байт в одном PATCH докачки
+IMAGE_UPLOAD_CHUNK_MAX_SIZE = int(os.getenv("IMAGE_UPLOAD_CHUNK_MAX_SIZE", 8 * 2**20))
+# Каталог принятых файлов, общий для веб-процессов и воркеров Celery
+# (по умолчанию - MEDIA_ROOT/.uploads)
+UPLOAD_STAGING_DIR = os.getenv("UPLOAD_STAGING_DIR", "")
+# Незавершённые загрузки удаляются через, секунды
+UPLOAD_EXPIRE = int(os.getenv("UPLOAD_EXPIRE", 24 * 60 * 60))
+
 # Custom user model
 AUTH_USER_MODEL = "users.User"
 
 # DRF settings
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    # Лимиты действуют только для view с throttle_scope
+    "DEFAULT_THROTTLE_CLASSES": ["services.throttling.ScopedTokenBucketThrottle"],
+    # "<scope>" - на пользователя (для анонимов - на IP), "<scope>_ip" - на IP
+    "DEFAULT_THROTTLE_RATES": {
+        "login": os.getenv("THROTTLE_LOGIN", "20/min"),
+        "subscriptions": os.getenv("THROTTLE_SUBSCRIPTIONS", "60/min"),
+        "subscriptions_ip": os.getenv("THROTTLE_SUBSCRIPTIONS_IP", "300/min"),
+        "stripe_payments": os.getenv("THROTTLE_STRIPE_PAYMENTS", "10/min"),
+        "stripe_payments_ip": os.getenv("THROTTLE_STRIPE_PAYMENTS_IP", "60/min"),
+    },
 }
 
+# Хранилище лимитов: redis (Lua token bucket) или local (память процесса)
+THROTTLE_BACKEND = os.getenv(
+    "THROTTLE_BACKEND", "redis" if CACHE_BACKEND == "redis" else "local"
+)
+THROTTLE_LOCAL_MAX_KEYS = 10000
+# Сколько секунд не обращаться к Redis после ошибки соединения
+THROTTLE_REDIS_RETRY = int(os.getenv("THROTTLE_REDIS_RETRY", 30))
+
 from datetime import timedelta
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.LmsTokenObtainPairSerializer",
+    # По last_login блокируются неактивные (users.tasks.deactivate_inactive_users):
+    # refresh-токен живёт 7 дней, активный пользователь входит чаще, чем
+    # раз в INACTIVE_USER_DAYS
+    "UPDATE_LAST_LOGIN": True,
 }
 
+# Кеш пользователей для JWT-аутентификации
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv("AUTH_USER_CACHE_TIMEOUT", 300))
+AUTH_USER_LOCAL_CACHE_TIMEOUT = int(os.getenv("AUTH_USER_LOCAL_CACHE_TIMEOUT", 10))
+AUTH_USER_LOCAL_CACHE_SIZE = 1024
+# Роль модератора берётся из claim токена (смена групп вступит в силу
+# только после перевыпуска токена)
+AUTH_STATELESS_ROLES = os.getenv("AUTH_STATELESS_ROLES", "False") == "True"
+
+# Схема OpenAPI: файл openapi/schema-<API_VERSION>.json|yaml собирается
+# при деплое, отдаётся с ETag и Cache-Control: max-age
+API_VERSION = "v1"
+API_SCHEMA_DIR = BASE_DIR / "openapi"
+API_SCHEMA_MAX_AGE = int(os.getenv("API_SCHEMA_MAX_AGE", 60 * 60))
+# Адрес API в схеме (host/schemes); пусто - хост, с которого загружена схема
+API_BASE_URL = os.getenv("API_BASE_URL", "")
+
+# Бюджет времени импорта при холодном запуске веб-процесса и воркера Celery
+# (manage.py measure_startup, тест в users/tests.py), секунды
+STARTUP_IMPORT_BUDGET = float(os.getenv("STARTUP_IMPORT_BUDGET", 1.5))
+
+# Метрики Prometheus (/metrics). При нескольких процессах (uvicorn --workers,
+# Celery prefork) задайте PROMETHEUS_MULTIPROC_DIR - свой каталог каждому
+# сервису; /metrics суммирует все файлы под METRICS_AGGREGATE_DIR
+METRICS_AGGREGATE_DIR = os.getenv("METRICS_AGGREGATE_DIR", "")
+# Токен для заголовка Authorization: Bearer; пусто - /metrics доступен
+# только с DEBUG
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 # DRF-YASG Settings
 SWAGGER_SETTINGS = {
     "SECURITY_DEFINITIONS": {
         "Bearer": {"type": "apiKey", "name": "Authorization", "in": "header"}
     },
     "USE_SESSION_AUTH": False,
+    # UI загружает собранную схему, а не строит её на каждый запрос
+    "SPEC_URL": "/swagger.json/",
 }
 
 REDOC_SETTINGS = {
     "LAZY_RENDERING": False,
+    "SPEC_URL": "/swagger.json/",
 }
 
 # Stripe settings
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY")
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 
+# Блокировка неактивных пользователей (users.tasks.deactivate_inactive_users)
+INACTIVE_USER_DAYS = 30
+DEACTIVATION_BATCH_SIZE = int(os.getenv("DEACTIVATION_BATCH_SIZE", 1000))
+DEACTIVATION_BATCH_PAUSE = float(os.getenv("DEACTIVATION_BATCH_PAUSE", 0.1))  # секунды
+
+# Idempotency-Key для создания платежей
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))  # секунды
+# Сколько дубликат ждёт завершения первого запроса, прежде чем получить
+# 409 с Retry-After (ожидание занимает воркер), секунды
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", 0.5))
+IDEMPOTENCY_RETRY_AFTER = int(os.getenv("IDEMPOTENCY_RETRY_AFTER", 1))
+# Срок, за который первый запрос с ключом должен завершиться; запись
+# запроса, упавшего без ответа, повтор перехватывает после него, секунды
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", 120))
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+
+# История платежей в профиле пользователя
+PAYMENT_HISTORY_LIMIT = 10
+# Кеш истории платежей, секунды (0 - выключен; включать только с общим кешем)
+PAYMENT_HISTORY_CACHE_TIMEOUT = int(os.getenv("PAYMENT_HISTORY_CACHE_TIMEOUT", 0))
+
+# Выгрузка платежей: строк на одну выборку серверного курсора
+PAYMENT_EXPORT_CHUNK_SIZE = int(os.getenv("PAYMENT_EXPORT_CHUNK_SIZE", 2000))
+
+# Поиск пользователей в админке и staff API: путь к классу бэкенда,
+# по умолчанию - по СУБД (pg_trgm в PostgreSQL, по началу строки в SQLite)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "")
+
+# Админка: точный COUNT(*) только для списков меньше этой оценки
+ADMIN_EXACT_COUNT_LIMIT = int(os.getenv("ADMIN_EXACT_COUNT_LIMIT", 100000))
+
+# Хеширование паролей в отдельном пуле: thread или process
+PASSWORD_HASHING_EXECUTOR = os.getenv("PASSWORD_HASHING_EXECUTOR", "thread")
+PASSWORD_HASHING_WORKERS = int(
+    os.getenv("PASSWORD_HASHING_WORKERS", min(4, os.cpu_count() or 1))
+)
+# Сколько запросов может ждать свободного воркера, остальные получают 503
+PASSWORD_HASHING_QUEUE = int(os.getenv("PASSWORD_HASHING_QUEUE", 32))
+
 # Email settings
 EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_PORT = os.getenv("EMAIL_PORT", 465)
@@ -2,44 +2,27 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path, re_path
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
-from rest_framework import permissions
 from rest_framework.routers import DefaultRouter
 
+from django_lms_project.api_schema import schema_view
 from materials.views import CourseViewSet
-from users.views import PaymentViewSet, UserViewSet
-
-# Документация
-schema_view = get_schema_view(
-    openapi.Info(
-        title="LMS API",
-        default_version="v1",
-        description="API для системы управления обучением",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="contact@lms.local"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
+from services.views import (
+    CacheStatsAPIView,
+    DatabasePoolStatsAPIView,
+    metrics_view,
 )
+from users.views import PaymentViewSet, UploadViewSet, UserViewSet
+from users.views_async import AsyncMeView
 
 router = DefaultRouter()
 router.register(r"users", UserViewSet)
 router.register(r"courses", CourseViewSet)
 router.register(r"payments", PaymentViewSet)
+router.register(r"uploads", UploadViewSet, basename="upload")
 
 urlpatterns = [
-    # Документация
-    path(
-        "swagger<format>/", schema_view.without_ui(cache_timeout=0), name="schema-json"
-    ),
-    path(
-        "swagger/",
-        schema_view.with_ui("swagger", cache_timeout=0),
-        name="schema-swagger-ui",
-    ),
-    path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"),
+    # Схема OpenAPI из файла manage.py generate_api_schema
+    path("swagger<format>/", schema_view, name="schema-json"),
     path("admin/", admin.site.urls),
     # API
     path("api/", include(router.urls)),
@@ -48,7 +31,23 @@ urlpatterns = [
         "api/subscriptions/", include("materials.urls_subscriptions")
     ),  # подписки (новый файл)
     path("api/auth/", include("users.urls")),
+    # Асинхронное чтение (под ASGI)
+    path("api/async/", include("materials.urls_async")),
+    path("api/async/users/me/", AsyncMeView.as_view(), name="async-user-me"),
+    # Служебное
+    path(
+        "api/internal/db-pool/",
+        DatabasePoolStatsAPIView.as_view(),
+        name="db-pool-stats",
+    ),
+    path("api/internal/cache/", CacheStatsAPIView.as_view(), name="cache-stats"),
+    # Метрики Prometheus
+    path("metrics", metrics_view, name="metrics"),
 ]
 
+# Swagger UI и ReDoc (drf_yasg загружается только здесь)
+if settings.API_DOCS_ENABLED:
+    urlpatterns += [path("", include("django_lms_project.urls_docs"))]
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
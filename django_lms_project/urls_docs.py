@@ -0,0 +1,48 @@
+"""
+Swagger UI и ReDoc. Подключаются только при API_DOCS_ENABLED, а
+drf_yasg.views (генератор, рендереры, валидаторы схемы) загружается
+при первом открытии страницы, а не при запуске процесса.
+"""
+
+from functools import cache
+
+from django.conf import settings
+from django.urls import path
+from drf_yasg import openapi
+from rest_framework import permissions
+
+API_INFO = openapi.Info(
+    title="LMS API",
+    default_version=settings.API_VERSION,
+    description="API для системы управления обучением",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="contact@lms.local"),
+    license=openapi.License(name="BSD License"),
+)
+
+
+@cache
+def ui_view(renderer):
+    from drf_yasg.views import get_schema_view
+
+    schema_view = get_schema_view(
+        API_INFO,
+        public=True,
+        permission_classes=(permissions.AllowAny,),
+    )
+    # Страницы UI не строят схему (загружают её по SPEC_URL), поэтому кешируются
+    return schema_view.with_ui(renderer, cache_timeout=60 * 60)
+
+
+def swagger_ui(request, *args, **kwargs):
+    return ui_view("swagger")(request, *args, **kwargs)
+
+
+def redoc_ui(request, *args, **kwargs):
+    return ui_view("redoc")(request, *args, **kwargs)
+
+
+urlpatterns = [
+    path("swagger/", swagger_ui, name="schema-swagger-ui"),
+    path("redoc/", redoc_ui, name="schema-redoc"),
+]
@@ -0,0 +1,11 @@
+#!/bin/sh
+# prometheus_client в многопроцессном режиме требует пустой каталог на
+# каждый запуск: файлы значений прошлого запуска (*_<pid>.db) на общем
+# томе иначе суммировались бы в /metrics бесконечно. Каталог - свой
+# у каждого сервиса, поэтому очищается только он.
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+exec "$@"
@@ -1,22 +1,92 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.forms.models import BaseInlineFormSet
+from django.http import QueryDict
 
-from .models import Course, Lesson
+from users.admin_filters import related_id_filter
+from users.paginators import EstimatedCountPaginator
+
+from .models import Course, Lesson, Subscription
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """
+    Формсет inline, который показывает одну страницу связанных объектов
+    (?<page_param>=N), а не все уроки курса сразу.
+    """
+
+    per_page = 20
+    page_param = "inline_page"
+    request = None
+
+    def get_queryset(self):
+        if not hasattr(self, "_paginated_queryset"):
+            paginator = Paginator(super().get_queryset(), self.per_page)
+            number = self.request.GET.get(self.page_param) if self.request else None
+            self.page = paginator.get_page(number)
+            self._paginated_queryset = self.page.object_list
+        return self._paginated_queryset
+
+    def page_links(self):
+        """
+        Ссылки на страницы вокруг текущей (с многоточиями): (номер, query
+        string) с остальными параметрами запроса, в том числе фильтрами
+        списка админки (_changelist_filters). У многоточия query - None.
+        """
+        params = self.request.GET.copy() if self.request else QueryDict(mutable=True)
+        links = []
+        for number in self.page.paginator.get_elided_page_range(self.page.number):
+            if number == Paginator.ELLIPSIS:
+                links.append((number, None))
+                continue
+            params[self.page_param] = number
+            links.append((number, params.urlencode()))
+        return links
 
 
 class LessonInline(admin.TabularInline):
     model = Lesson
     extra = 1
+    formset = PaginatedInlineFormSet
+    template = "admin/edit_inline/tabular_paginated.html"
+    raw_id_fields = ("owner",)
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.request = request
+        formset.page_param = "lessons_page"
+        return formset
 
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
     list_display = ("title", "description", "created_at", "updated_at")
     search_fields = ("title", "description")
+    autocomplete_fields = ("owner",)
     inlines = [LessonInline]
 
 
 @admin.register(Lesson)
 class LessonAdmin(admin.ModelAdmin):
     list_display = ("title", "description", "course", "owner")
-    list_filter = ("course",)
+    list_select_related = ("course", "owner")
+    list_filter = (related_id_filter("course", "курсу"),)
     search_fields = ("title", "description")
+    autocomplete_fields = ("course", "owner")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Subscription)
+class SubscriptionAdmin(admin.ModelAdmin):
+    list_display = ("user", "course", "created_at")
+    # __str__ подписки обращается к user и course
+    list_select_related = ("user", "course")
+    list_filter = (
+        related_id_filter("course", "курсу"),
+        related_id_filter("user", "пользователю"),
+    )
+    search_fields = ("=user__email",)
+    autocomplete_fields = ("user", "course")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
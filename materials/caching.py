@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+
+from services.db_router import primary_reads
+from services.images import variant_urls_absolute
+from services.tiered_cache import TieredCache
+
+from .models import Course, Subscription
+from .serializers import CourseSerializer, with_course_details
+
+# Курс с уроками - общий для всех пользователей (без is_subscribed)
+course_cache = TieredCache("course", version=2, timeout=settings.COURSE_CACHE_TIMEOUT)
+# id курсов, на которые подписан пользователь
+subscription_cache = TieredCache("subscriptions")
+
+
+def course_payload(course_id):
+    """
+    Данные CourseSerializer без is_subscribed или None, если курса нет.
+    Ссылки на файлы - относительные (см. absolute_media_urls).
+    Кеш заполняется с основной БД: сброс после записи не помогает, если
+    следующий запрос тут же перечитает старые данные с реплики.
+    """
+
+    def load():
+        with primary_reads():
+            queryset = with_course_details(
+                Course.objects.filter(pk=course_id), AnonymousUser()
+            )
+            course = queryset.first()
+            if course is None:
+                return None
+            data = dict(CourseSerializer(course).data)
+        del data["is_subscribed"]
+        data["lessons"] = [dict(lesson) for lesson in data["lessons"]]
+        return data
+
+    return course_cache.get_or_set(course_id, load)
+
+
+def subscribed_course_ids(user_id):
+    def load():
+        with primary_reads():
+            return frozenset(
+                Subscription.objects.filter(user_id=user_id).values_list(
+                    "course_id", flat=True
+                )
+            )
+
+    return subscription_cache.get_or_set(user_id, load)
+
+
+def absolute_media_urls(data, request):
+    """
+    Копия данных курса с абсолютными ссылками на превью и его копии, как у
+    сериализатора с request в контексте.
+    """
+
+    def absolute(item):
+        item = {
+            **item,
+            "preview_variants": variant_urls_absolute(
+                item["preview_variants"], request
+            ),
+        }
+        if item.get("preview"):
+            item["preview"] = request.build_absolute_uri(item["preview"])
+        return item
+
+    return {
+        **absolute(data),
+        "lessons": [absolute(lesson) for lesson in data["lessons"]],
+    }
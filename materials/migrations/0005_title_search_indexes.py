@@ -0,0 +1,48 @@
+from django.db import migrations
+
+SEARCH_TABLES = ("materials_course", "materials_lesson")
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    Индексы под поиск платежей в админке по названию курса и урока:
+    pg_trgm GIN по UPPER(title) в PostgreSQL (icontains)
+    и префиксный индекс COLLATE NOCASE в SQLite (istartswith).
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for table in SEARCH_TABLES:
+            schema_editor.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {table}_title_trgm_idx "
+                f'ON {table} USING gin (UPPER("title"::text) gin_trgm_ops)'
+            )
+    elif vendor == "sqlite":
+        for table in SEARCH_TABLES:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_title_prefix_idx "
+                f'ON {table} ("title" COLLATE NOCASE)'
+            )
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in SEARCH_TABLES:
+        if vendor == "postgresql":
+            schema_editor.execute(
+                f"DROP INDEX CONCURRENTLY IF EXISTS {table}_title_trgm_idx"
+            )
+        elif vendor == "sqlite":
+            schema_editor.execute(f"DROP INDEX IF EXISTS {table}_title_prefix_idx")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("materials", "0004_subscription"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -10,6 +10,10 @@ class Course(models.Model):
     preview = models.ImageField(
         upload_to="courses/", null=True, blank=True, verbose_name="Превью"
     )
+    # Уменьшенные копии превью (services/images.py), создаются задачей Celery
+    preview_variants = models.JSONField(
+        default=dict, blank=True, editable=False, verbose_name="Копии превью"
+    )
     description = models.TextField(verbose_name="Описание")
 
     owner = models.ForeignKey(
@@ -38,6 +42,9 @@ class Lesson(models.Model):
     preview = models.ImageField(
         upload_to="lessons/", null=True, blank=True, verbose_name="Превью"
     )
+    preview_variants = models.JSONField(
+        default=dict, blank=True, editable=False, verbose_name="Копии превью"
+    )
     video_link = models.URLField(
         verbose_name="Ссылка на видео",
         validators=[validate_youtube_only],  # добавь валидатор здесь
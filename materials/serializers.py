@@ -1,9 +1,31 @@
+from django.db.models import BooleanField, Count, Exists, OuterRef, Value
 from rest_framework import serializers
 
+from services.images import ImageVariantsField
+
 from .models import Course, Lesson, Subscription
 
 
+def with_course_details(queryset, user):
+    """
+    Загружает всё, что нужно CourseSerializer, без запросов на каждый курс:
+    уроки (prefetch), их количество и подписку пользователя (аннотации).
+    """
+    if user.is_authenticated:
+        is_subscribed = Exists(
+            Subscription.objects.filter(user=user, course=OuterRef("pk"))
+        )
+    else:
+        is_subscribed = Value(False, output_field=BooleanField())
+    return queryset.prefetch_related("lessons").annotate(
+        annotated_lessons_count=Count("lessons", distinct=True),
+        annotated_is_subscribed=is_subscribed,
+    )
+
+
 class LessonSerializer(serializers.ModelSerializer):
+    preview_variants = ImageVariantsField()
+
     class Meta:
         model = Lesson
         fields = "__all__"
@@ -13,6 +35,7 @@ class CourseSerializer(serializers.ModelSerializer):
     lessons_count = serializers.SerializerMethodField()
     lessons = LessonSerializer(many=True, read_only=True)
     is_subscribed = serializers.SerializerMethodField()  # добавляем это поле
+    preview_variants = ImageVariantsField()
 
     class Meta:
         model = Course
@@ -20,6 +43,7 @@ class CourseSerializer(serializers.ModelSerializer):
             "id",
             "title",
             "preview",
+            "preview_variants",
             "description",
             "created_at",
             "updated_at",
@@ -31,12 +55,17 @@ class CourseSerializer(serializers.ModelSerializer):
         read_only_fields = ["owner", "created_at", "updated_at"]
 
     def get_lessons_count(self, obj):
-        return obj.lessons.count()
+        count = getattr(obj, "annotated_lessons_count", None)
+        return obj.lessons.count() if count is None else count
 
     def get_is_subscribed(self, obj):
         """
         Проверяем, подписан ли текущий пользователь на этот курс.
         """
+        subscribed = getattr(obj, "annotated_is_subscribed", None)
+        if subscribed is not None:
+            return subscribed
+
         request = self.context.get("request")
         if request and request.user.is_authenticated:
             return Subscription.objects.filter(user=request.user, course=obj).exists()
@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from services.images import needs_variants
+
+from .caching import course_cache, subscription_cache
+from .models import Course, Lesson, Subscription
+
+
+def invalidate_on_commit(tiered_cache, *keys):
+    """
+    Сброс сразу и ещё раз после коммита: внутри транзакции (форма админки
+    с inline уроков) параллельный запрос может закешировать данные до
+    их фиксации.
+    """
+    tiered_cache.invalidate(*keys)
+    transaction.on_commit(lambda: tiered_cache.invalidate(*keys))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course(sender, instance, **kwargs):
+    invalidate_on_commit(course_cache, instance.pk)
+
+
+@receiver(pre_save, sender=Lesson)
+def remember_lesson_course(sender, instance, **kwargs):
+    """
+    Запоминаем прежний курс урока: при переносе сбрасываются оба курса.
+    """
+    if instance.pk is None:
+        instance._previous_course_id = None
+        return
+    instance._previous_course_id = (
+        Lesson.objects.filter(pk=instance.pk)
+        .values_list("course_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_lesson_course(sender, instance, **kwargs):
+    course_ids = {instance.course_id, getattr(instance, "_previous_course_id", None)}
+    invalidate_on_commit(
+        course_cache, *(course_id for course_id in course_ids if course_id)
+    )
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_subscriptions(sender, instance, **kwargs):
+    invalidate_on_commit(subscription_cache, instance.user_id)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Lesson)
+def schedule_preview_variants(sender, instance, update_fields=None, **kwargs):
+    """
+    Новое или изменённое превью - копии создаёт задача после коммита.
+    """
+    if needs_variants(instance, "preview", update_fields):
+        from .tasks import generate_preview_variants
+
+        model_name = sender._meta.model_name
+        transaction.on_commit(
+            lambda: generate_preview_variants.delay(model_name, instance.pk)
+        )
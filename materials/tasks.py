@@ -11,8 +11,15 @@ from celery import shared_task
 from django.conf import settings
 from django.core.mail import send_mail
 
+from services.images import update_variants
+from services.metrics import EMAIL_ERRORS, EMAIL_LATENCY, timed
 
-@shared_task
+from .caching import course_cache
+from .models import Course, Lesson
+
+
+@shared_task(ignore_result=True)
+@timed(EMAIL_LATENCY, EMAIL_ERRORS)
 def send_course_update_email(course_title, user_email):
     subject = f"Курс обновлён: {course_title}"
     message = f'Курс "{course_title}" был обновлён. Заходи и смотри!'
@@ -23,3 +30,15 @@ def send_course_update_email(course_title, user_email):
         [user_email],
         fail_silently=False,
     )
+
+
+@shared_task(ignore_result=True)
+def generate_preview_variants(model_name, pk, force=False):
+    """
+    Уменьшенные копии превью курса или урока (model_name: course, lesson).
+    """
+    model = {"course": Course, "lesson": Lesson}[model_name]
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not update_variants(instance, "preview", force=force):
+        return
+    course_cache.invalidate(instance.pk if model is Course else instance.course_id)
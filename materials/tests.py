@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 
 from .models import Course, Lesson, Subscription
 
@@ -249,3 +250,438 @@ class SubscriptionTestCase(APITestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CourseAdminTestCase(APITestCase):
+    """
+    Тесты страницы курса в админке.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin@example.com", "adminpass")
+        self.course = Course.objects.create(title="Курс", description="Описание")
+        Lesson.objects.bulk_create(
+            Lesson(
+                title=f"Урок {i}",
+                description="",
+                video_link="https://www.youtube.com/watch?v=test",
+                course=self.course,
+            )
+            for i in range(25)
+        )
+        self.client.force_login(self.admin)
+
+    def test_lessons_inline_paginated(self):
+        """
+        Тест: inline уроков показывает одну страницу.
+        """
+        url = reverse("admin:materials_course_change", args=[self.course.pk])
+
+        response = self.client.get(url)
+        formset = response.context["inline_admin_formsets"][0].formset
+        self.assertEqual(formset.initial_form_count(), 20)
+
+        response = self.client.get(url, {"lessons_page": 2})
+        formset = response.context["inline_admin_formsets"][0].formset
+        self.assertEqual(formset.initial_form_count(), 5)
+        self.assertContains(response, "25 Уроки")
+
+    def test_inline_page_links_keep_filters(self):
+        """
+        Тест: ссылки на страницы сохраняют фильтры списка и не выводятся
+        для каждой страницы.
+        """
+        from unittest import mock
+
+        from materials.admin import PaginatedInlineFormSet
+
+        url = reverse("admin:materials_course_change", args=[self.course.pk])
+        with mock.patch.object(PaginatedInlineFormSet, "per_page", 1):
+            response = self.client.get(
+                url, {"_changelist_filters": "q=abc", "lessons_page": 12}
+            )
+        links = response.context["inline_admin_formsets"][0].formset.page_links()
+        self.assertLess(len(links), 15)
+        self.assertIn(("…", None), links)
+        self.assertContains(
+            response, 'href="?_changelist_filters=q%3Dabc&amp;lessons_page=13"'
+        )
+
+
+class AsyncMaterialsTestCase(APITestCase):
+    """
+    Тесты асинхронных эндпоинтов чтения курсов и уроков.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create(email="async_owner@example.com")
+        self.other_user = User.objects.create(email="async_other@example.com")
+        self.course = Course.objects.create(
+            title="Курс", description="Описание", owner=self.owner
+        )
+        self.other_course = Course.objects.create(
+            title="Чужой курс", description="", owner=self.other_user
+        )
+        self.lesson = Lesson.objects.create(
+            title="Урок",
+            description="",
+            video_link="https://www.youtube.com/watch?v=test",
+            course=self.course,
+            owner=self.owner,
+        )
+        Subscription.objects.create(user=self.owner, course=self.course)
+        token = RefreshToken.for_user(self.owner).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_course_list_matches_sync(self):
+        """
+        Тест: async-список курсов совпадает с ответом sync API.
+        """
+        response = self.client.get(reverse("async-course-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["count"], 1)
+        self.assertEqual(data["results"][0]["lessons_count"], 1)
+        self.assertTrue(data["results"][0]["is_subscribed"])
+
+        sync_data = self.client.get(reverse("course-list")).json()
+        self.assertEqual(data, sync_data)
+
+    def test_course_detail_scoped_to_owner(self):
+        """
+        Тест: чужой курс недоступен.
+        """
+        url = reverse("async-course-detail", args=[self.course.pk])
+        self.assertEqual(self.client.get(url).json()["title"], "Курс")
+        url = reverse("async-course-detail", args=[self.other_course.pk])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_lessons(self):
+        """
+        Тест async-списка и детали уроков.
+        """
+        data = self.client.get(reverse("async-lesson-list"), {"page_size": 1}).json()
+        self.assertEqual([lesson["id"] for lesson in data["results"]], [self.lesson.pk])
+        url = reverse("async-lesson-detail", args=[self.lesson.pk])
+        self.assertEqual(self.client.get(url).json()["title"], "Урок")
+
+    def test_requires_token(self):
+        """
+        Тест: без токена - 401.
+        """
+        self.client.credentials()
+        response = self.client.get(reverse("async-course-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("Bearer", response["WWW-Authenticate"])
+
+
+class CourseCacheTestCase(APITestCase):
+    """
+    Тесты кеширования страницы курса.
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.owner = User.objects.create(email="cache_owner@example.com")
+        self.other_user = User.objects.create(email="cache_other@example.com")
+        self.course = Course.objects.create(
+            title="Курс", description="Описание", owner=self.owner
+        )
+        self.lesson = Lesson.objects.create(
+            title="Урок",
+            description="",
+            video_link="https://www.youtube.com/watch?v=test",
+            course=self.course,
+            owner=self.owner,
+        )
+        self.url = reverse("course-detail", args=[self.course.pk])
+        self.client.force_authenticate(user=self.owner)
+
+    def test_detail_served_from_cache(self):
+        """
+        Тест: повторный запрос не загружает курс и уроки из БД.
+        """
+        from services.tiered_cache import cache_stats
+
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["lessons_count"], 1)
+        self.assertFalse(first.data["is_subscribed"])
+
+        hits = cache_stats()["course"]["local_hits"]
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(cache_stats()["course"]["local_hits"], hits + 1)
+
+    def test_invalidated_by_signals(self):
+        """
+        Тест: изменение урока и подписка сразу видны на странице курса.
+        """
+        self.client.get(self.url)
+
+        self.lesson.title = "Новый урок"
+        self.lesson.save()
+        Subscription.objects.create(user=self.owner, course=self.course)
+
+        data = self.client.get(self.url).data
+        self.assertEqual(data["lessons"][0]["title"], "Новый урок")
+        self.assertTrue(data["is_subscribed"])
+
+        self.lesson.delete()
+        self.assertEqual(self.client.get(self.url).data["lessons_count"], 0)
+
+    def test_invalidated_after_commit(self):
+        """
+        Тест: курс сбрасывается из кеша и после коммита - данные,
+        закешированные параллельным запросом до коммита, не остаются.
+        """
+        from materials.caching import course_cache
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lesson.title = "Новый урок"
+            self.lesson.save()
+            # Параллельный запрос до коммита читает прежний урок
+            self.client.get(self.url)
+            self.assertIn(self.course.pk, course_cache.get_many([self.course.pk]))
+        self.assertEqual(course_cache.get_many([self.course.pk]), {})
+
+    def test_scope(self):
+        """
+        Тест: закешированный курс не виден другому пользователю.
+        """
+        self.client.get(self.url)
+        self.client.force_authenticate(user=self.other_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse("course-detail", args=[9999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filled_from_primary(self):
+        """
+        Тест: кеш курса заполняется с основной БД, даже когда чтения
+        разрешены с реплики.
+        """
+        from django.test import override_settings
+
+        from materials.caching import course_payload, subscribed_course_ids
+        from services.db_router import replica_reads
+
+        Subscription.objects.create(user=self.owner, course=self.course)
+        # Реплики "replica" нет среди DATABASES: чтение с неё упало бы
+        with override_settings(DATABASE_REPLICAS=["replica"]), replica_reads():
+            self.assertEqual(course_payload(self.course.pk)["lessons_count"], 1)
+            self.assertEqual(
+                subscribed_course_ids(self.owner.pk), frozenset([self.course.pk])
+            )
+
+
+class TieredCacheTestCase(APITestCase):
+    """
+    Тесты многоуровневого кеша.
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        from services.tiered_cache import TieredCache
+
+        cache.clear()
+        self.cache = TieredCache("test", timeout=60)
+
+    def test_single_flight(self):
+        """
+        Тест: при одновременных промахах значение вычисляется один раз.
+        """
+        import threading
+        import time
+
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "value"
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(self.cache.get_or_set("key", compute))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ["value"] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_invalidation_message_from_other_node(self):
+        """
+        Тест: сообщение с другого узла сбрасывает локальный уровень.
+        """
+        import json
+
+        from django.core.cache import cache
+
+        from services.tiered_cache import handle_message
+
+        self.cache.get_or_set("key", lambda: 1)
+        full_key = self.cache.make_key("key")
+        # На другом узле значение уже изменено в общем кеше
+        cache.delete(full_key)
+        self.assertEqual(self.cache.get_or_set("key", lambda: 2), 1)
+
+        handle_message(json.dumps({"namespace": "test", "keys": [full_key]}))
+        self.assertEqual(self.cache.get_or_set("key", lambda: 2), 2)
+
+    def test_invalidate_all(self):
+        """
+        Тест: сброс пространства имён меняет версию ключей.
+        """
+        self.cache.get_or_set("key", lambda: 1)
+        key = self.cache.make_key("key")
+        self.cache.invalidate_all()
+        self.assertNotEqual(self.cache.make_key("key"), key)
+        self.assertEqual(self.cache.get_or_set("key", lambda: 2), 2)
+
+
+class ImageVariantsTestCase(APITestCase):
+    """
+    Тесты уменьшенных копий превью.
+    """
+
+    def setUp(self):
+        import tempfile
+
+        from django.core.cache import cache
+        from django.test import override_settings
+
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.owner = User.objects.create(email="images_owner@example.com")
+        self.client.force_authenticate(user=self.owner)
+
+    def upload(self, name, size):
+        from io import BytesIO
+
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new("RGB", size, "red").save(buffer, "PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+    def create_course(self):
+        from unittest import mock
+
+        with mock.patch(
+            "materials.tasks.generate_preview_variants.delay"
+        ) as delay, self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(
+                title="Курс",
+                description="",
+                owner=self.owner,
+                preview=self.upload("photo.png", (2400, 1200)),
+            )
+        delay.assert_called_once_with("course", course.pk)
+        return course
+
+    def test_variants_generated_and_served(self):
+        """
+        Тест: копии всех размеров в WebP и JPEG, ссылки в ответе API.
+        """
+        from django.core.files.storage import default_storage
+        from PIL import Image
+
+        from .tasks import generate_preview_variants
+
+        course = self.create_course()
+        url = reverse("course-detail", args=[course.pk])
+        self.assertEqual(self.client.get(url).data["preview_variants"], {})
+
+        generate_preview_variants("course", course.pk)
+        course.refresh_from_db()
+        self.assertEqual(course.preview_variants["source"], course.preview.name)
+        expected = {"thumbnail": (160, 160), "card": (640, 360), "full": (1920, 960)}
+        for variant, size in expected.items():
+            for fmt, name in course.preview_variants[variant].items():
+                with default_storage.open(name) as file, Image.open(file) as image:
+                    self.assertEqual(image.size, size)
+                    self.assertEqual(image.format, fmt.upper())
+
+        # Кеш страницы курса сброшен задачей
+        response = self.client.get(url)
+        card = response.data["preview_variants"]["card"]
+        self.assertTrue(card["webp"].startswith("http://testserver/media/courses/"))
+        self.assertTrue(card["jpeg"].endswith(".card.jpg"))
+        response = self.client.get(reverse("course-list"))
+        self.assertEqual(response.data["results"][0]["preview_variants"]["card"], card)
+
+    def test_replaced_preview(self):
+        """
+        Тест: при замене превью копии пересоздаются, старые удаляются.
+        """
+        from django.core.files.storage import default_storage
+
+        from services.images import update_variants
+
+        course = self.create_course()
+        update_variants(course, "preview")
+        old = course.preview_variants["thumbnail"]["webp"]
+
+        course.preview = self.upload("new.png", (100, 100))
+        course.save()
+        self.assertTrue(update_variants(course, "preview"))
+        self.assertFalse(default_storage.exists(old))
+        self.assertIn("new.thumbnail", course.preview_variants["thumbnail"]["webp"])
+        self.assertFalse(update_variants(course, "preview"))
+
+    def test_regenerate_command(self):
+        """
+        Тест: команда обрабатывает только объекты без актуальных копий.
+        """
+        from concurrent.futures import Future
+        from io import StringIO
+        from unittest import mock
+
+        from django.core.management import call_command
+
+        class InlineExecutor:
+            # Тестовая БД в памяти недоступна дочерним процессам
+            def __init__(self, max_workers, initializer):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                return False
+
+            def submit(self, fn, *args):
+                future = Future()
+                future.set_result(fn(*args))
+                return future
+
+        course = self.create_course()
+        command = "users.management.commands.regenerate_image_variants"
+        with mock.patch(f"{command}.ProcessPoolExecutor", InlineExecutor), mock.patch(
+            f"{command}.connections"
+        ):
+            out = StringIO()
+            call_command("regenerate_image_variants", stdout=out)
+            self.assertIn("Изображений: 1", out.getvalue())
+            course.refresh_from_db()
+            self.assertIn("full", course.preview_variants)
+
+            out = StringIO()
+            call_command("regenerate_image_variants", stdout=out)
+            self.assertIn("Все копии актуальны", out.getvalue())
@@ -0,0 +1,24 @@
+# Асинхронные эндпоинты чтения для запуска под ASGI (/api/async/)
+from django.urls import path
+
+from .views_async import (
+    AsyncCourseDetailView,
+    AsyncCourseListView,
+    AsyncLessonDetailView,
+    AsyncLessonListView,
+)
+
+urlpatterns = [
+    path("courses/", AsyncCourseListView.as_view(), name="async-course-list"),
+    path(
+        "courses/<int:pk>/",
+        AsyncCourseDetailView.as_view(),
+        name="async-course-detail",
+    ),
+    path("lessons/", AsyncLessonListView.as_view(), name="async-lesson-list"),
+    path(
+        "lessons/<int:pk>/",
+        AsyncLessonDetailView.as_view(),
+        name="async-lesson-detail",
+    ),
+]
@@ -1,15 +1,19 @@
 from datetime import timedelta
 
+from django.http import Http404
 from django.utils import timezone
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import generics, permissions, viewsets
+from rest_framework.response import Response
 
-from users.permissions import IsModerator, IsOwner
+from services.db_router import replica_reads
+from users.permissions import IsModerator, IsOwner, is_moderator
 
+from .caching import absolute_media_urls, course_payload, subscribed_course_ids
 from .models import Course, Lesson, Subscription
 from .paginators import MaterialsPagination
-from .serializers import CourseSerializer, LessonSerializer
+from .serializers import CourseSerializer, LessonSerializer, with_course_details
 from .tasks import send_course_update_email
 
 
@@ -41,14 +45,38 @@ class CourseViewSet(viewsets.ModelViewSet):
         Возвращаем queryset в зависимости от прав пользователя.
         """
         queryset = super().get_queryset()
+        if getattr(self, "swagger_fake_view", False):
+            return queryset.none()
+        if self.action == "list":
+            queryset = with_course_details(queryset, self.request.user)
 
         # Если пользователь модератор - видит все курсы
-        if self.request.user.groups.filter(name="moderators").exists():
+        if is_moderator(self.request.user):
             return queryset
 
         # Иначе видит только свои курсы
         return queryset.filter(owner=self.request.user)
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Курс с уроками - из многоуровневого кеша (общий для всех
+        пользователей), подписка - из кеша подписок пользователя.
+        """
+        try:
+            course_id = int(kwargs[self.lookup_field])
+        except ValueError:
+            raise Http404
+
+        data = course_payload(course_id)
+        user = request.user
+        # Та же область видимости, что и в get_queryset
+        if data is None or not (is_moderator(user) or data["owner"] == user.pk):
+            raise Http404
+
+        data = absolute_media_urls(data, request)
+        data["is_subscribed"] = course_id in subscribed_course_ids(user.pk)
+        return Response(data)
+
     def get_permissions(self):
         """
         Переопределяем права в зависимости от действия (action).
@@ -72,20 +100,22 @@ class CourseViewSet(viewsets.ModelViewSet):
         Автоматически привязываем курс к текущему пользователю при создании.
         """
         # Проверяем, что пользователь не модератор
-        if self.request.user.groups.filter(name="moderators").exists():
+        if is_moderator(self.request.user):
             raise permissions.PermissionDenied("Модераторы не могут создавать курсы")
         serializer.save(owner=self.request.user)
 
     def perform_update(self, serializer):
         course = serializer.save()
 
-        # Получаем всех подписчиков курса
+        # Получаем всех подписчиков курса (список подписчиков читается
+        # с реплики - небольшое отставание для рассылки допустимо)
         subscriptions = Subscription.objects.filter(course=course)
         emails = subscriptions.values_list("user__email", flat=True)
 
         # Отправляем письма асинхронно
-        for email in emails:
-            send_course_update_email.delay(course.title, email)
+        with replica_reads():
+            for email in emails:
+                send_course_update_email.delay(course.title, email)
 
     def perform_destroy(self, instance):
         """
@@ -94,7 +124,7 @@ class CourseViewSet(viewsets.ModelViewSet):
         user = self.request.user
 
         # Только владелец может удалять (не модератор)
-        if user.groups.filter(name="moderators").exists():
+        if is_moderator(user):
             raise permissions.PermissionDenied("Модераторы не могут удалять курсы")
 
         if instance.owner != user:
@@ -113,7 +143,7 @@ class LessonListCreateAPIView(generics.ListCreateAPIView):
         queryset = super().get_queryset()
 
         # Если пользователь модератор - видит все уроки
-        if self.request.user.groups.filter(name="moderators").exists():
+        if is_moderator(self.request.user):
             return queryset
 
         # Иначе видит только свои уроки
@@ -124,7 +154,7 @@ class LessonListCreateAPIView(generics.ListCreateAPIView):
         Автоматически привязываем урок к текущему пользователю при создании.
         """
         # Проверяем, что пользователь не модератор
-        if self.request.user.groups.filter(name="moderators").exists():
+        if is_moderator(self.request.user):
             raise permissions.PermissionDenied("Модераторы не могут создавать уроки")
         serializer.save(owner=self.request.user)
 
@@ -136,7 +166,9 @@ class LessonRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        if self.request.user.groups.filter(name="moderators").exists():
+        if getattr(self, "swagger_fake_view", False):
+            return queryset.none()
+        if is_moderator(self.request.user):
             return queryset
         return queryset.filter(owner=self.request.user)
 
@@ -146,9 +178,7 @@ class LessonRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
         user = self.request.user
 
         # Проверка прав
-        if not (
-            user.groups.filter(name="moderators").exists() or instance.owner == user
-        ):
+        if not (is_moderator(user) or instance.owner == user):
             raise permissions.PermissionDenied("Нет прав для редактирования")
 
         # Сохраняем урок
@@ -164,8 +194,9 @@ class LessonRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
             emails = Subscription.objects.filter(course=course).values_list(
                 "user__email", flat=True
             )
-            for email in emails:
-                send_course_update_email.delay(course.title, email)
+            with replica_reads():
+                for email in emails:
+                    send_course_update_email.delay(course.title, email)
 
             # Обновляем время курса
             course.updated_at = timezone.now()
@@ -178,7 +209,7 @@ class LessonRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
         user = self.request.user
 
         # Только владелец может удалять (не модератор)
-        if user.groups.filter(name="moderators").exists():
+        if is_moderator(user):
             raise permissions.PermissionDenied("Модераторы не могут удалять уроки")
 
         if instance.owner != user:
@@ -0,0 +1,82 @@
+from django.http import JsonResponse
+from rest_framework.exceptions import NotFound
+
+from services.async_views import AsyncAPIView, apaginate
+from users.authentication import CachedJWTAuthentication
+from users.permissions import ais_moderator
+
+from .models import Course, Lesson
+from .paginators import MaterialsPagination
+from .serializers import CourseSerializer, LessonSerializer, with_course_details
+
+
+class AsyncMaterialsView(AsyncAPIView):
+    """
+    Чтение курсов и уроков через async ORM: те же права, что и в sync
+    API (модератор видит всё, остальные - только своё).
+    """
+
+    authentication_classes = (CachedJWTAuthentication,)
+    serializer_class = None
+
+    def get_queryset(self, request):
+        raise NotImplementedError
+
+    async def get_visible(self, request):
+        queryset = self.get_queryset(request)
+        if await ais_moderator(request.user):
+            return queryset
+        return queryset.filter(owner=request.user)
+
+    def serialize(self, request, data, many=False):
+        return self.serializer_class(data, many=many, context={"request": request}).data
+
+
+class AsyncListView(AsyncMaterialsView):
+    async def get(self, request):
+        queryset = await self.get_visible(request)
+        objects, page = await apaginate(
+            request, queryset.order_by("id"), MaterialsPagination
+        )
+        return JsonResponse(
+            {**page, "results": self.serialize(request, objects, many=True)}
+        )
+
+
+class AsyncDetailView(AsyncMaterialsView):
+    async def get(self, request, pk):
+        queryset = await self.get_visible(request)
+        obj = await queryset.filter(pk=pk).afirst()
+        if obj is None:
+            raise NotFound
+        return JsonResponse(self.serialize(request, obj))
+
+
+class CourseQuerysetMixin:
+    serializer_class = CourseSerializer
+
+    def get_queryset(self, request):
+        return with_course_details(Course.objects.all(), request.user)
+
+
+class LessonQuerysetMixin:
+    serializer_class = LessonSerializer
+
+    def get_queryset(self, request):
+        return Lesson.objects.all()
+
+
+class AsyncCourseListView(CourseQuerysetMixin, AsyncListView):
+    pass
+
+
+class AsyncCourseDetailView(CourseQuerysetMixin, AsyncDetailView):
+    pass
+
+
+class AsyncLessonListView(LessonQuerysetMixin, AsyncListView):
+    pass
+
+
+class AsyncLessonDetailView(LessonQuerysetMixin, AsyncDetailView):
+    pass
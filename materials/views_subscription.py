@@ -41,6 +41,7 @@ class SubscriptionAPIView(APIView):
     """
 
     permission_classes = [IsAuthenticated]
+    throttle_scope = "subscriptions"
 
     @swagger_auto_schema(
         tags=["Подписки"],
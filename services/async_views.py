@@ -0,0 +1,120 @@
+import json
+import math
+
+from django.http import JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class AsyncAPIView(View):
+    """
+    Базовый асинхронный view для JSON API без DRF: под ASGI обработчик
+    не занимает поток, пока ждёт БД, кеш или пул хеширования.
+
+    authentication_classes - классы с методом aauthenticate(request);
+    если они заданы, запрос без учётных данных получает 401.
+    Исключения DRF (APIException) превращаются в JSON-ответ, как в DRF.
+    """
+
+    authentication_classes = ()
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Как и в DRF, аутентификация по токену - CSRF не нужен
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        # APIException из бэкендов аутентификации (HashingPoolBusy)
+        # превращается в ответ здесь
+        request.handles_api_exceptions = True
+        try:
+            await self.authenticate(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as e:
+            return self.exception_response(request, e)
+
+    async def authenticate(self, request):
+        if not self.authentication_classes:
+            return
+        for authentication_class in self.authentication_classes:
+            result = await authentication_class().aauthenticate(request)
+            if result is not None:
+                request.user, request.auth = result
+                return
+        raise NotAuthenticated
+
+    def exception_response(self, request, exc):
+        headers = {}
+        if exc.status_code == 401 and self.authentication_classes:
+            headers["WWW-Authenticate"] = self.authentication_classes[
+                0
+            ]().authenticate_header(request)
+        if getattr(exc, "wait", None):
+            headers["Retry-After"] = str(math.ceil(exc.wait))
+
+        data = exc.detail
+        if not isinstance(data, (dict, list)):
+            data = {"detail": data}
+        return JsonResponse(data, status=exc.status_code, headers=headers, safe=False)
+
+    @staticmethod
+    def read_data(request):
+        """
+        Тело запроса в виде dict (JSON или форма) или None при ошибке разбора.
+        """
+        if request.content_type == "application/json":
+            try:
+                data = json.loads(request.body or b"{}")
+            except ValueError:
+                return None
+            return data if isinstance(data, dict) else None
+        return request.POST.dict()
+
+
+async def apaginate(request, queryset, pagination_class):
+    """
+    Постраничная выборка в формате PageNumberPagination
+    ({"count", "next", "previous", "results"}) через async ORM.
+
+    Returns:
+        tuple: (объекты страницы, dict с count/next/previous)
+    """
+    paginator = pagination_class()
+    page_size = paginator.page_size
+    if paginator.page_size_query_param:
+        try:
+            page_size = min(
+                int(request.GET[paginator.page_size_query_param]),
+                paginator.max_page_size or page_size,
+            )
+        except (KeyError, ValueError):
+            pass
+        page_size = max(page_size, 1)
+
+    try:
+        number = int(request.GET.get(paginator.page_query_param, 1))
+    except ValueError:
+        raise NotFound(paginator.invalid_page_message)
+
+    count = await queryset.acount()
+    pages = max(1, math.ceil(count / page_size))
+    if not 1 <= number <= pages:
+        raise NotFound(paginator.invalid_page_message)
+
+    offset = (number - 1) * page_size
+    objects = [obj async for obj in queryset[offset : offset + page_size]]
+
+    url = request.build_absolute_uri()
+    param = paginator.page_query_param
+    next_url = replace_query_param(url, param, number + 1) if number < pages else None
+    if number == 1:
+        previous_url = None
+    elif number == 2:
+        previous_url = remove_query_param(url, param)
+    else:
+        previous_url = replace_query_param(url, param, number - 1)
+
+    return objects, {"count": count, "next": next_url, "previous": previous_url}
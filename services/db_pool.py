@@ -0,0 +1,96 @@
+import threading
+from collections import Counter
+
+from django.db import connections
+
+_lock = threading.Lock()
+# Сколько физических соединений открыл процесс, по алиасам БД
+_opened = Counter()
+# Соединения и пулы, унаследованные от родителя при fork. Закрывать их нельзя:
+# закрытие отправит Terminate в сокеты, которые продолжает использовать
+# родитель. Ссылки хранятся, чтобы их не закрыл и сборщик мусора
+_inherited = []
+
+# Названия статистики -> ключи ConnectionPool.get_stats() из psycopg_pool
+POOL_STATS = {
+    "checkouts": "requests_num",
+    "waits": "requests_queued",
+    "wait_ms": "requests_wait_ms",
+    "timeouts": "requests_errors",
+    "waiting": "requests_waiting",
+    "size": "pool_size",
+    "available": "pool_available",
+    "min_size": "pool_min",
+    "max_size": "pool_max",
+    "connections_opened": "connections_num",
+    "connections_lost": "connections_lost",
+}
+
+
+def count_connection(sender, connection, **kwargs):
+    """
+    Обработчик connection_created: считает открытые соединения.
+    """
+    with _lock:
+        _opened[connection.alias] += 1
+
+
+def get_pool(connection):
+    """
+    Пул psycopg соединения или None, если пул не настроен или ещё не создан.
+    """
+    if not connection.settings_dict["OPTIONS"].get("pool"):
+        return None
+    return getattr(connection, "_connection_pools", {}).get(connection.alias)
+
+
+def pool_stats():
+    """
+    Статистика соединений текущего процесса по каждой БД.
+
+    Returns:
+        dict: алиас -> {"mode": "pool", checkouts/waits/timeouts...}
+            или {"mode": "persistent" | "per_request", connections_opened...}
+    """
+    stats = {}
+    for alias in connections:
+        connection = connections[alias]
+        settings_dict = connection.settings_dict
+        if settings_dict["OPTIONS"].get("pool"):
+            pool = get_pool(connection)
+            raw = pool.get_stats() if pool is not None else {}
+            stats[alias] = {"mode": "pool"}
+            stats[alias].update(
+                (name, raw.get(key, 0)) for name, key in POOL_STATS.items()
+            )
+        else:
+            stats[alias] = {
+                "mode": (
+                    "persistent" if settings_dict["CONN_MAX_AGE"] else "per_request"
+                ),
+                "conn_max_age": settings_dict["CONN_MAX_AGE"],
+                "health_checks": settings_dict["CONN_HEALTH_CHECKS"],
+                "connections_opened": _opened[alias],
+            }
+    return stats
+
+
+def reset_after_fork():
+    """
+    Вызывать в дочернем процессе сразу после fork (воркеры Celery prefork,
+    gunicorn --preload): соединения и пулы родителя отбрасываются без
+    сетевого обмена, ребёнок лениво откроет собственный пул.
+    """
+    global _lock
+
+    # Блокировка могла быть захвачена другим потоком родителя в момент fork
+    _lock = threading.Lock()
+    _opened.clear()
+    for alias in connections:
+        connection = connections[alias]
+        pools = getattr(connection, "_connection_pools", None)
+        if pools and alias in pools:
+            _inherited.append(pools.pop(alias))
+        if connection.connection is not None:
+            _inherited.append(connection.connection)
+            connection.connection = None
@@ -0,0 +1,191 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = "db_pin:{}"
+
+
+@dataclass
+class RoutingState:
+    # Можно ли читать с реплики
+    replica: bool = False
+    # Была ли запись: после неё чтения идут с основной БД
+    wrote: bool = False
+    # Реплика, выбранная на весь запрос: чтения одного запроса не должны
+    # попадать на реплики с разным отставанием
+    alias: str | None = None
+
+
+# Состояние маршрутизации текущего запроса или блока replica_reads()
+_state = ContextVar("db_routing_state", default=None)
+
+
+class ReplicaRouter:
+    """
+    Чтения с реплик из DATABASE_REPLICAS там, где это разрешено
+    (GET-запросы API, replica_reads() в задачах), всё остальное - на default.
+    После первой записи чтения до конца запроса идут с основной БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replica or state.wrote:
+            return None
+        if not settings.DATABASE_REPLICAS:
+            return None
+        if state.alias is None:
+            state.alias = random.choice(settings.DATABASE_REPLICAS)
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии default, объекты с них можно связывать
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+@contextmanager
+def replica_reads():
+    """
+    Чтения внутри блока - с реплики (read-only сканы в задачах Celery).
+    Данные могут отставать от основной БД: перед изменением условия
+    нужно проверять повторно.
+    """
+    token = _state.set(RoutingState(replica=True))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Чтения внутри блока - с основной БД, даже в запросе с репликой.
+    Для заполнения общих кешей: данные с отставшей реплики остались бы
+    в кеше до истечения таймаута.
+    """
+    outer = _state.get()
+    state = RoutingState()
+    token = _state.set(state)
+    try:
+        yield
+    finally:
+        _state.reset(token)
+        if outer is not None and state.wrote:
+            outer.wrote = True
+
+
+def request_user_id(request):
+    """
+    id пользователя запроса до аутентификации в DRF: из JWT
+    (без обращения к БД) или из сессии.
+    """
+    from users.authentication import CachedJWTAuthentication
+
+    authentication = CachedJWTAuthentication()
+    header = authentication.get_header(request)
+    if header is not None:
+        raw_token = authentication.get_raw_token(header)
+        if raw_token is None:
+            return None
+        try:
+            token = authentication.get_validated_token(raw_token)
+            return authentication.get_user_id(token)
+        except APIException:
+            return None
+    if hasattr(request, "session"):
+        return request.session.get(SESSION_KEY)
+    return None
+
+
+def pin_to_primary(user_id):
+    cache.set(PIN_KEY.format(user_id), 1, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return cache.get(PIN_KEY.format(user_id)) is not None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    GET/HEAD/OPTIONS-запросы к API читают с реплик. Пользователь, который
+    что-то записал, REPLICA_PIN_SECONDS читает с основной БД, чтобы видеть
+    свои изменения несмотря на отставание реплик.
+    """
+
+    path_prefixes = ("/api/",)
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RoutingState(replica=self.can_use_replica(request))
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state.wrote and settings.DATABASE_REPLICAS:
+            self.pin_writer(request)
+        return response
+
+    async def __acall__(self, request):
+        replica = self.replica_allowed(request) and await sync_to_async(
+            self.user_can_use_replica
+        )(request)
+        state = RoutingState(replica=replica)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state.wrote and settings.DATABASE_REPLICAS:
+            # request.user может быть ленивым и читать сессию из БД
+            await sync_to_async(self.pin_writer)(request)
+        return response
+
+    def pin_writer(self, request):
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
+
+    def replica_allowed(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return False
+        if request.method not in SAFE_METHODS:
+            return False
+        return request.path.startswith(self.path_prefixes)
+
+    def user_can_use_replica(self, request):
+        user_id = request_user_id(request)
+        return user_id is None or not is_pinned(user_id)
+
+    def can_use_replica(self, request):
+        return self.replica_allowed(request) and self.user_can_use_replica(request)
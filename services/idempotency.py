@@ -0,0 +1,206 @@
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+from users.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "HTTP_IDEMPOTENCY_KEY"
+MAX_KEY_LENGTH = 255
+
+
+def _request_hash(data):
+    """
+    Считает хеш тела запроса, чтобы один ключ нельзя было
+    переиспользовать с другими параметрами.
+    """
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _replay(record):
+    """
+    Отдаёт сохранённый ответ без повторного выполнения запроса.
+    """
+    response = Response(record.response_body, status=record.response_status)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _lease():
+    return timezone.now() + timedelta(
+        seconds=getattr(settings, "IDEMPOTENCY_LOCK_TIMEOUT", 120)
+    )
+
+
+def _lease_expired(record):
+    return record.locked_until is None or record.locked_until <= timezone.now()
+
+
+def _take_over(record):
+    """
+    Перехватывает запись прерванного запроса (истёк срок выполнения).
+    Из параллельных повторов запись получает только один.
+    """
+    locked_until = _lease()
+    taken = IdempotencyKey.objects.filter(
+        id=record.id,
+        status=IdempotencyKey.STATUS_PROCESSING,
+        locked_until=record.locked_until,
+    ).update(locked_until=locked_until)
+    if taken:
+        record.locked_until = locked_until
+    return bool(taken)
+
+
+def _wait_for_completion(record_id):
+    """
+    Недолго (IDEMPOTENCY_WAIT_TIMEOUT) ждёт завершения первого запроса
+    с этим ключом: дубликат не должен надолго занимать воркер.
+
+    Returns:
+        IdempotencyKey | None: Завершённая запись, запись с истёкшим сроком
+        выполнения (первый запрос прерван) или None, если первый запрос
+        упал и запись была удалена
+    """
+    timeout = getattr(settings, "IDEMPOTENCY_WAIT_TIMEOUT", 0.5)
+    interval = getattr(settings, "IDEMPOTENCY_POLL_INTERVAL", 0.1)
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        record = IdempotencyKey.objects.filter(id=record_id).first()
+        if (
+            record is None
+            or record.status == IdempotencyKey.STATUS_COMPLETED
+            or _lease_expired(record)
+        ):
+            return record
+        time.sleep(interval)
+
+    raise TimeoutError
+
+
+def stripe_idempotency_key(request, suffix):
+    """
+    Ключ идемпотентности для отдельного вызова Stripe API.
+    Для каждого вызова (продукт, цена, сессия) нужен свой ключ.
+    """
+    key = getattr(request, "idempotency_key", None)
+    if not key:
+        return None
+    return f"{request.user.id}:{key}:{suffix}"
+
+
+def idempotent(endpoint):
+    """
+    Декоратор для action'ов ViewSet, поддерживающий заголовок Idempotency-Key.
+
+    - первый запрос с ключом выполняется и его ответ сохраняется в БД;
+    - повторный запрос получает сохранённый ответ без записи в БД и вызовов Stripe;
+    - конкурентный дубликат ждёт завершения первого запроса не дольше
+      IDEMPOTENCY_WAIT_TIMEOUT, затем получает 409 с Retry-After;
+    - запрос, прерванный без ответа (упал воркер), повтор выполняет заново
+      по истечении IDEMPOTENCY_LOCK_TIMEOUT;
+    - ответы 5xx не сохраняются, чтобы клиент мог повторить запрос.
+    """
+
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.META.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view_method(self, request, *args, **kwargs)
+
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {"error": "Слишком длинный Idempotency-Key"}, status=400
+                )
+
+            request_hash = _request_hash(request.data)
+            lookup = {"user": request.user, "endpoint": endpoint, "key": key}
+
+            while True:
+                record = IdempotencyKey.objects.filter(**lookup).first()
+
+                if record and record.expires_at <= timezone.now():
+                    record.delete()
+                    record = None
+
+                if record is None:
+                    try:
+                        with transaction.atomic():
+                            record = IdempotencyKey.objects.create(
+                                request_hash=request_hash,
+                                locked_until=_lease(),
+                                expires_at=timezone.now()
+                                + timedelta(
+                                    seconds=getattr(
+                                        settings, "IDEMPOTENCY_KEY_TTL", 24 * 60 * 60
+                                    )
+                                ),
+                                **lookup,
+                            )
+                    except IntegrityError:
+                        # Ключ только что занял параллельный запрос
+                        continue
+                    break
+
+                if record.request_hash != request_hash:
+                    return Response(
+                        {"error": "Idempotency-Key уже использован с другим запросом"},
+                        status=422,
+                    )
+
+                if record.status == IdempotencyKey.STATUS_COMPLETED:
+                    return _replay(record)
+
+                if _lease_expired(record):
+                    if _take_over(record):
+                        break
+                    # Запись перехватил параллельный повтор
+                    continue
+
+                try:
+                    record = _wait_for_completion(record.id)
+                except TimeoutError:
+                    return Response(
+                        {"error": "Запрос с этим Idempotency-Key ещё выполняется"},
+                        status=409,
+                        headers={
+                            "Retry-After": str(
+                                getattr(settings, "IDEMPOTENCY_RETRY_AFTER", 1)
+                            )
+                        },
+                    )
+                if record is not None and record.status == (
+                    IdempotencyKey.STATUS_COMPLETED
+                ):
+                    return _replay(record)
+                # Первый запрос завершился ошибкой или прерван - пробуем сами
+
+            request.idempotency_key = key
+            try:
+                response = view_method(self, request, *args, **kwargs)
+            except Exception:
+                record.delete()
+                raise
+
+            if response.status_code >= 500:
+                record.delete()
+                return response
+
+            record.status = IdempotencyKey.STATUS_COMPLETED
+            record.response_status = response.status_code
+            record.response_body = response.data
+            record.save(update_fields=["status", "response_status", "response_body"])
+            return response
+
+        return wrapper
+
+    return decorator
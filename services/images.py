@@ -0,0 +1,224 @@
+"""
+Уменьшенные копии загруженных изображений (превью курсов и уроков, аватары).
+
+Копии лежат рядом с оригиналом: courses/photo.png ->
+courses/photo.card.webp, courses/photo.card.jpg. Имена файлов хранятся
+в JSON-поле модели <поле>_variants вместе с именем оригинала (source),
+поэтому сериализаторы строят ссылки без обращений к хранилищу, а
+изменённый оригинал видно по несовпадению source.
+"""
+
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from rest_framework import serializers
+
+# Название -> (ширина, высота, обрезка). С обрезкой изображение заполняет
+# рамку целиком (лишнее по краям обрезается), без неё - вписывается в рамку
+VARIANTS = {
+    "thumbnail": (160, 160, True),
+    "card": (640, 360, True),
+    "full": (1920, 1920, False),
+}
+# Формат -> (расширение, параметры Pillow)
+FORMATS = {
+    "webp": (".webp", {"format": "WEBP", "quality": 80, "method": 4}),
+    "jpeg": (".jpg", {"format": "JPEG", "quality": 82, "optimize": True}),
+}
+
+
+def variant_name(name, variant, fmt):
+    root, _ = posixpath.splitext(name)
+    return f"{root}.{variant}{FORMATS[fmt][0]}"
+
+
+def scale_for(size, width, height, crop):
+    """
+    Во сколько раз уменьшить изображение size для копии (не больше 1).
+    """
+    scales = (width / size[0], height / size[1])
+    return min(1.0, max(scales) if crop else min(scales))
+
+
+def open_image(file):
+    from PIL import Image, ImageOps
+
+    image = Image.open(file)
+    # JPEG декодируется сразу в уменьшенном масштабе (1/2, 1/4, 1/8), но не
+    # меньше самой большой копии: многомегапиксельные фото читаются в разы
+    # быстрее и занимают меньше памяти
+    scale = max(scale_for(image.size, *variant) for variant in VARIANTS.values())
+    image.draft("RGB", (image.width * scale, image.height * scale))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+    return image
+
+
+def resize(image, width, height, crop):
+    """
+    Копия размером не больше width x height. С обрезкой - по центру до
+    пропорций рамки; меньшие изображения не увеличиваются, только обрезаются.
+    """
+    from PIL import Image
+
+    scale = scale_for(image.size, width, height, crop)
+    box = (0, 0, image.width, image.height)
+    if crop:
+        box_width = min(image.width, width / max(scale, width / image.width))
+        box_height = min(image.height, height / max(scale, height / image.height))
+        left = (image.width - box_width) / 2
+        top = (image.height - box_height) / 2
+        box = (left, top, left + box_width, top + box_height)
+    size = (
+        max(1, round((box[2] - box[0]) * scale)),
+        max(1, round((box[3] - box[1]) * scale)),
+    )
+    # reducing_gap: сначала быстрое уменьшение в целое число раз, затем LANCZOS
+    return image.resize(size, Image.Resampling.LANCZOS, box=box, reducing_gap=3.0)
+
+
+def encode(image, fmt):
+    from PIL import Image
+
+    _, options = FORMATS[fmt]
+    if fmt == "jpeg" and image.mode == "RGBA":
+        # В JPEG нет прозрачности - подкладываем белый фон
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def generate_variants(name, storage=None):
+    """
+    Создаёт копии всех размеров и форматов для файла name в хранилище.
+    Копии пересоздаются, если уже есть.
+
+    Returns:
+        dict: {"source": name, variant: {fmt: имя файла}}
+    """
+    storage = storage or default_storage
+    with storage.open(name, "rb") as file:
+        image = open_image(file)
+        image.load()
+
+    variants = {"source": name}
+    for variant, (width, height, crop) in VARIANTS.items():
+        resized = resize(image, width, height, crop)
+        variants[variant] = {}
+        for fmt in FORMATS:
+            target = variant_name(name, variant, fmt)
+            if storage.exists(target):
+                storage.delete(target)
+            variants[variant][fmt] = storage.save(
+                target, ContentFile(encode(resized, fmt))
+            )
+    return variants
+
+
+def delete_variants(variants, keep=None, storage=None):
+    """
+    Удаляет файлы копий, кроме тех, что есть в keep.
+    """
+    storage = storage or default_storage
+    keep_names = set(variant_files(keep or {}))
+    for name in variant_files(variants or {}):
+        if name not in keep_names:
+            storage.delete(name)
+
+
+def variant_files(variants):
+    for key, files in variants.items():
+        if key != "source":
+            yield from files.values()
+
+
+def update_variants(instance, field_name, force=False):
+    """
+    Приводит <field_name>_variants в соответствие с текущим файлом поля:
+    создаёт копии нового файла, удаляет копии прежнего. С force копии
+    пересоздаются, даже если уже соответствуют файлу.
+
+    Сохранение через update() - без сигналов и без изменения updated_at;
+    если файл успели заменить, запись пропускается (копии сделает задача,
+    поставленная для нового файла).
+
+    Returns:
+        bool: изменились ли копии
+    """
+    file = getattr(instance, field_name)
+    variants_field = f"{field_name}_variants"
+    current = getattr(instance, variants_field) or {}
+    if not force and not needs_variants(instance, field_name):
+        return False
+
+    if file:
+        variants = generate_variants(file.name, file.storage)
+        same_file = Q(**{field_name: file.name})
+    else:
+        variants = {}
+        same_file = Q(**{f"{field_name}__isnull": True}) | Q(**{field_name: ""})
+    updated = (
+        type(instance)
+        .objects.filter(same_file, pk=instance.pk)
+        .update(**{variants_field: variants})
+    )
+    if not updated:
+        delete_variants(variants, storage=file.storage)
+        return False
+    delete_variants(current, keep=variants, storage=file.storage)
+    setattr(instance, variants_field, variants)
+    return True
+
+
+def needs_variants(instance, field_name, update_fields=None):
+    """
+    Нужно ли (пере)создать копии: файл появился, сменился или удалён.
+    Сохранение других полей (update_fields, отложенные поля) не проверяется.
+    """
+    if update_fields is not None and field_name not in update_fields:
+        return False
+    deferred = instance.get_deferred_fields()
+    if field_name in deferred or f"{field_name}_variants" in deferred:
+        return False
+    file = getattr(instance, field_name)
+    current = getattr(instance, f"{field_name}_variants") or {}
+    return (file.name or None) != current.get("source")
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Ссылки на копии изображения: {variant: {fmt: url}}, пустой объект,
+    пока копии не готовы. С request в контексте ссылки абсолютные.
+    """
+
+    def to_representation(self, value):
+        request = self.context.get("request")
+        result = {}
+        for variant in VARIANTS:
+            files = (value or {}).get(variant)
+            if not files:
+                continue
+            result[variant] = {}
+            for fmt, name in files.items():
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                result[variant][fmt] = url
+        return result
+
+
+def variant_urls_absolute(variants, request):
+    """
+    Абсолютные ссылки для уже сериализованных копий (данные из кеша).
+    """
+    return {
+        variant: {fmt: request.build_absolute_uri(url) for fmt, url in files.items()}
+        for variant, files in variants.items()
+    }
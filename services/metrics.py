@@ -0,0 +1,250 @@
+"""
+Метрики в формате Prometheus (prometheus_client).
+
+Без PROMETHEUS_MULTIPROC_DIR метрики хранятся в памяти процесса. С ним
+(uvicorn --workers, воркеры Celery prefork) каждый процесс пишет значения
+в файлы каталога, а /metrics суммирует файлы всех процессов из
+METRICS_AGGREGATE_DIR, включая подкаталоги других сервисов на общем томе.
+
+Здесь только счётчики и гистограммы: файлы завершившихся процессов
+остаются в сумме, поэтому значения не уменьшаются при перезапуске воркеров.
+"""
+
+import os
+import time
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    # Файлы значений создаются вместе с метриками ниже
+    Path(os.environ["PROMETHEUS_MULTIPROC_DIR"]).mkdir(parents=True, exist_ok=True)
+
+# Границы корзин для задач и внешних вызовов: от миллисекунд до минут
+SLOW_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+REQUEST_LATENCY = Histogram(
+    "lms_http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["view", "action", "method", "status"],
+)
+REQUEST_QUERIES = Histogram(
+    "lms_http_request_db_queries",
+    "Число SQL-запросов за HTTP-запрос",
+    ["view", "action"],
+    buckets=QUERY_BUCKETS,
+)
+TASK_RUNTIME = Histogram(
+    "lms_celery_task_duration_seconds",
+    "Время выполнения задачи Celery",
+    ["task", "state"],
+    buckets=SLOW_BUCKETS,
+)
+TASK_QUEUE_WAIT = Histogram(
+    "lms_celery_queue_wait_seconds",
+    "Время ожидания задачи в очереди до начала выполнения",
+    ["queue"],
+    buckets=SLOW_BUCKETS,
+)
+EMAIL_LATENCY = Histogram(
+    "lms_email_send_duration_seconds",
+    "Время отправки письма",
+    buckets=SLOW_BUCKETS,
+)
+EMAIL_ERRORS = Counter(
+    "lms_email_errors",
+    "Ошибки отправки писем",
+    ["error"],
+)
+STRIPE_LATENCY = Histogram(
+    "lms_stripe_request_duration_seconds",
+    "Время запроса к Stripe API",
+    ["operation"],
+    buckets=SLOW_BUCKETS,
+)
+STRIPE_ERRORS = Counter(
+    "lms_stripe_errors",
+    "Ошибки запросов к Stripe API",
+    ["operation", "error"],
+)
+
+
+def timed(histogram, errors=None, **labels):
+    """
+    Декоратор: время вызова в histogram, исключения - в счётчик errors
+    (с меткой error = имя класса исключения).
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if errors is not None:
+                    errors.labels(error=type(e).__name__, **labels).inc()
+                raise
+            finally:
+                metric = histogram.labels(**labels) if labels else histogram
+                metric.observe(time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+def view_labels(request):
+    """
+    Метки представления: класс DRF и действие viewset (list, retrieve...)
+    вместо пути, чтобы id в URL не плодили ряды.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched", ""
+    func = match.func
+    view_class = getattr(func, "cls", None) or getattr(func, "view_class", None)
+    view = view_class.__name__ if view_class else match.view_name or func.__name__
+    actions = getattr(func, "actions", None) or {}
+    return view, actions.get(request.method.lower(), "")
+
+
+class QueryCounter:
+    """
+    Число SQL-запросов текущего HTTP-запроса: без DEBUG и без хранения
+    их текста.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+
+# Счётчик запроса: контекст копируется в потоки sync_to_async, поэтому
+# в ASGI считаются и запросы из синхронного кода в других потоках
+_query_counter = ContextVar("metrics_query_counter", default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.count += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(connection, **kwargs):
+    """
+    Обёртка выполнения SQL на соединение: соединения привязаны к потокам,
+    в ASGI запрос выполняет SQL не в том потоке, где работает middleware.
+    Ставится первой, чтобы не мешать execute_wrapper(), снимающему
+    последнюю обёртку.
+    """
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+connection_created.connect(install_query_counter)
+
+
+class MetricsMiddleware:
+    """
+    Время обработки и число SQL-запросов по представлениям и действиям.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        # Соединения, открытые до загрузки модуля
+        for alias in connections:
+            install_query_counter(connections[alias])
+        counter = QueryCounter()
+        token = _query_counter.set(counter)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_counter.reset(token)
+        self.observe(request, response, time.perf_counter() - started, counter)
+        return response
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        token = _query_counter.set(counter)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_counter.reset(token)
+        self.observe(request, response, time.perf_counter() - started, counter)
+        return response
+
+    def observe(self, request, response, elapsed, counter):
+        view, action = view_labels(request)
+        REQUEST_LATENCY.labels(
+            view, action, request.method, str(response.status_code)
+        ).observe(elapsed)
+        REQUEST_QUERIES.labels(view, action).observe(counter.count)
+
+
+def multiprocess_dir():
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def mark_process_dead(pid=None):
+    """
+    Завершение процесса (воркера uvicorn или Celery prefork) в
+    многопроцессном режиме: удаляет его файлы gauge в режиме live.
+    Каталог целиком очищается при запуске сервиса (docker-entrypoint.sh).
+    """
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+class AggregateCollector:
+    """
+    Сумма значений из файлов всех процессов под METRICS_AGGREGATE_DIR
+    (каталоги PROMETHEUS_MULTIPROC_DIR разных сервисов на общем томе).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def collect(self):
+        files = [str(file) for file in self.path.rglob("*.db")]
+        return multiprocess.MultiProcessCollector.merge(files, accumulate=True)
+
+
+def export():
+    """
+    Текст метрик для /metrics и его Content-Type.
+    """
+    if not multiprocess_dir():
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+    registry = CollectorRegistry()
+    registry.register(
+        AggregateCollector(settings.METRICS_AGGREGATE_DIR or multiprocess_dir())
+    )
+    return generate_latest(registry), CONTENT_TYPE_LATEST
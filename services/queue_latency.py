@@ -0,0 +1,59 @@
+import time
+from datetime import datetime
+
+from django.core.cache import cache
+
+# Заголовок сообщения со временем отправки задачи
+PUBLISHED_HEADER = "published_at"
+LATENCY_KEY = "celery_queue_latency:{queue}"
+
+
+def stamp_published(headers=None, **kwargs):
+    """
+    Обработчик before_task_publish: время отправки в заголовках сообщения.
+    """
+    if headers is not None:
+        # При повторе (retry) заголовки копируются - отметка обновляется
+        headers[PUBLISHED_HEADER] = time.time()
+
+
+def task_latency(task):
+    """
+    Сколько секунд задача ждала в очереди или None (eager, старый клиент).
+    """
+    published_at = getattr(task.request, PUBLISHED_HEADER, None)
+    if published_at is None:
+        return None
+    # Задача с countdown/eta ждёт в очереди с назначенного времени
+    eta = getattr(task.request, "eta", None)
+    if eta:
+        if isinstance(eta, str):
+            eta = datetime.fromisoformat(eta)
+        published_at = max(published_at, eta.timestamp())
+    return max(0.0, time.time() - published_at)
+
+
+def task_queue(task):
+    delivery_info = task.request.delivery_info or {}
+    return delivery_info.get("routing_key") or delivery_info.get("queue")
+
+
+def save_latencies(latest):
+    """
+    Последнее время ожидания по очередям {queue: {"latency", "task", "at"}}
+    в общий кеш, чтобы его видели все воркеры. Пишется пачкой вместе
+    со статистикой задач (services.task_stats.flush).
+    """
+    cache.set_many(
+        {LATENCY_KEY.format(queue=queue): value for queue, value in latest.items()},
+        timeout=None,
+    )
+
+
+def queue_latencies(queues):
+    """
+    Последние измерения по очередям: {queue: {"latency", "task", "at"} | None}.
+    """
+    keys = {LATENCY_KEY.format(queue=queue): queue for queue in queues}
+    found = cache.get_many(list(keys))
+    return {queue: found.get(key) for key, queue in keys.items()}
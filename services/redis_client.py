@@ -0,0 +1,31 @@
+import threading
+
+from django.conf import settings
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def get_redis(url=None):
+    """
+    Клиент Redis с пулом соединений, один на процесс для каждого URL.
+    redis-py сам пересоздаёт соединения после fork (проверка pid в пуле).
+
+    Args:
+        url (str): Адрес Redis, по умолчанию REDIS_CACHE_URL
+    """
+    import redis
+
+    url = url or settings.REDIS_CACHE_URL
+    client = _clients.get(url)
+    if client is None:
+        with _lock:
+            client = _clients.get(url)
+            if client is None:
+                client = redis.Redis.from_url(
+                    url,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                )
+                _clients[url] = client
+    return client
@@ -0,0 +1,98 @@
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import NamedTuple
+
+# Что делает процесс при запуске до обработки первого запроса или задачи
+TARGETS = {
+    "web": (
+        "import os\n"
+        "os.environ.setdefault('DJANGO_SETTINGS_MODULE', "
+        "'django_lms_project.settings')\n"
+        "from django_lms_project.wsgi import application\n"
+        "from django.urls import get_resolver\n"
+        "get_resolver().url_patterns\n"
+    ),
+    "celery": (
+        "import os\n"
+        "os.environ.setdefault('DJANGO_SETTINGS_MODULE', "
+        "'django_lms_project.settings')\n"
+        "from django_lms_project.celery import app\n"
+        "app.loader.import_default_modules()\n"
+        "app.finalize()\n"
+    ),
+}
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+class ImportTiming(NamedTuple):
+    module: str
+    # Время самого модуля и вместе с вложенными импортами, микросекунды
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output):
+    """
+    Разбирает вывод python -X importtime (stderr).
+
+    Returns:
+        list[ImportTiming]: в порядке завершения импорта
+    """
+    timings = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        timings.append(
+            ImportTiming(module, int(self_us), int(cumulative_us), len(indent) // 2)
+        )
+    return timings
+
+
+def by_package(timings):
+    """
+    Суммарное собственное время модулей по пакетам верхнего уровня.
+
+    Returns:
+        dict: пакет -> микросекунды, по убыванию
+    """
+    totals = defaultdict(int)
+    for timing in timings:
+        totals[timing.module.partition(".")[0]] += timing.self_us
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def measure(target, runs=1):
+    """
+    Запускает target из TARGETS в новых процессах python -X importtime.
+
+    Returns:
+        dict: {"import_seconds": медиана суммарного времени импорта,
+            "timings": list[ImportTiming] самого быстрого запуска}
+    """
+    results = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", TARGETS[target]],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        if completed.returncode:
+            raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+        timings = parse_importtime(completed.stderr)
+        # Модули верхнего уровня включают время всех вложенных
+        total = sum(timing.cumulative_us for timing in timings if not timing.depth)
+        results.append((total, timings))
+
+    totals = [total for total, _ in results]
+    return {
+        "import_seconds": statistics.median(totals) / 1_000_000,
+        "timings": min(results, key=lambda result: result[0])[1],
+    }
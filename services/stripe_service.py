@@ -1,27 +1,50 @@
 from decimal import Decimal
+from functools import cache
 
-import stripe
 from django.conf import settings
 
-# Инициализируем Stripe с секретным ключом
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from .metrics import STRIPE_ERRORS, STRIPE_LATENCY, timed
 
 
-def create_stripe_product(name, description=None):
+@cache
+def get_stripe():
+    """
+    Модуль stripe, инициализированный секретным ключом. Импортируется при
+    первом обращении к Stripe, а не при запуске процесса: SDK загружается
+    долго и не нужен большинству запросов и задач.
+    """
+    import stripe
+
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    return stripe
+
+
+def _request_options(idempotency_key):
+    """
+    Дополнительные параметры запроса к Stripe API.
+    """
+    return {"idempotency_key": idempotency_key} if idempotency_key else {}
+
+
+@timed(STRIPE_LATENCY, STRIPE_ERRORS, operation="create_product")
+def create_stripe_product(name, description=None, idempotency_key=None):
     """
     Создает продукт в Stripe.
 
     Args:
         name (str): Название продукта
         description (str): Описание продукта
+        idempotency_key (str): Ключ идемпотентности запроса к Stripe
 
     Returns:
         stripe.Product: Объект продукта Stripe
     """
+    stripe = get_stripe()
     try:
         product = stripe.Product.create(
             name=name,
             description=description or f"Курс: {name}",
+            **_request_options(idempotency_key),
         )
         return product
     except stripe.error.StripeError as e:
@@ -29,7 +52,8 @@ def create_stripe_product(name, description=None):
         raise
 
 
-def create_stripe_price(product_id, amount, currency="rub"):
+@timed(STRIPE_LATENCY, STRIPE_ERRORS, operation="create_price")
+def create_stripe_price(product_id, amount, currency="rub", idempotency_key=None):
     """
     Создает цену для продукта в Stripe.
 
@@ -37,10 +61,12 @@ def create_stripe_price(product_id, amount, currency="rub"):
         product_id (str): ID продукта Stripe
         amount (Decimal): Сумма в рублях
         currency (str): Валюта (по умолчанию RUB)
+        idempotency_key (str): Ключ идемпотентности запроса к Stripe
 
     Returns:
         stripe.Price: Объект цены Stripe
     """
+    stripe = get_stripe()
     try:
         # Stripe требует сумму в копейках (центах)
         amount_in_cents = int(amount * 100)
@@ -49,6 +75,7 @@ def create_stripe_price(product_id, amount, currency="rub"):
             product=product_id,
             unit_amount=amount_in_cents,
             currency=currency,
+            **_request_options(idempotency_key),
         )
         return price
     except stripe.error.StripeError as e:
@@ -56,7 +83,10 @@ def create_stripe_price(product_id, amount, currency="rub"):
         raise
 
 
-def create_stripe_checkout_session(price_id, success_url, cancel_url, metadata=None):
+@timed(STRIPE_LATENCY, STRIPE_ERRORS, operation="create_checkout_session")
+def create_stripe_checkout_session(
+    price_id, success_url, cancel_url, metadata=None, idempotency_key=None
+):
     """
     Создает сессию оформления заказа в Stripe.
 
@@ -65,10 +95,12 @@ def create_stripe_checkout_session(price_id, success_url, cancel_url, metadata=N
         success_url (str): URL для перенаправления после успешной оплаты
         cancel_url (str): URL для перенаправления при отмене
         metadata (dict): Дополнительные метаданные
+        idempotency_key (str): Ключ идемпотентности запроса к Stripe
 
     Returns:
         stripe.checkout.Session: Объект сессии Stripe
     """
+    stripe = get_stripe()
     try:
         session = stripe.checkout.Session.create(
             payment_method_types=["card"],
@@ -82,6 +114,7 @@ def create_stripe_checkout_session(price_id, success_url, cancel_url, metadata=N
             success_url=success_url,
             cancel_url=cancel_url,
             metadata=metadata or {},
+            **_request_options(idempotency_key),
         )
         return session
     except stripe.error.StripeError as e:
@@ -89,6 +122,58 @@ def create_stripe_checkout_session(price_id, success_url, cancel_url, metadata=N
         raise
 
 
+@timed(STRIPE_LATENCY, STRIPE_ERRORS, operation="create_cart_checkout_session")
+def create_stripe_cart_checkout_session(
+    items, success_url, cancel_url, metadata=None, currency="rub", idempotency_key=None
+):
+    """
+    Создает одну сессию оформления заказа в Stripe для нескольких товаров.
+    Продукты и цены передаются прямо в сессию (price_data), поэтому
+    на всю корзину уходит один запрос к Stripe API.
+
+    Args:
+        items (list[dict]): Товары корзины с ключами name, description, amount
+        success_url (str): URL для перенаправления после успешной оплаты
+        cancel_url (str): URL для перенаправления при отмене
+        metadata (dict): Дополнительные метаданные
+        currency (str): Валюта (по умолчанию RUB)
+        idempotency_key (str): Ключ идемпотентности запроса к Stripe
+
+    Returns:
+        stripe.checkout.Session: Объект сессии Stripe
+    """
+    stripe = get_stripe()
+    try:
+        session = stripe.checkout.Session.create(
+            payment_method_types=["card"],
+            line_items=[
+                {
+                    "price_data": {
+                        "currency": currency,
+                        # Stripe требует сумму в копейках (центах)
+                        "unit_amount": int(item["amount"] * 100),
+                        "product_data": {
+                            "name": item["name"],
+                            "description": item["description"],
+                        },
+                    },
+                    "quantity": 1,
+                }
+                for item in items
+            ],
+            mode="payment",
+            success_url=success_url,
+            cancel_url=cancel_url,
+            metadata=metadata or {},
+            **_request_options(idempotency_key),
+        )
+        return session
+    except stripe.error.StripeError as e:
+        print(f"❌ Ошибка создания сессии корзины в Stripe: {e}")
+        raise
+
+
+@timed(STRIPE_LATENCY, STRIPE_ERRORS, operation="retrieve_session")
 def get_stripe_session_status(session_id):
     """
     Получает статус сессии оплаты.
@@ -99,6 +184,7 @@ def get_stripe_session_status(session_id):
     Returns:
         dict: Информация о статусе платежа
     """
+    stripe = get_stripe()
     try:
         session = stripe.checkout.Session.retrieve(session_id)
         return {
@@ -0,0 +1,316 @@
+"""
+Статистика задач Celery: ожидание в очереди, время выполнения, повторы и
+причины ошибок по именам задач (manage.py celery_stats).
+
+Обработчики сигналов только добавляют событие в буфер процесса. Буфер
+записывается в хранилище пачкой (один pipeline Redis или одна транзакция
+SQLite) по размеру или фоновым потоком раз в TASK_STATS_FLUSH_INTERVAL.
+Для каждой задачи хранятся последние TASK_STATS_SAMPLES событий.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import NamedTuple
+
+from django.conf import settings
+
+from .metrics import TASK_QUEUE_WAIT, TASK_RUNTIME
+from .queue_latency import save_latencies, task_latency, task_queue
+
+logger = logging.getLogger(__name__)
+
+TASKS_KEY = "task_stats:tasks"
+EVENTS_KEY = "task_stats:events:{task}"
+# События задачи, которая давно не выполнялась, удаляются из Redis
+EVENTS_TTL = 7 * 24 * 60 * 60
+
+
+class Event(NamedTuple):
+    at: float
+    queue: str
+    # Секунды в очереди (None - eager или старый клиент) и выполнения
+    wait: float | None
+    runtime: float
+    # SUCCESS, FAILURE или RETRY
+    state: str
+    # Класс исключения для FAILURE и RETRY
+    reason: str
+
+
+class RedisStore:
+    def write(self, events):
+        from .redis_client import get_redis
+
+        pipeline = get_redis().pipeline(transaction=False)
+        for task, task_events in events.items():
+            key = EVENTS_KEY.format(task=task)
+            pipeline.lpush(key, *(json.dumps(event) for event in task_events))
+            pipeline.ltrim(key, 0, settings.TASK_STATS_SAMPLES - 1)
+            pipeline.expire(key, EVENTS_TTL)
+        pipeline.sadd(TASKS_KEY, *events)
+        pipeline.execute()
+
+    def read(self):
+        from .redis_client import get_redis
+
+        redis = get_redis()
+        tasks = sorted(name.decode() for name in redis.smembers(TASKS_KEY))
+        pipeline = redis.pipeline(transaction=False)
+        for task in tasks:
+            pipeline.lrange(EVENTS_KEY.format(task=task), 0, -1)
+        return {
+            task: [Event(*json.loads(event)) for event in task_events]
+            for task, task_events in zip(tasks, pipeline.execute())
+            if task_events
+        }
+
+    def clear(self):
+        from .redis_client import get_redis
+
+        redis = get_redis()
+        tasks = [name.decode() for name in redis.smembers(TASKS_KEY)]
+        redis.delete(TASKS_KEY, *(EVENTS_KEY.format(task=task) for task in tasks))
+
+
+class SQLiteStore:
+    """
+    Файл SQLite, общий для процессов одного узла (без Redis, при разработке).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._pid = None
+
+    def connection(self):
+        # Соединение SQLite нельзя использовать после fork
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(
+                self.path, timeout=5, check_same_thread=False
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY, "
+                "task TEXT, at REAL, queue TEXT, wait REAL, runtime REAL, "
+                "state TEXT, reason TEXT)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS events_task ON events (task, id)"
+            )
+            self._pid = os.getpid()
+        return self._connection
+
+    def write(self, events):
+        with self.connection() as connection:
+            for task, task_events in events.items():
+                connection.executemany(
+                    "INSERT INTO events (task, at, queue, wait, runtime, state, "
+                    "reason) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(task, *event) for event in task_events],
+                )
+                connection.execute(
+                    "DELETE FROM events WHERE task = ? AND id <= (SELECT id FROM "
+                    "events WHERE task = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (task, task, settings.TASK_STATS_SAMPLES),
+                )
+
+    def read(self):
+        rows = self.connection().execute(
+            "SELECT task, at, queue, wait, runtime, state, reason FROM events "
+            "ORDER BY task, id DESC"
+        )
+        result = defaultdict(list)
+        for task, *event in rows:
+            result[task].append(Event(*event))
+        return dict(result)
+
+    def clear(self):
+        with self.connection() as connection:
+            connection.execute("DELETE FROM events")
+
+
+_store_lock = threading.Lock()
+_store = None
+
+
+def get_store():
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.TASK_STATS_BACKEND == "redis":
+                    _store = RedisStore()
+                else:
+                    _store = SQLiteStore(settings.TASK_STATS_SQLITE_PATH)
+    return _store
+
+
+_lock = threading.Lock()
+# task_id -> [время начала, ожидание в очереди, причина ошибки]
+_running = {}
+# Имя задачи -> события, ещё не записанные в хранилище
+_buffer = defaultdict(list)
+_buffered = 0
+# Очередь -> последнее ожидание в ней (manage.py queue_latency)
+_latest = {}
+_flusher_pid = None
+
+
+def task_started(task_id=None, task=None, **kwargs):
+    """
+    Обработчик task_prerun.
+    """
+    if task is None or getattr(task.request, "is_eager", False):
+        return
+    wait = task_latency(task)
+    _running[task_id] = [time.perf_counter(), wait, ""]
+    queue = task_queue(task)
+    if wait is None or not queue:
+        return
+    TASK_QUEUE_WAIT.labels(queue).observe(wait)
+    with _lock:
+        _latest[queue] = {
+            "latency": round(wait, 3),
+            "task": task.name,
+            "at": time.time(),
+        }
+
+
+def task_failed(task_id=None, exception=None, **kwargs):
+    """
+    Обработчик task_failure.
+    """
+    running = _running.get(task_id)
+    if running is not None:
+        running[2] = type(exception).__name__
+
+
+def task_retried(request=None, reason=None, **kwargs):
+    """
+    Обработчик task_retry: reason - исключение, из-за которого задача
+    повторяется, или текст.
+    """
+    running = _running.get(getattr(request, "id", None))
+    if running is not None:
+        running[2] = (
+            type(reason).__name__ if isinstance(reason, BaseException) else "Retry"
+        )
+
+
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    """
+    Обработчик task_postrun: событие в буфер, запись пачкой.
+    """
+    global _buffered
+
+    running = _running.pop(task_id, None)
+    if running is None:
+        return
+    started, wait, reason = running
+    runtime = time.perf_counter() - started
+    state = state or "UNKNOWN"
+    TASK_RUNTIME.labels(task.name, state).observe(runtime)
+
+    event = Event(time.time(), task_queue(task) or "", wait, runtime, state, reason)
+    with _lock:
+        _buffer[task.name].append(event)
+        _buffered += 1
+        full = _buffered >= settings.TASK_STATS_FLUSH_SIZE
+    if full:
+        flush()
+    else:
+        ensure_flusher()
+
+
+def flush():
+    """
+    Записывает накопленные события и последнее ожидание по очередям.
+    Ошибка хранилища не должна мешать задачам: данные пачки теряются.
+    """
+    global _buffer, _buffered, _latest
+
+    with _lock:
+        if not _buffered and not _latest:
+            return
+        events, _buffer, _buffered = _buffer, defaultdict(list), 0
+        latest, _latest = _latest, {}
+    try:
+        if events:
+            get_store().write(events)
+        if latest:
+            save_latencies(latest)
+    except Exception:
+        logger.warning("Не удалось записать статистику задач", exc_info=True)
+
+
+def flush_periodically():
+    while True:
+        time.sleep(settings.TASK_STATS_FLUSH_INTERVAL)
+        flush()
+
+
+def ensure_flusher():
+    """
+    Фоновый поток записи буфера (один на процесс, после fork - заново).
+    """
+    global _flusher_pid
+
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        thread = threading.Thread(
+            target=flush_periodically, name="task-stats-flush", daemon=True
+        )
+        thread.start()
+        _flusher_pid = os.getpid()
+
+
+def percentile(values, p):
+    """
+    Перцентиль p (0-100) методом ближайшего ранга, None для пустого списка.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(1, round(p / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def summarize(events):
+    """
+    Сводка по событиям одной задачи.
+
+    Returns:
+        dict: count, states (SUCCESS/FAILURE/RETRY -> число), reasons,
+            wait и runtime ({p50, p95, p99, max} в секундах)
+    """
+    states = defaultdict(int)
+    reasons = defaultdict(int)
+    for event in events:
+        states[event.state] += 1
+        if event.reason:
+            reasons[event.reason] += 1
+
+    def distribution(values):
+        return {
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values, default=None),
+        }
+
+    return {
+        "count": len(events),
+        "states": dict(states),
+        "reasons": dict(sorted(reasons.items(), key=lambda item: -item[1])),
+        "wait": distribution([e.wait for e in events if e.wait is not None]),
+        "runtime": distribution([e.runtime for e in events]),
+    }
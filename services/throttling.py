@@ -0,0 +1,230 @@
+import logging
+import math
+import threading
+import time
+from typing import NamedTuple
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .lru import LRUCache
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "throttle"
+
+# Все корзины проверяются и списываются одним вызовом скрипта:
+# токен списывается только если он есть в каждой корзине.
+# ARGV: пары (ёмкость, токенов в миллисекунду) для каждого ключа.
+# Возвращает время ожидания в мс (0 - запрос разрешён).
+TOKEN_BUCKET_LUA = """
+local now = redis.call("TIME")
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local wait = 0
+local tokens = {}
+
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local state = redis.call("HMGET", key, "tokens", "ts")
+    local value = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now_ms
+    value = math.min(capacity, value + math.max(0, now_ms - ts) * rate)
+    if value < 1 then
+        wait = math.max(wait, math.ceil((1 - value) / rate))
+    end
+    tokens[i] = value
+end
+
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local value = tokens[i]
+    if wait == 0 then
+        value = value - 1
+    end
+    redis.call("HSET", key, "tokens", tostring(value), "ts", now_ms)
+    redis.call("PEXPIRE", key, math.ceil(capacity / rate))
+end
+
+return wait
+"""
+
+DURATIONS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+class Bucket(NamedTuple):
+    key: str
+    capacity: int
+    duration: int  # секунды на полное восстановление
+
+    @property
+    def rate(self):
+        """Токенов в миллисекунду."""
+        return self.capacity / (self.duration * 1000)
+
+
+def parse_rate(rate):
+    """
+    Разбирает лимит в формате DRF: "10/min", "100/hour", "5/s".
+
+    Returns:
+        tuple: (количество запросов, период в секундах)
+    """
+    num, period = rate.split("/")
+    return int(num), DURATIONS[period[0]]
+
+
+class LocalBuckets:
+    """
+    Корзины в памяти процесса - запасной вариант без Redis.
+    Лимит считается на каждый процесс отдельно.
+    """
+
+    def __init__(self, maxsize):
+        self._store = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def consume(self, buckets):
+        now_ms = time.monotonic() * 1000
+        with self._lock:
+            tokens = []
+            wait = 0
+            for bucket in buckets:
+                value, ts = self._store.get(bucket.key, (bucket.capacity, now_ms))
+                value = min(bucket.capacity, value + (now_ms - ts) * bucket.rate)
+                if value < 1:
+                    wait = max(wait, math.ceil((1 - value) / bucket.rate))
+                tokens.append(value)
+
+            for bucket, value in zip(buckets, tokens):
+                if wait == 0:
+                    value -= 1
+                self._store.set(bucket.key, (value, now_ms), ttl=bucket.duration)
+        return wait
+
+    def clear(self):
+        self._store.clear()
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket: одна проверка - один вызов Lua-скрипта в Redis.
+    Если Redis недоступен, лимиты считаются в памяти процесса,
+    а к Redis не обращаемся THROTTLE_REDIS_RETRY секунд.
+    """
+
+    def __init__(self):
+        self._script = None
+        self._redis_down_until = 0
+        self._local = None
+
+    @property
+    def local(self):
+        if self._local is None:
+            self._local = LocalBuckets(settings.THROTTLE_LOCAL_MAX_KEYS)
+        return self._local
+
+    def _redis(self):
+        if settings.THROTTLE_BACKEND != "redis":
+            return None
+        if time.monotonic() < self._redis_down_until:
+            return None
+        return get_redis()
+
+    def consume(self, buckets):
+        """
+        Списывает по токену из каждой корзины.
+
+        Returns:
+            float: Сколько секунд ждать (0 - запрос разрешён)
+        """
+        client = self._redis()
+        if client is not None:
+            import redis
+
+            if self._script is None:
+                self._script = client.register_script(TOKEN_BUCKET_LUA)
+            args = []
+            for bucket in buckets:
+                args += [bucket.capacity, repr(bucket.rate)]
+            try:
+                wait_ms = self._script(
+                    keys=[bucket.key for bucket in buckets], args=args, client=client
+                )
+            except redis.RedisError:
+                logger.warning("Redis недоступен, лимиты считаются локально")
+                self._redis_down_until = (
+                    time.monotonic() + settings.THROTTLE_REDIS_RETRY
+                )
+            else:
+                return int(wait_ms) / 1000
+        return self.local.consume(buckets) / 1000
+
+    def reset(self):
+        """
+        Сбрасывает локальные корзины (для тестов).
+        """
+        self.local.clear()
+        self._redis_down_until = 0
+
+
+limiter = TokenBucketLimiter()
+
+
+def scope_buckets(scope, user_id, ident):
+    """
+    Корзины для области: по пользователю (rate "<scope>") и по IP
+    (rate "<scope>_ip"). Анонимные запросы ограничиваются по IP
+    лимитом "<scope>", если отдельного лимита для IP нет.
+    """
+    rates = api_settings.DEFAULT_THROTTLE_RATES or {}
+    user_rate = rates.get(scope)
+    ip_rate = rates.get(f"{scope}_ip")
+
+    buckets = []
+    if user_id is not None and user_rate:
+        buckets.append(
+            Bucket(f"{KEY_PREFIX}:{scope}:user:{user_id}", *parse_rate(user_rate))
+        )
+    if user_id is None:
+        ip_rate = ip_rate or user_rate
+    if ip_rate:
+        buckets.append(Bucket(f"{KEY_PREFIX}:{scope}:ip:{ident}", *parse_rate(ip_rate)))
+    return buckets
+
+
+def throttle_wait(scope, request, user_id=None):
+    """
+    Проверяет лимиты области для запроса (в т.ч. вне DRF).
+
+    Returns:
+        float: Сколько секунд ждать (0 - запрос разрешён)
+    """
+    buckets = scope_buckets(scope, user_id, BaseThrottle().get_ident(request))
+    if not buckets:
+        return 0
+    return limiter.consume(buckets)
+
+
+class ScopedTokenBucketThrottle(BaseThrottle):
+    """
+    Ограничение частоты запросов для view с атрибутом throttle_scope.
+    Лимиты задаются в REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"];
+    view без области или без лимита не ограничиваются и не ходят в Redis.
+    """
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        if not scope:
+            return True
+
+        user = request.user
+        user_id = user.pk if user and user.is_authenticated else None
+        self.wait_seconds = throttle_wait(scope, request, user_id)
+        return self.wait_seconds == 0
+
+    def wait(self):
+        return self.wait_seconds
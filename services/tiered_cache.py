@@ -0,0 +1,347 @@
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Канал Redis для сброса локальных уровней на других узлах
+CHANNEL = "tiered_cache:invalidate"
+VERSION_KEY = "tiered_cache:version:{namespace}"
+LOCK_KEY = "tiered_cache:lock:{key}"
+
+# Идентификатор процесса: свои сообщения из канала не обрабатываются
+_node_id = uuid.uuid4().hex
+
+_namespaces = {}
+_stats_lock = threading.Lock()
+_stats = Counter()
+_listener_lock = threading.Lock()
+_listener_pid = None
+
+STAT_NAMES = (
+    "local_hits",
+    "shared_hits",
+    "misses",
+    "early_recomputes",
+    "lock_waits",
+)
+
+
+class Entry(NamedTuple):
+    value: Any
+    # Сколько секунд заняло вычисление (для раннего пересчёта)
+    delta: float
+    # Время истечения по часам (time.time), общее для всех узлов
+    expires_at: float
+
+
+def record(namespace, name, count=1):
+    with _stats_lock:
+        _stats[namespace, name] += count
+
+
+def cache_stats():
+    """
+    Попадания и промахи по пространствам имён с момента запуска процесса.
+
+    Returns:
+        dict: namespace -> {local_hits, shared_hits, misses, ..., hit_ratio}
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    result = {}
+    for namespace in _namespaces:
+        counters = {name: stats.get((namespace, name), 0) for name in STAT_NAMES}
+        requests = counters["local_hits"] + counters["shared_hits"] + counters["misses"]
+        hits = counters["local_hits"] + counters["shared_hits"]
+        counters["hit_ratio"] = round(hits / requests, 4) if requests else None
+        result[namespace] = counters
+    return result
+
+
+class TieredCache:
+    """
+    Двухуровневый кеш: LRU в памяти процесса перед общим кешем (Redis).
+
+    Ключи версионируются: namespace:<version>.<generation>:key, где version -
+    версия формата данных в коде, а generation увеличивается при сбросе
+    всего пространства имён (invalidate_all).
+
+    Защита от лавины запросов: значение пересчитывается заранее с
+    вероятностью, растущей к концу срока жизни (XFetch), а при промахе
+    вычисляет только один процесс (блокировка через cache.add),
+    остальные ждут результата.
+
+    Сброс ключей удаляет их из общего кеша и рассылает через pub/sub Redis,
+    чтобы остальные узлы убрали их из локального уровня.
+
+    Значения из локального уровня общие для всех потоков процесса -
+    изменять их нельзя, только копировать.
+    """
+
+    def __init__(
+        self,
+        namespace,
+        version=1,
+        timeout=300,
+        local_timeout=None,
+        local_maxsize=None,
+        lock_timeout=5,
+        beta=1.0,
+    ):
+        self.namespace = namespace
+        self.version = version
+        self.timeout = timeout
+        self.local_timeout = (
+            settings.TIERED_CACHE_LOCAL_TIMEOUT
+            if local_timeout is None
+            else local_timeout
+        )
+        self.lock_timeout = lock_timeout
+        self.beta = beta
+        self._local = LRUCache(
+            maxsize=local_maxsize or settings.TIERED_CACHE_LOCAL_SIZE,
+            ttl=self.local_timeout,
+        )
+        self._generation = None
+        self._generation_checked = 0
+        _namespaces[namespace] = self
+
+    def generation(self):
+        # Поколение читается из общего кеша не чаще local_timeout,
+        # сообщение из канала сбрасывает его сразу
+        now = time.monotonic()
+        if self._generation is None or now - self._generation_checked > (
+            self.local_timeout
+        ):
+            key = VERSION_KEY.format(namespace=self.namespace)
+            self._generation = cache.get_or_set(key, 1, timeout=None)
+            self._generation_checked = now
+        return self._generation
+
+    def make_key(self, key):
+        return f"{self.namespace}:{self.version}.{self.generation()}:{key}"
+
+    def should_recompute(self, entry):
+        # XFetch: чем ближе истечение и дороже вычисление, тем вероятнее
+        # пересчитать заранее (-log(random) > 0)
+        early = -entry.delta * self.beta * math.log(random.random() or 1e-12)
+        return time.time() + early >= entry.expires_at
+
+    def get_or_set(self, key, compute, timeout=None):
+        """
+        Значение из кеша или результат compute() (он может вернуть None,
+        такой результат тоже кешируется).
+        """
+        ensure_listener()
+        full_key = self.make_key(key)
+
+        entry = self._local.get(full_key)
+        if entry is not None and not self.should_recompute(entry):
+            record(self.namespace, "local_hits")
+            return entry.value
+
+        entry = cache.get(full_key)
+        if entry is not None:
+            if not self.should_recompute(entry):
+                record(self.namespace, "shared_hits")
+                self.set_local(full_key, entry)
+                return entry.value
+            # Пересчитывает один процесс, остальные пока отдают текущее значение
+            if not self.acquire(full_key):
+                record(self.namespace, "shared_hits")
+                return entry.value
+            record(self.namespace, "early_recomputes")
+            return self.compute_and_release(full_key, compute, timeout)
+
+        record(self.namespace, "misses")
+        if self.acquire(full_key):
+            return self.compute_and_release(full_key, compute, timeout)
+
+        record(self.namespace, "lock_waits")
+        entry = self.wait(full_key)
+        if entry is not None:
+            self.set_local(full_key, entry)
+            return entry.value
+        # Вычисляющий процесс не успел или упал - считаем сами
+        return self.compute_and_store(full_key, compute, timeout)
+
+    def acquire(self, full_key):
+        return cache.add(LOCK_KEY.format(key=full_key), _node_id, self.lock_timeout)
+
+    def wait(self, full_key):
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(full_key)
+            if entry is not None:
+                return entry
+        return None
+
+    def compute_and_release(self, full_key, compute, timeout):
+        try:
+            return self.compute_and_store(full_key, compute, timeout)
+        finally:
+            cache.delete(LOCK_KEY.format(key=full_key))
+
+    def compute_and_store(self, full_key, compute, timeout):
+        started = time.monotonic()
+        value = compute()
+        delta = time.monotonic() - started
+        timeout = self.timeout if timeout is None else timeout
+        entry = Entry(value, delta, time.time() + timeout)
+        cache.set(full_key, entry, timeout)
+        self.set_local(full_key, entry)
+        return value
+
+    def set_local(self, full_key, entry):
+        ttl = min(self.local_timeout, entry.expires_at - time.time())
+        if ttl > 0:
+            self._local.set(full_key, entry, ttl=ttl)
+
+    def get_many(self, keys):
+        """
+        Значения для найденных ключей: {key: value}, без защиты от лавины
+        (для пакетной загрузки, которая сама добирает недостающее).
+        """
+        ensure_listener()
+        found = {}
+        full_keys = {}
+        for key in keys:
+            full_key = self.make_key(key)
+            entry = self._local.get(full_key)
+            if entry is not None:
+                found[key] = entry.value
+            else:
+                full_keys[full_key] = key
+        record(self.namespace, "local_hits", len(found))
+
+        if full_keys:
+            shared = cache.get_many(list(full_keys))
+            for full_key, entry in shared.items():
+                self.set_local(full_key, entry)
+                found[full_keys[full_key]] = entry.value
+            record(self.namespace, "shared_hits", len(shared))
+            record(self.namespace, "misses", len(full_keys) - len(shared))
+        return found
+
+    def set_many(self, values, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        expires_at = time.time() + timeout
+        entries = {
+            self.make_key(key): Entry(value, 0, expires_at)
+            for key, value in values.items()
+        }
+        cache.set_many(entries, timeout)
+        for full_key, entry in entries.items():
+            self.set_local(full_key, entry)
+
+    def invalidate(self, *keys):
+        """
+        Сбрасывает ключи во всех уровнях и на всех узлах.
+        """
+        if not keys:
+            return
+        full_keys = [self.make_key(key) for key in keys]
+        for full_key in full_keys:
+            self._local.delete(full_key)
+        cache.delete_many(full_keys)
+        publish({"namespace": self.namespace, "keys": full_keys})
+
+    def invalidate_all(self):
+        """
+        Сбрасывает всё пространство имён: новое поколение ключей.
+        """
+        key = VERSION_KEY.format(namespace=self.namespace)
+        try:
+            self._generation = cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=None)
+            self._generation = cache.incr(key)
+        self._generation_checked = time.monotonic()
+        self._local.clear()
+        publish({"namespace": self.namespace, "all": True})
+
+    def apply_message(self, message):
+        if message.get("all"):
+            self._generation = None
+            self._local.clear()
+        for full_key in message.get("keys", ()):
+            self._local.delete(full_key)
+
+
+def publish(message):
+    if not settings.TIERED_CACHE_PUBSUB:
+        return
+    from redis.exceptions import RedisError
+
+    from .redis_client import get_redis
+
+    try:
+        get_redis().publish(CHANNEL, json.dumps({**message, "node": _node_id}))
+    except RedisError:
+        # Другие узлы увидят изменения по истечении локального TTL
+        logger.warning("Не удалось разослать сброс кеша", exc_info=True)
+
+
+def handle_message(data):
+    message = json.loads(data)
+    if message.get("node") == _node_id:
+        return
+    namespace = _namespaces.get(message.get("namespace"))
+    if namespace is not None:
+        namespace.apply_message(message)
+
+
+def listen():
+    from redis.exceptions import RedisError
+
+    from .redis_client import get_redis
+
+    while True:
+        try:
+            pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CHANNEL)
+            while True:
+                message = pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    handle_message(message["data"])
+        except RedisError:
+            # Пока нет подписки, сообщения теряются - локальные уровни
+            # очищаются, чтобы не отдавать пропущенные изменения
+            for namespace in list(_namespaces.values()):
+                namespace._local.clear()
+            time.sleep(1)
+        except Exception:
+            logger.exception("Ошибка обработки сообщения сброса кеша")
+
+
+def ensure_listener():
+    """
+    Запускает подписку на канал сброса (один поток на процесс,
+    после fork - заново в дочернем процессе).
+    """
+    global _listener_pid
+
+    if not settings.TIERED_CACHE_PUBSUB or _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        thread = threading.Thread(
+            target=listen, name="tiered-cache-invalidation", daemon=True
+        )
+        thread.start()
+        _listener_pid = os.getpid()
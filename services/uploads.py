@@ -0,0 +1,236 @@
+"""
+Приём изображений без чтения файла в память (POST /api/uploads/).
+
+Файл пишется на диск частями: из multipart - обработчиком
+ImageUploadHandler во временный файл, из PATCH-запросов докачки - прямо
+в файл загрузки в UPLOAD_STAGING_DIR. Формат и размеры проверяются по
+заголовку изображения в первых байтах файла, без декодирования пикселей:
+неподходящий файл отклоняется, не дочитав тело запроса. В поле объекта
+файл переносит задача Celery, уменьшенные копии - services.images.
+"""
+
+import os
+from io import BytesIO
+from pathlib import Path
+from typing import NamedTuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import (
+    SkipFile,
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+
+# Формат Pillow -> расширение сохраняемого файла
+FORMATS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+# Сколько байт начала файла может понадобиться для разбора заголовка
+# (в JPEG размеры идут после EXIF и цветового профиля)
+HEADER_LIMIT = 256 * 2**10
+# Размер части при записи на диск
+COPY_CHUNK_SIZE = 64 * 2**10
+
+# Назначение загрузки -> (модель, поле изображения)
+TARGETS = {
+    "course": ("materials.Course", "preview"),
+    "lesson": ("materials.Lesson", "preview"),
+    "avatar": ("users.User", "avatar"),
+}
+
+
+class UploadRejected(Exception):
+    """
+    Файл не подходит: не изображение, другой формат или слишком большой.
+    """
+
+
+class ImageInfo(NamedTuple):
+    format: str
+    width: int
+    height: int
+
+
+def check_image(info):
+    if info.width * info.height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise UploadRejected(
+            f"Слишком большое изображение: {info.width}x{info.height}, "
+            f"допустимо до {settings.IMAGE_UPLOAD_MAX_PIXELS} пикселей"
+        )
+    return info
+
+
+def read_header(data, complete=False):
+    """
+    Формат и размеры изображения по началу файла data (bytes).
+
+    Returns:
+        ImageInfo или None, если данных пока мало (complete=False -
+        файл получен не целиком)
+
+    Raises:
+        UploadRejected
+    """
+    from PIL import Image
+
+    try:
+        # open() разбирает только заголовок, пиксели не декодируются
+        with Image.open(BytesIO(data), formats=list(FORMATS)) as image:
+            info = ImageInfo(image.format, image.width, image.height)
+    except Image.DecompressionBombError:
+        raise UploadRejected("Слишком большое изображение")
+    except Exception:
+        if complete or len(data) >= HEADER_LIMIT:
+            raise UploadRejected(f"Файл не является изображением {', '.join(FORMATS)}")
+        return None
+    return check_image(info)
+
+
+def read_file_header(path, length, complete=False):
+    with open(path, "rb") as file:
+        return read_header(file.read(min(length, HEADER_LIMIT)), complete)
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Обработчик multipart для одного изображения в поле field_name.
+
+    Файл пишется во временный файл частями по chunk_size; заголовок
+    проверяется, как только пришло достаточно байт, и неподходящий файл
+    пропускается без записи остатка. Больше IMAGE_UPLOAD_MAX_SIZE -
+    разбор запроса прерывается. Причина отказа - в error, сведения об
+    изображении - в атрибуте image_info принятого файла.
+    """
+
+    chunk_size = COPY_CHUNK_SIZE
+
+    def __init__(self, request=None, field_name="file"):
+        super().__init__(request)
+        self.field_name = field_name
+        self.error = None
+        self.info = None
+        self.header = b""
+        self.received = 0
+
+    def new_file(self, field_name, *args, **kwargs):
+        if field_name != self.field_name or self.info is not None:
+            self.error = f"Ожидается один файл в поле {self.field_name}"
+            raise StopUpload(connection_reset=True)
+        super().new_file(field_name, *args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.error = f"Файл больше {settings.IMAGE_UPLOAD_MAX_SIZE // 2**20} МБ"
+            raise StopUpload(connection_reset=True)
+        if self.info is None:
+            self.header += raw_data[: HEADER_LIMIT - len(self.header)]
+            try:
+                self.info = read_header(self.header)
+            except UploadRejected as e:
+                self.error = str(e)
+                raise SkipFile
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.info is None:
+            # Файл короче, чем нужно для разбора заголовка по частям
+            try:
+                self.info = read_header(self.header, complete=True)
+            except UploadRejected as e:
+                self.error = str(e)
+                self.file.close()
+                return None
+        file = super().file_complete(file_size)
+        file.image_info = self.info
+        return file
+
+
+def staging_dir():
+    path = Path(settings.UPLOAD_STAGING_DIR or Path(settings.MEDIA_ROOT, ".uploads"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def staging_path(upload_id):
+    """
+    Файл загрузки: общий для веб-процессов и воркеров Celery (один том).
+    """
+    return staging_dir() / str(upload_id)
+
+
+def write_chunk(path, stream, offset, length):
+    """
+    Дописывает в файл path с позиции offset до length байт из stream
+    частями по COPY_CHUNK_SIZE. Обрыв соединения не ошибка: принятые
+    байты остаются, клиент продолжит с нового смещения.
+
+    Returns:
+        int: сколько байт записано
+    """
+    written = 0
+    with open(path, "r+b") as file:
+        file.seek(offset)
+        while written < length:
+            try:
+                data = stream.read(min(COPY_CHUNK_SIZE, length - written))
+            except OSError:
+                break
+            if not data:
+                break
+            file.write(data)
+            written += len(data)
+    return written
+
+
+def remove_staged(upload_id):
+    try:
+        os.remove(staging_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+
+def get_target(target):
+    model, field_name = TARGETS[target]
+    return apps.get_model(model), field_name
+
+
+def attach_upload(upload):
+    """
+    Проверяет файл загрузки и сохраняет его в поле изображения объекта.
+
+    Проверка - по заголовку и Image.verify() (целостность PNG потоково,
+    без декодирования); копирование в хранилище частями. Память воркера
+    не зависит от размера файла.
+
+    Returns:
+        str: имя файла в хранилище
+
+    Raises:
+        UploadRejected, ObjectDoesNotExist
+    """
+    from PIL import Image
+
+    model, field_name = get_target(upload.target)
+    instance = model.objects.get(pk=upload.object_id)
+    path = staging_path(upload.pk)
+    with open(path, "rb") as file:
+        info = read_header(file.read(HEADER_LIMIT), complete=True)
+        file.seek(0)
+        try:
+            with Image.open(file, formats=[info.format]) as image:
+                image.verify()
+        except Exception:
+            raise UploadRejected("Файл изображения повреждён")
+        file.seek(0)
+
+        field = getattr(instance, field_name)
+        stem = Path(upload.filename).stem or str(upload.pk)
+        field.save(f"{stem}{FORMATS[info.format]}", File(file), save=False)
+
+    # Сигнал post_save ставит задачу уменьшенных копий
+    update_fields = [field_name]
+    if any(f.name == "updated_at" for f in model._meta.fields):
+        update_fields.append("updated_at")
+    instance.save(update_fields=update_fields)
+    return field.name
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_safe
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .db_pool import pool_stats
+from .metrics import export
+from .tiered_cache import cache_stats
+
+
+class DatabasePoolStatsAPIView(APIView):
+    """
+    Статистика соединений с БД процесса, обработавшего запрос:
+    выдачи, ожидания и таймауты пула или число открытых соединений.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(pool_stats())
+
+
+class CacheStatsAPIView(APIView):
+    """
+    Попадания и промахи многоуровневого кеша процесса по пространствам имён.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats())
+
+
+@require_safe
+def metrics_view(request):
+    """
+    Метрики в текстовом формате Prometheus. Если задан METRICS_TOKEN,
+    нужен заголовок Authorization: Bearer <токен>; без токена метрики
+    доступны только с DEBUG.
+    """
+    if not settings.METRICS_TOKEN:
+        if not settings.DEBUG:
+            raise Http404
+    elif not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        return HttpResponse(status=401)
+    content, content_type = export()
+    return HttpResponse(content, content_type=content_type)
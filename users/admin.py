@@ -1,15 +1,23 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import Q
 
+from materials.models import Course, Lesson
+
+from .admin_filters import related_id_filter
 from .models import User
+from .paginators import EstimatedCountPaginator
+from .search import USER_SEARCH_FIELDS, get_search_backend
 
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
     list_display = ("email", "first_name", "last_name", "is_staff")
     list_filter = ("is_staff", "is_superuser", "is_active")
-    search_fields = ("email", "first_name", "last_name")
+    search_fields = USER_SEARCH_FIELDS
     ordering = ("email",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         (None, {"fields": ("email", "password")}),
@@ -42,6 +50,15 @@ class CustomUserAdmin(UserAdmin):
         ),
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск через SEARCH_BACKEND (в т.ч. для autocomplete в других админках)
+        if not search_term:
+            return queryset, False
+        return (
+            get_search_backend().search(queryset, self.search_fields, search_term),
+            False,
+        )
+
 
 from .models import Payment  # Добавь этот импорт вверху файла
 
@@ -56,6 +73,42 @@ class PaymentAdmin(admin.ModelAdmin):
         "amount",
         "payment_method",
     )
-    list_filter = ("payment_method", "payment_date", "course", "lesson")
-    search_fields = ("user__email", "course__title", "lesson__title")
-    date_hierarchy = "payment_date"
+    list_select_related = ("user", "course", "lesson")
+    # Фильтры по ID вместо списка всех курсов и уроков в боковой панели;
+    # date_hierarchy не используется - он делает DISTINCT по всей таблице
+    list_filter = (
+        "payment_method",
+        "payment_date",
+        related_id_filter("course", "курсу"),
+        related_id_filter("lesson", "уроку"),
+        related_id_filter("user", "пользователю"),
+    )
+    search_fields = (
+        "user__email",
+        "course__title",
+        "lesson__title",
+        "stripe_session_id",
+    )
+    autocomplete_fields = ("user", "course", "lesson")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Вместо LIKE по соединению таблиц: пользователи, курсы и уроки
+        ищутся по своим индексам, платежи - по индексам на user/course/lesson.
+        """
+        if not search_term:
+            return queryset, False
+
+        backend = get_search_backend()
+        users = backend.search(User.objects.all(), USER_SEARCH_FIELDS, search_term)
+        courses = backend.search(Course.objects.all(), ("title",), search_term)
+        lessons = backend.search(Lesson.objects.all(), ("title",), search_term)
+        condition = (
+            Q(user__in=users.values("pk"))
+            | Q(course__in=courses.values("pk"))
+            | Q(lesson__in=lessons.values("pk"))
+            | Q(stripe_session_id=search_term.strip())
+        )
+        return queryset.filter(condition), False
@@ -0,0 +1,44 @@
+from urllib.parse import parse_qsl
+
+from django.contrib import admin
+
+
+class RelatedIdFilter(admin.SimpleListFilter):
+    """
+    Фильтр списка в админке по ID связанного объекта (поле ввода).
+    В отличие от стандартного фильтра по ForeignKey не выводит
+    в боковую панель все связанные объекты.
+    """
+
+    template = "admin/related_id_filter.html"
+    field_name = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value and value.isdigit():
+            return queryset.filter(**{self.field_name: value})
+        return queryset
+
+    def choices(self, changelist):
+        reset_query_string = changelist.get_query_string(remove=[self.parameter_name])
+        yield {
+            "reset_query_string": reset_query_string,
+            "hidden_params": parse_qsl(reset_query_string.lstrip("?")),
+        }
+
+
+def related_id_filter(field_name, title):
+    """
+    Создаёт RelatedIdFilter для поля: related_id_filter("course", "курсу").
+    """
+    return type(
+        f"{field_name.title()}IdFilter",
+        (RelatedIdFilter,),
+        {"field_name": field_name, "parameter_name": field_name, "title": title},
+    )
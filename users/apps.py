@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "users"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from services.db_pool import count_connection
+
+        from . import signals  # noqa: F401
+
+        connection_created.connect(count_connection)
@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from services.db_router import primary_reads
+from services.lru import LRUCache
+
+from .models import User
+from .permissions import ais_moderator, is_moderator
+
+CACHE_KEY = "auth_user:{user_id}"
+# Поля пользователя в кеше - только нужные для аутентификации и прав.
+# Хеш пароля и данные профиля в общий кеш не попадают: у собранного из
+# кеша пользователя остальные поля отложены и читаются из БД при обращении
+CACHED_FIELDS = ("id", "is_active", "is_staff", "is_superuser")
+
+# Локальный уровень: живёт секунды, чтобы изменения с других узлов
+# (деактивация, смена групп) доходили быстро
+_local = LRUCache(
+    maxsize=getattr(settings, "AUTH_USER_LOCAL_CACHE_SIZE", 1024),
+    ttl=getattr(settings, "AUTH_USER_LOCAL_CACHE_TIMEOUT", 10),
+)
+
+
+def dump_user(user, moderator):
+    """
+    Данные пользователя для кеша (без хеша пароля).
+    """
+    return {
+        "fields": [getattr(user, field) for field in CACHED_FIELDS],
+        "is_moderator": moderator,
+        # Для проверки отзыва токена (CHECK_REVOKE_TOKEN) хватает md5 хеша
+        "password_md5": get_md5_hash_password(user.password),
+    }
+
+
+def load_user(data):
+    """
+    Пользователь из данных кеша: новый объект на каждый запрос.
+    """
+    values = dict(zip(CACHED_FIELDS, data["fields"]))
+    # from_db ждёт значения в порядке полей модели
+    names = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+    user = User.from_db("default", names, [values[name] for name in names])
+    user._is_moderator = data["is_moderator"]
+    user._password_md5 = data["password_md5"]
+    return user
+
+
+def get_cached_user(user_id):
+    """
+    Пользователь для аутентификации: локальный LRU -> общий кеш -> БД.
+
+    Returns:
+        User | None: Пользователь или None, если его нет в БД
+    """
+    key = CACHE_KEY.format(user_id=user_id)
+
+    data = _local.get(key)
+    if data is None:
+        data = cache.get(key)
+        if data is None:
+            # Не с реплики: отставшая вернула бы в кеш данные, сброшенные
+            # invalidate_user (деактивация, снятая роль модератора)
+            with primary_reads():
+                user = User.objects.filter(pk=user_id).first()
+                if user is None:
+                    return None
+                data = dump_user(user, is_moderator(user))
+            cache.set(key, data, settings.AUTH_USER_CACHE_TIMEOUT)
+        _local.set(key, data)
+
+    return load_user(data)
+
+
+async def aget_cached_user(user_id):
+    """
+    Асинхронный вариант get_cached_user (async-кеш и async ORM).
+    """
+    key = CACHE_KEY.format(user_id=user_id)
+
+    data = _local.get(key)
+    if data is None:
+        data = await cache.aget(key)
+        if data is None:
+            with primary_reads():
+                user = await User.objects.filter(pk=user_id).afirst()
+                if user is None:
+                    return None
+                data = dump_user(user, await ais_moderator(user))
+            await cache.aset(key, data, settings.AUTH_USER_CACHE_TIMEOUT)
+        _local.set(key, data)
+
+    return load_user(data)
+
+
+def invalidate_user(*user_ids):
+    """
+    Сбрасывает закешированных пользователей (после сохранения,
+    деактивации или смены групп).
+    """
+    keys = [CACHE_KEY.format(user_id=user_id) for user_id in user_ids]
+    for key in keys:
+        _local.delete(key)
+    if keys:
+        cache.delete_many(keys)
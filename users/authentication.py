@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .auth_cache import aget_cached_user, get_cached_user
+
+# Claim с ролью модератора в access-токене (режим AUTH_STATELESS_ROLES)
+MODERATOR_CLAIM = "is_moderator"
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация, которая берёт пользователя из кеша
+    (локальный LRU + Redis), а не из БД на каждый запрос.
+
+    В режиме AUTH_STATELESS_ROLES роль модератора берётся из claim токена,
+    выданного при логине, без запроса к группам.
+    """
+
+    def get_user(self, validated_token):
+        return self.check_user(
+            get_cached_user(self.get_user_id(validated_token)), validated_token
+        )
+
+    async def aauthenticate(self, request):
+        """
+        Асинхронная аутентификация для async view: разбор токена
+        не обращается к БД, пользователь берётся через async-кеш.
+
+        Returns:
+            tuple | None: (user, validated_token) или None без заголовка
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        user = await aget_cached_user(self.get_user_id(validated_token))
+        return self.check_user(user, validated_token), validated_token
+
+    @staticmethod
+    def get_user_id(validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+    @staticmethod
+    def check_user(user, validated_token):
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            password_md5 = getattr(user, "_password_md5", None)
+            if password_md5 is None:
+                password_md5 = get_md5_hash_password(user.password)
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != password_md5:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        if settings.AUTH_STATELESS_ROLES and MODERATOR_CLAIM in validated_token:
+            user._is_moderator = bool(validated_token[MODERATOR_CLAIM])
+
+        return user
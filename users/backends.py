@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+from rest_framework.request import Request
+
+from .hashing import (
+    HashingPoolBusy,
+    acheck_password,
+    amake_password,
+    check_password,
+    make_password,
+    needs_rehash,
+)
+
+
+def handles_api_exceptions(request):
+    """
+    Ответит ли вызывающий на HashingPoolBusy сам (503 с Retry-After):
+    представления DRF и AsyncAPIView.
+    """
+    return isinstance(request, Request) or getattr(
+        request, "handles_api_exceptions", False
+    )
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend, который проверяет пароль в общем ограниченном пуле
+    хеширования, а не в потоке (или event loop) обработчика запроса.
+
+    Переполненный пул в DRF даёт 503; в админке и других вызовах вне API
+    попытка входа отклоняется (PermissionDenied), а не падает с 500.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        try:
+            return self._authenticate(request, username, password, **kwargs)
+        except HashingPoolBusy:
+            if handles_api_exceptions(request):
+                raise
+            raise PermissionDenied
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        try:
+            return await self._aauthenticate(request, username, password, **kwargs)
+        except HashingPoolBusy:
+            if handles_api_exceptions(request):
+                raise
+            raise PermissionDenied
+
+    def _authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Хешируем впустую, чтобы время ответа не выдавало наличие email
+            make_password(password)
+            return None
+
+        if not check_password(password, user.password):
+            return None
+        if needs_rehash(user.password):
+            user.password = make_password(password)
+            user.save(update_fields=["password"])
+        return user if self.user_can_authenticate(user) else None
+
+    async def _aauthenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            await amake_password(password)
+            return None
+
+        if not await acheck_password(password, user.password):
+            return None
+        if needs_rehash(user.password):
+            user.password = await amake_password(password)
+            await user.asave(update_fields=["password"])
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,113 @@
+import csv
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Колонки выгрузки платежей (values_list, без создания объектов модели)
+EXPORT_FIELDS = (
+    "id",
+    "user__email",
+    "payment_date",
+    "course_id",
+    "lesson_id",
+    "amount",
+    "payment_method",
+    "stripe_session_id",
+    "stripe_payment_status",
+)
+EXPORT_HEADER = (
+    "id",
+    "user_email",
+    "payment_date",
+    "course_id",
+    "lesson_id",
+    "amount",
+    "payment_method",
+    "stripe_session_id",
+    "stripe_payment_status",
+)
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class _LineBuffer:
+    """
+    Псевдофайл для csv.writer: возвращает записанную строку, а не копит её.
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, chunk_size=None):
+    """
+    Строки платежей через серверный курсор: в памяти одновременно
+    находится не больше chunk_size строк.
+    """
+    chunk_size = chunk_size or settings.PAYMENT_EXPORT_CHUNK_SIZE
+    return (
+        queryset.order_by("id")
+        .values_list(*EXPORT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def csv_lines(rows):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(EXPORT_HEADER).encode("utf-8")
+    for row in rows:
+        yield writer.writerow(row).encode("utf-8")
+
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield (encoder.encode(dict(zip(EXPORT_HEADER, row))) + "\n").encode("utf-8")
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Сжимает поток на лету в формат gzip.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def buffered(chunks, size=64 * 1024):
+    """
+    Склеивает мелкие строки в блоки, чтобы не отправлять клиенту
+    отдельный кусок на каждую строку.
+    """
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b"".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def export_stream(queryset, export_format="csv", compress=False, chunk_size=None):
+    """
+    Генератор байтов выгрузки платежей в CSV или NDJSON (опционально gzip).
+    """
+    rows = export_rows(queryset, chunk_size)
+    if export_format == "ndjson":
+        lines = ndjson_lines(rows)
+    else:
+        lines = csv_lines(rows)
+
+    chunks = buffered(lines)
+    if compress:
+        chunks = gzip_chunks(chunks)
+    return chunks
@@ -12,4 +12,6 @@ class PaymentFilter(django_filters.FilterSet):
             "course": ["exact"],
             "lesson": ["exact"],
             "payment_method": ["exact"],
+            "payment_date": ["gte", "lte"],
+            "amount": ["gte", "lte"],
         }
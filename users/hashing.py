@@ -0,0 +1,112 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingPoolBusy(APIException):
+    """
+    Очередь на хеширование паролей заполнена - запрос лучше отклонить,
+    чем ждать и занимать воркер.
+    """
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Сервис перегружен, повторите попытку позже."
+    default_code = "hashing_pool_busy"
+    wait = 1  # секунд для заголовка Retry-After
+
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+
+
+def init_process():
+    # В дочернем процессе (spawn) Django ещё не настроен
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_lms_project.settings")
+    django.setup()
+
+
+def get_executor():
+    """
+    Общий ограниченный пул для PBKDF2. hashlib отпускает GIL во время
+    хеширования, поэтому по умолчанию хватает потоков; для других
+    хешеров можно включить процессы (PASSWORD_HASHING_EXECUTOR=process).
+    """
+    global _executor, _slots
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                workers = settings.PASSWORD_HASHING_WORKERS
+                _slots = threading.BoundedSemaphore(
+                    workers + settings.PASSWORD_HASHING_QUEUE
+                )
+                if settings.PASSWORD_HASHING_EXECUTOR == "process":
+                    _executor = ProcessPoolExecutor(workers, initializer=init_process)
+                else:
+                    _executor = ThreadPoolExecutor(
+                        workers, thread_name_prefix="password-hashing"
+                    )
+    return _executor
+
+
+def _submit(func, *args):
+    executor = get_executor()
+    if not _slots.acquire(blocking=False):
+        raise HashingPoolBusy
+    try:
+        future = executor.submit(func, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def run_hashing(func, *args):
+    """
+    Выполняет хеширование в пуле и ждёт результат (для синхронного кода).
+    """
+    return _submit(func, *args).result()
+
+
+async def arun_hashing(func, *args):
+    """
+    Выполняет хеширование в пуле, не блокируя event loop.
+    """
+    return await asyncio.wrap_future(_submit(func, *args))
+
+
+def make_password(password):
+    return run_hashing(hashers.make_password, password)
+
+
+def check_password(password, encoded):
+    return run_hashing(hashers.check_password, password, encoded)
+
+
+async def amake_password(password):
+    return await arun_hashing(hashers.make_password, password)
+
+
+async def acheck_password(password, encoded):
+    return await arun_hashing(hashers.check_password, password, encoded)
+
+
+def needs_rehash(encoded):
+    """
+    Хеш создан устаревшим алгоритмом или с меньшим числом итераций.
+    """
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    default = hashers.get_hasher("default")
+    return hasher.algorithm != default.algorithm or hasher.must_update(encoded)
@@ -0,0 +1,181 @@
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from materials.models import Subscription
+
+from .auth_cache import invalidate_user
+from .hashing import init_process
+from .models import User
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+# Поля пользователя, которые берутся из файла (остальные игнорируются)
+IMPORT_FIELDS = ("email", "password", "first_name", "last_name", "phone", "city")
+
+
+# Сколько номеров строк с ошибками запоминать для отчёта
+MAX_REPORTED_LINES = 20
+
+
+def read_rows(file, import_format):
+    """
+    Построчно читает CSV (с заголовком) или JSONL, не загружая файл целиком.
+
+    Yields:
+        tuple: (номер строки в файле, словарь полей или None, если
+        строку не удалось разобрать)
+    """
+    if import_format == "jsonl":
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def clean_row(row):
+    """
+    Нормализует строку файла. Значения приводятся к строке: в JSONL
+    телефон может быть числом.
+
+    Returns:
+        dict | None: Поля пользователя или None, если строка не разобрана
+        или email некорректен
+    """
+    if row is None:
+        return None
+    data = {
+        field: ("" if row[field] is None else str(row[field])).strip()
+        for field in IMPORT_FIELDS
+        if field in row
+    }
+    email = User.objects.normalize_email(data.get("email", ""))
+    try:
+        validate_email(email)
+    except ValidationError:
+        return None
+    data["email"] = email
+    for field in ("phone", "city"):
+        data[field] = data.get(field) or None
+    return data
+
+
+class UserImporter:
+    """
+    Массовое создание пользователей: пароли хешируются в пуле процессов,
+    пользователи создаются bulk_create пачками (существующие email
+    пропускаются), группы и подписки на курсы назначаются пачками.
+    """
+
+    def __init__(self, batch_size=1000, workers=None, groups=(), courses=()):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.groups = list(groups)
+        self.courses = list(courses)
+        self.stats = {
+            "created": 0,
+            "skipped": 0,
+            "invalid": 0,
+            "subscriptions": 0,
+            # Номера первых MAX_REPORTED_LINES строк с ошибками
+            "invalid_lines": [],
+        }
+
+    def run(self, rows):
+        with ProcessPoolExecutor(self.workers, initializer=init_process) as executor:
+            for batch in batches(rows, self.batch_size):
+                self.import_batch(batch, executor)
+        return self.stats
+
+    def import_batch(self, rows, executor):
+        users = {}
+        for line_number, row in rows:
+            data = clean_row(row)
+            if data is None:
+                self.stats["invalid"] += 1
+                if len(self.stats["invalid_lines"]) < MAX_REPORTED_LINES:
+                    self.stats["invalid_lines"].append(line_number)
+            elif data["email"] in users:
+                self.stats["skipped"] += 1
+            else:
+                users[data["email"]] = data
+
+        existing = set(
+            User.objects.filter(email__in=users).values_list("email", flat=True)
+        )
+        new = [data for email, data in users.items() if email not in existing]
+
+        # Хешируем только новых пользователей; без пароля - неиспользуемый
+        passwords = [data.pop("password", "") or None for data in new]
+        to_hash = [password for password in passwords if password]
+        hashed = iter(executor.map(make_password, to_hash, chunksize=64))
+        objects = [
+            User(
+                password=next(hashed) if password else make_password(None),
+                **data,
+            )
+            for data, password in zip(new, passwords)
+        ]
+
+        with transaction.atomic():
+            User.objects.bulk_create(objects, ignore_conflicts=True)
+            ids = dict(User.objects.filter(email__in=users).values_list("email", "id"))
+            self.assign(list(ids.values()))
+
+        created = len(ids) - len(existing)
+        self.stats["created"] += created
+        self.stats["skipped"] += len(users) - created
+        if self.groups and existing:
+            # m2m через bulk_create не отправляет m2m_changed
+            invalidate_user(*(ids[email] for email in existing if email in ids))
+
+    def assign(self, user_ids):
+        """
+        Добавляет пользователей в группы и подписывает на курсы.
+        Повторный импорт того же файла не создаёт дублей.
+        """
+        Membership = User.groups.through
+        Membership.objects.bulk_create(
+            [
+                Membership(user_id=user_id, group_id=group.pk)
+                for user_id in user_ids
+                for group in self.groups
+            ],
+            ignore_conflicts=True,
+        )
+
+        if self.courses:
+            subscribed = Subscription.objects.filter(
+                user_id__in=user_ids, course__in=self.courses
+            ).count()
+            Subscription.objects.bulk_create(
+                [
+                    Subscription(user_id=user_id, course_id=course.pk)
+                    for user_id in user_ids
+                    for course in self.courses
+                ],
+                ignore_conflicts=True,
+            )
+            self.stats["subscriptions"] += (
+                len(user_ids) * len(self.courses) - subscribed
+            )
@@ -0,0 +1,125 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from materials.models import Course
+from users import auth_cache
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнение пропускной способности sync (WSGI, пул потоков) и async "
+        "(ASGI, event loop) эндпоинтов чтения при медленной зависимости: "
+        "к загрузке пользователя из кеша добавляется задержка --delay"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Потоков WSGI (одновременно обрабатываемых sync-запросов)",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=100, help="Одновременных клиентов"
+        )
+        parser.add_argument(
+            "--delay", type=float, default=50, help="Задержка зависимости, мс"
+        )
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(email="bench_async@example.com")
+        if not Course.objects.filter(owner=user).exists():
+            Course.objects.bulk_create(
+                Course(title=f"Курс {i}", description="", owner=user) for i in range(10)
+            )
+        token = str(RefreshToken.for_user(user).access_token)
+        delay = options["delay"] / 1000
+
+        get_cached_user = auth_cache.get_cached_user
+        aget_cached_user = auth_cache.aget_cached_user
+
+        def slow_get_cached_user(user_id):
+            time.sleep(delay)
+            return get_cached_user(user_id)
+
+        async def slow_aget_cached_user(user_id):
+            await asyncio.sleep(delay)
+            return await aget_cached_user(user_id)
+
+        self.stdout.write(
+            f"Запросов: {options['requests']}, задержка: {options['delay']:.0f} мс, "
+            f"WSGI-потоков: {options['workers']}, "
+            f"async-клиентов: {options['concurrency']}"
+        )
+        # Тестовые клиенты обращаются к хосту testserver
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+        ), mock.patch(
+            "users.authentication.get_cached_user", slow_get_cached_user
+        ), mock.patch(
+            "users.authentication.aget_cached_user", slow_aget_cached_user
+        ):
+            for name, url_name in (
+                ("курсы", "course-list"),
+                ("профиль", "user-me"),
+            ):
+                results = self.run_sync(reverse(url_name), token, options)
+                self.report(f"WSGI, {name}", *results)
+            for name, url_name in (
+                ("курсы", "async-course-list"),
+                ("профиль", "async-user-me"),
+            ):
+                results = asyncio.run(self.run_async(reverse(url_name), token, options))
+                self.report(f"ASGI, {name}", *results)
+
+    def run_sync(self, url, token, options):
+        def get(_):
+            client = Client(headers={"authorization": f"Bearer {token}"})
+            started = time.perf_counter()
+            response = client.get(url)
+            close_old_connections()
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options["workers"]) as executor:
+            results = list(executor.map(get, range(options["requests"])))
+        return results, time.perf_counter() - started
+
+    async def run_async(self, url, token, options):
+        client = AsyncClient()
+        headers = {"authorization": f"Bearer {token}"}
+        semaphore = asyncio.Semaphore(options["concurrency"])
+
+        async def get():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(url, headers=headers)
+                return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(get() for _ in range(options["requests"])))
+        return results, time.perf_counter() - started
+
+    def report(self, name, results, elapsed):
+        timings = sorted(duration for duration, code in results if code == 200)
+        failed = len(results) - len(timings)
+        if not timings:
+            self.stdout.write(self.style.ERROR(f"{name}: все запросы неуспешны"))
+            return
+        self.stdout.write(
+            f"{name}: {len(timings) / elapsed:.1f} запросов/с, "
+            f"медиана {statistics.median(timings) * 1000:.1f} мс, "
+            f"ошибок {failed}"
+        )
@@ -0,0 +1,128 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from users.models import User
+
+BENCH_PASSWORD = "bench-pass-123"
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест логина: логинов в секунду для стандартной проверки "
+        "пароля в потоке запроса и для пула хеширования (sync и async view)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Логинов на сценарий"
+        )
+        parser.add_argument("--concurrency", type=int, default=16)
+
+    def handle(self, *args, **options):
+        emails = self.seed(options["users"])
+        scenarios = [
+            (
+                "до: ModelBackend, sync view",
+                "token_obtain_pair",
+                False,
+                ["django.contrib.auth.backends.ModelBackend"],
+            ),
+            ("после: пул, sync view", "token_obtain_pair", False, None),
+            ("после: пул, async view", "token_obtain_async", True, None),
+        ]
+
+        self.stdout.write(
+            f"Пул хеширования: {settings.PASSWORD_HASHING_EXECUTOR} x "
+            f"{settings.PASSWORD_HASHING_WORKERS}, "
+            f"конкурентность: {options['concurrency']}"
+        )
+        for name, url_name, is_async, backends in scenarios:
+            # Тестовые клиенты обращаются к хосту testserver
+            overrides = {"ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "testserver"]}
+            if backends:
+                overrides["AUTHENTICATION_BACKENDS"] = backends
+            with override_settings(**overrides):
+                if is_async:
+                    timings, elapsed, failed = asyncio.run(
+                        self.run_async(reverse(url_name), emails, options)
+                    )
+                else:
+                    timings, elapsed, failed = self.run_sync(
+                        reverse(url_name), emails, options
+                    )
+            self.report(name, timings, elapsed, failed)
+
+    def seed(self, count):
+        """
+        Пользователи для теста с одним и тем же паролем (хеш считается один раз).
+        """
+        password = make_password(BENCH_PASSWORD)
+        emails = [f"bench_login_{i}@example.com" for i in range(count)]
+        User.objects.bulk_create(
+            [User(email=email, password=password) for email in emails],
+            ignore_conflicts=True,
+        )
+        User.objects.filter(email__in=emails).update(password=password)
+        return emails
+
+    def run_sync(self, url, emails, options):
+        def login(i):
+            client = Client()
+            started = time.perf_counter()
+            response = client.post(
+                url,
+                {"email": emails[i % len(emails)], "password": BENCH_PASSWORD},
+                content_type="application/json",
+            )
+            close_old_connections()
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options["concurrency"]) as executor:
+            results = list(executor.map(login, range(options["requests"])))
+        return self.collect(results, time.perf_counter() - started)
+
+    async def run_async(self, url, emails, options):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(options["concurrency"])
+
+        async def login(i):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    url,
+                    {"email": emails[i % len(emails)], "password": BENCH_PASSWORD},
+                    content_type="application/json",
+                )
+                return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(login(i) for i in range(options["requests"])))
+        return self.collect(results, time.perf_counter() - started)
+
+    @staticmethod
+    def collect(results, elapsed):
+        timings = [duration for duration, code in results if code == 200]
+        return timings, elapsed, len(results) - len(timings)
+
+    def report(self, name, timings, elapsed, failed):
+        if not timings:
+            self.stdout.write(self.style.ERROR(f"{name}: все запросы неуспешны"))
+            return
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+        self.stdout.write(
+            f"{name}: {len(timings) / elapsed:.1f} логинов/с, "
+            f"медиана {statistics.median(timings) * 1000:.1f} мс, "
+            f"p95 {p95 * 1000:.1f} мс, ошибок {failed}"
+        )
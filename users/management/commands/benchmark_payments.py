@@ -0,0 +1,191 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+from urllib.parse import parse_qsl, urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from materials.models import Course, Lesson
+from users.models import Payment, User
+from users.views import PaymentViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест списка платежей: заполняет таблицу и замеряет "
+        "время и число запросов для типовых фильтров и глубоких страниц"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=0, help="Сколько платежей сгенерировать"
+        )
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--pages", type=int, default=50, help="Глубина прохода по курсору"
+        )
+        parser.add_argument(
+            "--explain",
+            action="store_true",
+            help="Показать EXPLAIN ANALYZE (только PostgreSQL)",
+        )
+
+    def handle(self, *args, **options):
+        if options["rows"]:
+            self.seed(options["rows"], options["users"], options["batch_size"])
+
+        payment = Payment.objects.order_by("-id").first()
+        if payment is None:
+            self.stdout.write(self.style.ERROR("Нет платежей, запустите с --rows"))
+            return
+
+        moderator, _ = User.objects.get_or_create(email="bench_moderator@example.com")
+        moderator.groups.add(Group.objects.get_or_create(name="moderators")[0])
+        since = (timezone.now() - timedelta(days=30)).isoformat()
+
+        scenarios = [
+            ("модератор, первая страница", moderator, {}),
+            ("пользователь, свои платежи", payment.user, {}),
+            ("модератор, курс", moderator, {"course": payment.course_id or ""}),
+            ("модератор, способ оплаты", moderator, {"payment_method": "stripe"}),
+            (
+                "модератор, даты и суммы",
+                moderator,
+                {"payment_date__gte": since, "amount__gte": "500"},
+            ),
+        ]
+
+        self.stdout.write(f"Платежей в таблице: {Payment.objects.count()}")
+        for name, user, params in scenarios:
+            self.run_scenario(name, user, params, options)
+
+        self.walk_pages(moderator, options["pages"])
+
+    def request(self, user, params):
+        request = APIRequestFactory().get(
+            "/api/payments/", params, HTTP_HOST=settings.ALLOWED_HOSTS[0]
+        )
+        force_authenticate(request, user=user)
+        view = PaymentViewSet.as_view({"get": "list"})
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = view(request)
+            response.render()
+            elapsed = (time.perf_counter() - started) * 1000
+
+        return response, elapsed, queries
+
+    def run_scenario(self, name, user, params, options):
+        timings = []
+        for _ in range(options["repeat"]):
+            response, elapsed, queries = self.request(user, params)
+            timings.append(elapsed)
+
+        self.stdout.write(
+            f"{name}: p50={statistics.median(timings):.1f} мс, "
+            f"max={max(timings):.1f} мс, запросов={len(queries)}, "
+            f"строк={len(response.data['results'])}"
+        )
+
+        if options["explain"] and connection.vendor == "postgresql":
+            sql = queries.captured_queries[-1]["sql"]
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN ANALYZE {sql}")
+                for (line,) in cursor.fetchall():
+                    self.stdout.write(f"    {line}")
+
+    def walk_pages(self, user, pages):
+        """
+        Проходит N страниц по курсору: при keyset-пагинации время
+        последней страницы должно совпадать со временем первой.
+        """
+        params, timings = {}, []
+        for _ in range(pages):
+            response, elapsed, _ = self.request(user, params)
+            timings.append(elapsed)
+            next_link = response.data["next"]
+            if not next_link:
+                break
+            params = dict(parse_qsl(urlsplit(next_link).query))
+
+        self.stdout.write(
+            f"проход по {len(timings)} страницам: первая={timings[0]:.1f} мс, "
+            f"последняя={timings[-1]:.1f} мс"
+        )
+
+    def seed(self, rows, users_count, batch_size):
+        """
+        Заполняет таблицу платежей пачками через bulk_create.
+        """
+        self.stdout.write(f"Генерируем {rows} платежей...")
+        owner, _ = User.objects.get_or_create(email="bench_owner@example.com")
+
+        User.objects.bulk_create(
+            [User(email=f"bench_{i}@example.com") for i in range(users_count)],
+            ignore_conflicts=True,
+        )
+        user_ids = list(
+            User.objects.filter(email__startswith="bench_").values_list("id", flat=True)
+        )
+
+        courses = [
+            Course.objects.create(title=f"Курс {i}", description="-", owner=owner)
+            for i in range(20)
+        ]
+        lesson_ids = [
+            Lesson.objects.create(
+                title=f"Урок {i}",
+                description="-",
+                video_link="https://www.youtube.com/watch?v=bench",
+                course=courses[i % len(courses)],
+                owner=owner,
+            ).id
+            for i in range(100)
+        ]
+        course_ids = [course.id for course in courses]
+        methods = [choice for choice, _ in Payment.PAYMENT_METHOD_CHOICES]
+        now = timezone.now()
+
+        # auto_now_add перезаписал бы даты, а нам нужен разброс за год
+        field = Payment._meta.get_field("payment_date")
+        field.auto_now_add = False
+        try:
+            created = 0
+            while created < rows:
+                size = min(batch_size, rows - created)
+                batch = []
+                for _ in range(size):
+                    is_course = random.random() < 0.5
+                    batch.append(
+                        Payment(
+                            user_id=random.choice(user_ids),
+                            course_id=random.choice(course_ids) if is_course else None,
+                            lesson_id=None if is_course else random.choice(lesson_ids),
+                            amount=Decimal(random.randint(100, 50000)),
+                            payment_method=random.choice(methods),
+                            payment_date=now
+                            - timedelta(seconds=random.randint(0, 365 * 24 * 3600)),
+                        )
+                    )
+                Payment.objects.bulk_create(batch, batch_size=batch_size)
+                created += size
+                self.stdout.write(f"  {created}/{rows}")
+        finally:
+            field.auto_now_add = True
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE users_payment")
+
+        self.stdout.write(self.style.SUCCESS(f"Создано {rows} платежей"))
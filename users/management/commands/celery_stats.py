@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+
+from services.task_stats import flush, get_store, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Статистика задач Celery по последним событиям: ожидание в очереди "
+        "и время выполнения (перцентили), повторы и причины ошибок"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--task", help="Только задачи, содержащие строку")
+        parser.add_argument(
+            "--reset", action="store_true", help="Удалить накопленные события"
+        )
+
+    def handle(self, *args, **options):
+        store = get_store()
+        if options["reset"]:
+            store.clear()
+            self.stdout.write("Статистика задач очищена")
+            return
+
+        # События задач, выполненных в этом процессе (eager не учитываются)
+        flush()
+        stats = store.read()
+        if options["task"]:
+            stats = {
+                task: events
+                for task, events in stats.items()
+                if options["task"] in task
+            }
+        if not stats:
+            self.stdout.write("Событий нет")
+            return
+
+        for task, events in stats.items():
+            summary = summarize(events)
+            states = ", ".join(
+                f"{state} {count}" for state, count in sorted(summary["states"].items())
+            )
+            self.stdout.write(self.style.MIGRATE_HEADING(task))
+            self.stdout.write(f"  событий {summary['count']}: {states}")
+            self.stdout.write(f"  ожидание   {self.format(summary['wait'])}")
+            self.stdout.write(f"  выполнение {self.format(summary['runtime'])}")
+            if summary["reasons"]:
+                reasons = ", ".join(
+                    f"{reason} {count}" for reason, count in summary["reasons"].items()
+                )
+                self.stdout.write(f"  ошибки и повторы: {reasons}")
+
+    def format(self, distribution):
+        if distribution["p50"] is None:
+            return "нет данных"
+        return "  ".join(
+            f"{name} {distribution[name] * 1000:.1f} мс"
+            for name in ("p50", "p95", "p99", "max")
+        )
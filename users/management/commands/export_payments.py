@@ -0,0 +1,62 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.exports import EXPORT_FORMATS, export_stream
+from users.filters import PaymentFilter
+from users.models import Payment
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоковая выгрузка платежей в CSV/NDJSON. "
+        "Фильтры те же, что у API: --filter course=1 --filter amount__gte=100"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format", dest="export_format", choices=EXPORT_FORMATS, default="csv"
+        )
+        parser.add_argument("--gzip", action="store_true", help="Сжать выгрузку gzip")
+        parser.add_argument(
+            "--output", "-o", help="Файл для выгрузки (по умолчанию stdout)"
+        )
+        parser.add_argument(
+            "--filter",
+            action="append",
+            default=[],
+            metavar="FIELD=VALUE",
+            help="Фильтр PaymentFilter, можно указать несколько раз",
+        )
+        parser.add_argument("--chunk-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        data = {}
+        for item in options["filter"]:
+            field, sep, value = item.partition("=")
+            if not sep:
+                raise CommandError(f"Фильтр должен быть вида FIELD=VALUE: {item}")
+            data[field] = value
+
+        filterset = PaymentFilter(data=data, queryset=Payment.objects.all())
+        if not filterset.is_valid():
+            raise CommandError(f"Неверные фильтры: {dict(filterset.errors)}")
+
+        chunks = export_stream(
+            filterset.qs,
+            options["export_format"],
+            options["gzip"],
+            options["chunk_size"],
+        )
+
+        if options["output"]:
+            with open(options["output"], "wb") as output:
+                for chunk in chunks:
+                    output.write(chunk)
+            self.stderr.write(
+                self.style.SUCCESS(f"Выгрузка сохранена: {options['output']}")
+            )
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
@@ -0,0 +1,25 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from django_lms_project.api_schema import generate_schema, schema_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Собирает схему OpenAPI в openapi/schema-<версия>.json и .yaml. "
+        "Запускается при деплое: API отдаёт схему из этих файлов."
+    )
+
+    def handle(self, *args, **options):
+        settings.API_SCHEMA_DIR.mkdir(parents=True, exist_ok=True)
+        for fmt, content in generate_schema().items():
+            path = schema_path(fmt)
+            # Запись через временный файл: процессы не прочитают половину схемы
+            tmp_path = path.with_name(path.name + ".tmp")
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, path)
+            etag = hashlib.sha256(content).hexdigest()[:32]
+            self.stdout.write(f"{path} ({len(content)} байт, ETag {etag})")
@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+
+from materials.models import Course
+from users.imports import IMPORT_FORMATS, UserImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Массовый импорт пользователей из CSV (с заголовком) или JSONL. "
+        "Поля: email, password, first_name, last_name, phone, city"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл для импорта ('-' - stdin)")
+        parser.add_argument(
+            "--format",
+            dest="import_format",
+            choices=IMPORT_FORMATS,
+            help="Формат файла (по умолчанию - по расширению)",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Процессов для хеширования паролей (по умолчанию - число CPU)",
+        )
+        parser.add_argument(
+            "--group",
+            action="append",
+            default=[],
+            help="Добавить пользователей в группу, можно указать несколько раз",
+        )
+        parser.add_argument(
+            "--course",
+            action="append",
+            type=int,
+            default=[],
+            help="Подписать пользователей на курс (ID), можно указать несколько раз",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        import_format = options["import_format"]
+        if import_format is None:
+            extension = os.path.splitext(path)[1].lstrip(".").lower()
+            import_format = "jsonl" if extension in ("jsonl", "ndjson") else "csv"
+
+        groups = list(Group.objects.filter(name__in=options["group"]))
+        missing = set(options["group"]) - {group.name for group in groups}
+        if missing:
+            raise CommandError(f"Группы не найдены: {', '.join(sorted(missing))}")
+
+        courses = list(Course.objects.filter(pk__in=options["course"]))
+        missing = set(options["course"]) - {course.pk for course in courses}
+        if missing:
+            raise CommandError(
+                f"Курсы не найдены: {', '.join(map(str, sorted(missing)))}"
+            )
+
+        importer = UserImporter(
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            groups=groups,
+            courses=courses,
+        )
+
+        started = time.perf_counter()
+        if path == "-":
+            stats = importer.run(read_rows(sys.stdin, import_format))
+        else:
+            with open(path, encoding="utf-8", newline="") as file:
+                stats = importer.run(read_rows(file, import_format))
+        duration = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано: {stats['created']}, пропущено: {stats['skipped']}, "
+                f"с ошибками: {stats['invalid']}, "
+                f"новых подписок: {stats['subscriptions']} ({duration:.1f} с)"
+            )
+        )
+        if stats["invalid_lines"]:
+            lines = ", ".join(map(str, stats["invalid_lines"]))
+            more = "..." if stats["invalid"] > len(stats["invalid_lines"]) else ""
+            self.stderr.write(f"Строки с ошибками: {lines}{more}")
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from services.startup import TARGETS, by_package, measure
+
+
+class Command(BaseCommand):
+    help = (
+        "Холодный запуск веб-процесса и воркера Celery: время импорта "
+        "(python -X importtime) по пакетам и самые медленные модули"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            choices=[*TARGETS, "all"],
+            default="all",
+            help="Какой процесс замерять",
+        )
+        parser.add_argument(
+            "--runs", type=int, default=3, help="Запусков (берётся медиана)"
+        )
+        parser.add_argument("--top", type=int, default=15, help="Строк в отчёте")
+
+    def handle(self, *args, **options):
+        targets = TARGETS if options["target"] == "all" else [options["target"]]
+        for target in targets:
+            try:
+                result = measure(target, runs=options["runs"])
+            except RuntimeError as e:
+                raise CommandError(f"{target}: запуск завершился ошибкой: {e}")
+            self.report(target, result, options["top"])
+
+    def report(self, target, result, top):
+        seconds = result["import_seconds"]
+        budget = settings.STARTUP_IMPORT_BUDGET
+        style = self.style.SUCCESS if seconds <= budget else self.style.ERROR
+        self.stdout.write(
+            style(
+                f"{target}: импорт {seconds * 1000:.0f} мс (бюджет {budget * 1000:.0f} мс)"
+            )
+        )
+
+        self.stdout.write("  По пакетам (собственное время модулей):")
+        for package, us in list(by_package(result["timings"]).items())[:top]:
+            self.stdout.write(f"    {package:<30} {us / 1000:8.1f} мс")
+
+        self.stdout.write("  Самые медленные модули (с вложенными импортами):")
+        slowest = sorted(
+            result["timings"], key=lambda timing: timing.cumulative_us, reverse=True
+        )
+        for timing in slowest[:top]:
+            self.stdout.write(
+                f"    {timing.module:<50} {timing.cumulative_us / 1000:8.1f} мс"
+            )
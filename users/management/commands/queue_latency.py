@@ -0,0 +1,73 @@
+import time
+
+from celery.exceptions import TimeoutError
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from django_lms_project.celery import app, queue_probe
+from services.queue_latency import queue_latencies
+
+
+class Command(BaseCommand):
+    help = (
+        "Задержка очередей Celery: последнее время ожидания задачи в каждой "
+        "очереди и число сообщений в ней. С --probe в каждую очередь "
+        "отправляется пустая задача и замеряется, когда воркер её начал."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--probe", action="store_true", help="Отправить пробные задачи"
+        )
+        parser.add_argument(
+            "--timeout", type=float, default=30, help="Ожидание пробы, секунды"
+        )
+
+    def handle(self, *args, **options):
+        queues = [queue.name for queue in settings.CELERY_TASK_QUEUES]
+
+        if options["probe"]:
+            results = {queue: queue_probe.apply_async(queue=queue) for queue in queues}
+            deadline = time.monotonic() + options["timeout"]
+            for queue, result in results.items():
+                try:
+                    latency = result.get(timeout=max(0.1, deadline - time.monotonic()))
+                except TimeoutError:
+                    self.stdout.write(
+                        self.style.ERROR(
+                            f"{queue}: нет ответа (воркеры заняты или не запущены)"
+                        )
+                    )
+                    continue
+                self.stdout.write(f"{queue}: проба начата через {latency:.3f} с")
+            return
+
+        now = time.time()
+        latencies = queue_latencies(queues)
+        depths = self.queue_depths(queues)
+        for queue in queues:
+            depth = depths.get(queue, "?")
+            measured = latencies[queue]
+            if measured is None:
+                self.stdout.write(f"{queue}: сообщений {depth}, замеров нет")
+                continue
+            self.stdout.write(
+                f"{queue}: сообщений {depth}, последнее ожидание "
+                f"{measured['latency']:.3f} с ({measured['task']}, "
+                f"{now - measured['at']:.0f} с назад)"
+            )
+
+    def queue_depths(self, queues):
+        """
+        Число сообщений в очередях брокера ({} если брокер недоступен).
+        """
+        try:
+            with app.connection_for_read() as connection:
+                connection.ensure_connection(max_retries=1)
+                channel = connection.default_channel
+                return {
+                    queue: channel.queue_declare(queue, passive=True).message_count
+                    for queue in queues
+                }
+        except Exception:
+            return {}
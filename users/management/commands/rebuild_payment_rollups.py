@@ -0,0 +1,55 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересобирает агрегаты выручки (PaymentRollup) по таблице платежей. "
+        "Запускайте в период низкой нагрузки: платежи, оплаченные во время "
+        "пересборки, попадут в агрегаты только после следующего запуска."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--from", dest="date_from", help="Начало периода YYYY-MM-DD"
+        )
+        parser.add_argument("--to", dest="date_to", help="Конец периода YYYY-MM-DD")
+        parser.add_argument(
+            "--numpy",
+            action="store_true",
+            help="Агрегировать векторно через NumPy вместо GROUP BY в БД",
+        )
+        parser.add_argument("--chunk-size", type=int, default=50000)
+
+    def handle(self, *args, **options):
+        try:
+            date_from = options["date_from"] and date.fromisoformat(
+                options["date_from"]
+            )
+            date_to = options["date_to"] and date.fromisoformat(options["date_to"])
+        except ValueError:
+            raise CommandError("Даты должны быть в формате YYYY-MM-DD")
+
+        if options["numpy"]:
+            try:
+                import numpy  # noqa: F401
+            except ImportError:
+                raise CommandError("NumPy не установлен: pip install numpy")
+
+        started = time.monotonic()
+        count = rebuild_rollups(
+            date_from=date_from,
+            date_to=date_to,
+            use_numpy=options["numpy"],
+            chunk_size=options["chunk_size"],
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Пересобрано агрегатов: {count} за {time.monotonic() - started:.1f} с"
+            )
+        )
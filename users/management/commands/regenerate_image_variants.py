@@ -0,0 +1,106 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from materials.models import Course, Lesson
+from materials.tasks import generate_preview_variants
+from services.db_pool import reset_after_fork
+from users.models import User
+from users.tasks import generate_avatar_variants
+
+# Цель -> (модель, поле изображения)
+TARGETS = {
+    "course": (Course, "preview"),
+    "lesson": (Lesson, "preview"),
+    "user": (User, "avatar"),
+}
+
+
+def init_worker():
+    # fork: соединения и пул родителя не используются; spawn: настройка Django
+    django.setup()
+    reset_after_fork()
+
+
+def regenerate(target, pk, force):
+    if target == "user":
+        generate_avatar_variants(pk, force=force)
+    else:
+        generate_preview_variants(target, pk, force=force)
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересоздаёт уменьшенные копии превью курсов, уроков и аватаров "
+        "в пуле процессов (по умолчанию - только отсутствующие и устаревшие)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            choices=[*TARGETS, "all"],
+            default="all",
+            help="Какие изображения обработать",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Процессов (по умолчанию - число ядер)",
+        )
+        parser.add_argument(
+            "--force", action="store_true", help="Пересоздать все копии"
+        )
+
+    def handle(self, *args, **options):
+        targets = TARGETS if options["target"] == "all" else [options["target"]]
+        jobs = [
+            (target, pk)
+            for target in targets
+            for pk in self.pending(target, options["force"])
+        ]
+        if not jobs:
+            self.stdout.write("Все копии актуальны")
+            return
+
+        self.stdout.write(f"Изображений: {len(jobs)}, процессов: {options['workers']}")
+        started = time.monotonic()
+        failed = 0
+        # Дочерние процессы открывают собственные соединения с БД
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=options["workers"], initializer=init_worker
+        ) as pool:
+            futures = {
+                pool.submit(regenerate, target, pk, options["force"]): (target, pk)
+                for target, pk in jobs
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    failed += 1
+                    target, pk = futures[future]
+                    self.stderr.write(f"{target} {pk}: {type(e).__name__}: {e}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Готово за {time.monotonic() - started:.1f} с, ошибок: {failed}"
+            )
+        )
+
+    def pending(self, target, force):
+        """
+        id объектов, чьи копии не соответствуют файлу (или все с файлом
+        при force).
+        """
+        model, field = TARGETS[target]
+        rows = model.objects.values_list("pk", field, f"{field}_variants")
+        for pk, name, variants in rows.iterator():
+            source = (variants or {}).get("source")
+            if (force and name) or (name or None) != source:
+                yield pk
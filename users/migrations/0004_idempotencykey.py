@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_payment_stripe_payment_status_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IdempotencyKey",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "key",
+                    models.CharField(
+                        max_length=255, verbose_name="Ключ идемпотентности"
+                    ),
+                ),
+                ("endpoint", models.CharField(max_length=100, verbose_name="Эндпоинт")),
+                (
+                    "request_hash",
+                    models.CharField(max_length=64, verbose_name="Хеш тела запроса"),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("processing", "Выполняется"),
+                            ("completed", "Выполнен"),
+                        ],
+                        default="processing",
+                        max_length=20,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "response_status",
+                    models.PositiveSmallIntegerField(
+                        blank=True, null=True, verbose_name="HTTP статус ответа"
+                    ),
+                ),
+                (
+                    "response_body",
+                    models.JSONField(blank=True, null=True, verbose_name="Тело ответа"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+                ("expires_at", models.DateTimeField(verbose_name="Действителен до")),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="idempotency_keys",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ключ идемпотентности",
+                "verbose_name_plural": "Ключи идемпотентности",
+                "indexes": [
+                    models.Index(
+                        fields=["expires_at"], name="users_idemp_expires_dba068_idx"
+                    )
+                ],
+                "unique_together": {("user", "endpoint", "key")},
+            },
+        ),
+    ]
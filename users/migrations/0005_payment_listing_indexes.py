@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0004_subscription"),
+        ("users", "0004_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="payment",
+            name="stripe_session_id",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                max_length=100,
+                null=True,
+                verbose_name="ID сессии Stripe",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["-payment_date", "-id"], name="payment_date_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["user", "-payment_date", "-id"], name="payment_user_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["course", "-payment_date", "-id"],
+                name="payment_course_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["lesson", "-payment_date", "-id"],
+                name="payment_lesson_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["payment_method", "-payment_date", "-id"],
+                name="payment_method_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["user", "amount"], name="payment_user_amount_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0004_subscription"),
+        ("users", "0005_payment_listing_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="День")),
+                (
+                    "payment_method",
+                    models.CharField(
+                        choices=[
+                            ("cash", "Наличные"),
+                            ("transfer", "Перевод на счет"),
+                            ("stripe", "Stripe"),
+                        ],
+                        max_length=10,
+                        verbose_name="Способ оплаты",
+                    ),
+                ),
+                (
+                    "total_amount",
+                    models.DecimalField(
+                        decimal_places=2, default=0, max_digits=14, verbose_name="Сумма"
+                    ),
+                ),
+                (
+                    "payments_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество платежей"
+                    ),
+                ),
+                (
+                    "course",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="payment_rollups",
+                        to="materials.course",
+                        verbose_name="Курс",
+                    ),
+                ),
+                (
+                    "lesson",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="payment_rollups",
+                        to="materials.lesson",
+                        verbose_name="Урок",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Выручка за день",
+                "verbose_name_plural": "Выручка по дням",
+                "indexes": [
+                    models.Index(fields=["day"], name="rollup_day_idx"),
+                    models.Index(fields=["course", "day"], name="rollup_course_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("lesson__isnull", True)),
+                        fields=("day", "course", "payment_method"),
+                        name="rollup_course_day_uniq",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("course__isnull", True)),
+                        fields=("day", "lesson", "payment_method"),
+                        name="rollup_lesson_day_uniq",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(
+                            ("course__isnull", True), ("lesson__isnull", True)
+                        ),
+                        fields=("day", "payment_method"),
+                        name="rollup_day_uniq",
+                    ),
+                ],
+            },
+        ),
+    ]
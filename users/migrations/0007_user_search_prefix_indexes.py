@@ -0,0 +1,45 @@
+from django.db import migrations
+
+SEARCH_COLUMNS = ("email", "first_name", "last_name")
+
+
+def create_prefix_indexes(apps, schema_editor):
+    """
+    Индексы под поиск по началу строки (istartswith).
+
+    PostgreSQL строит istartswith как UPPER(col::text) LIKE UPPER('x%'),
+    для LIKE по префиксу нужен индекс с text_pattern_ops.
+    SQLite сравнивает LIKE без учёта регистра по самой колонке,
+    ему нужен индекс с COLLATE NOCASE.
+    """
+    vendor = schema_editor.connection.vendor
+    for column in SEARCH_COLUMNS:
+        name = f"users_user_{column}_prefix_idx"
+        if vendor == "postgresql":
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} "
+                f'ON users_user (UPPER("{column}"::text) text_pattern_ops)'
+            )
+        elif vendor == "sqlite":
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} "
+                f'ON users_user ("{column}" COLLATE NOCASE)'
+            )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ("postgresql", "sqlite"):
+        return
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(f"DROP INDEX IF EXISTS users_user_{column}_prefix_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0006_paymentrollup"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0007_user_search_prefix_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["last_login"],
+                name="user_active_last_login_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_active", True), ("last_login__isnull", True)),
+                fields=["date_joined"],
+                name="user_never_logged_in_idx",
+            ),
+        ),
+    ]
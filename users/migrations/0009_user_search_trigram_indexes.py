@@ -0,0 +1,44 @@
+from django.db import migrations
+
+SEARCH_COLUMNS = ("email", "first_name", "last_name")
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """
+    GIN-индексы pg_trgm под поиск по подстроке (icontains).
+
+    PostgreSQL строит icontains как UPPER(col::text) LIKE UPPER('%x%'),
+    поэтому индекс строится по тому же выражению. CONCURRENTLY - чтобы
+    не блокировать запись в таблицу пользователей на время построения.
+    В SQLite поиск по подстроке не индексируется: там работает
+    поиск по началу строки и индексы из миграции 0007.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS users_user_{column}_trgm_idx "
+            f'ON users_user USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(
+            f"DROP INDEX CONCURRENTLY IF EXISTS users_user_{column}_trgm_idx"
+        )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("users", "0008_user_deactivation_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
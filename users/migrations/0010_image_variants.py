@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0009_user_search_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="avatar_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
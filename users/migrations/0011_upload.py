@@ -0,0 +1,122 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:48
+
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0010_image_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Upload",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "target",
+                    models.CharField(
+                        choices=[
+                            ("course", "Превью курса"),
+                            ("lesson", "Превью урока"),
+                            ("avatar", "Аватар"),
+                        ],
+                        max_length=10,
+                        verbose_name="Назначение",
+                    ),
+                ),
+                (
+                    "object_id",
+                    models.PositiveBigIntegerField(verbose_name="ID объекта"),
+                ),
+                (
+                    "filename",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="Имя файла"
+                    ),
+                ),
+                ("size", models.PositiveBigIntegerField(verbose_name="Размер, байт")),
+                (
+                    "offset",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Получено, байт"
+                    ),
+                ),
+                (
+                    "format",
+                    models.CharField(blank=True, max_length=10, verbose_name="Формат"),
+                ),
+                (
+                    "width",
+                    models.PositiveIntegerField(
+                        blank=True, null=True, verbose_name="Ширина"
+                    ),
+                ),
+                (
+                    "height",
+                    models.PositiveIntegerField(
+                        blank=True, null=True, verbose_name="Высота"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("uploading", "Загружается"),
+                            ("processing", "Обрабатывается"),
+                            ("done", "Готово"),
+                            ("failed", "Ошибка"),
+                        ],
+                        default="uploading",
+                        max_length=20,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "error",
+                    models.CharField(blank=True, max_length=255, verbose_name="Ошибка"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Дата обновления"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="uploads",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Загрузка",
+                "verbose_name_plural": "Загрузки",
+                "indexes": [
+                    models.Index(
+                        fields=["updated_at"], name="users_uploa_updated_e95b74_idx"
+                    )
+                ],
+            },
+        ),
+    ]
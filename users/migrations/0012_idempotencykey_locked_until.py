@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0011_upload"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="idempotencykey",
+            name="locked_until",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Выполняется до"
+            ),
+        ),
+    ]
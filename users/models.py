@@ -1,6 +1,8 @@
+import uuid
+
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 
 
@@ -39,12 +41,30 @@ class User(AbstractUser):
     phone = models.CharField(max_length=15, blank=True, null=True)
     city = models.CharField(max_length=100, blank=True, null=True)
     avatar = models.ImageField(upload_to="avatars/", blank=True, null=True)
+    # Уменьшенные копии аватара (services/images.py), создаются задачей Celery
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS: list[str] = []
 
     objects = UserManager()
 
+    class Meta(AbstractUser.Meta):
+        # Частичные индексы для ночной блокировки неактивных пользователей:
+        # в них только активные пользователи, поэтому они остаются маленькими
+        indexes = [
+            models.Index(
+                fields=["last_login"],
+                condition=models.Q(is_active=True),
+                name="user_active_last_login_idx",
+            ),
+            models.Index(
+                fields=["date_joined"],
+                condition=models.Q(is_active=True, last_login__isnull=True),
+                name="user_never_logged_in_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -93,7 +113,11 @@ class Payment(models.Model):
         max_length=100, blank=True, null=True, verbose_name="ID цены Stripe"
     )
     stripe_session_id = models.CharField(
-        max_length=100, blank=True, null=True, verbose_name="ID сессии Stripe"
+        max_length=100,
+        blank=True,
+        null=True,
+        db_index=True,
+        verbose_name="ID сессии Stripe",
     )
     stripe_payment_status = models.CharField(
         max_length=50, default="pending", verbose_name="Статус оплаты Stripe"
@@ -106,10 +130,58 @@ class Payment(models.Model):
         verbose_name = "Платеж"
         verbose_name_plural = "Платежи"
         ordering = ["-payment_date"]
+        # Индексы под keyset-пагинацию (payment_date, id): общий список
+        # модератора, список пользователя и каждый фильтр на равенство
+        indexes = [
+            models.Index(fields=["-payment_date", "-id"], name="payment_date_id_idx"),
+            models.Index(
+                fields=["user", "-payment_date", "-id"], name="payment_user_date_idx"
+            ),
+            models.Index(
+                fields=["course", "-payment_date", "-id"],
+                name="payment_course_date_idx",
+            ),
+            models.Index(
+                fields=["lesson", "-payment_date", "-id"],
+                name="payment_lesson_date_idx",
+            ),
+            models.Index(
+                fields=["payment_method", "-payment_date", "-id"],
+                name="payment_method_date_idx",
+            ),
+            models.Index(fields=["user", "amount"], name="payment_user_amount_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.amount} руб."
 
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет платеж и переносит его вклад в агрегаты выручки в одной
+        транзакции. Строка блокируется до чтения прежнего состояния, чтобы
+        параллельные сохранения одного платежа не учли его дважды.
+        """
+        from .rollups import apply_transition, contribution
+
+        with transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                previous = (
+                    Payment.objects.select_for_update().filter(pk=self.pk).first()
+                )
+            super().save(*args, **kwargs)
+            apply_transition(
+                contribution(previous) if previous else None, contribution(self)
+            )
+
+    @property
+    def is_paid(self):
+        """
+        Учитывается ли платеж в выручке: наличные и переводы - сразу,
+        Stripe - только после подтверждения оплаты.
+        """
+        return self.payment_method != "stripe" or self.stripe_payment_status == "paid"
+
     def clean(self):
         # Проверяем, что оплачен либо курс, либо урок
         if self.course and self.lesson:
@@ -118,3 +190,186 @@ class Payment(models.Model):
             )
         if not self.course and not self.lesson:
             raise ValidationError("Необходимо указать либо курс, либо урок для оплаты.")
+
+
+class IdempotencyKey(models.Model):
+    """
+    Сохранённый результат запроса, выполненного с заголовком Idempotency-Key.
+    Повторный запрос с тем же ключом получает сохранённый ответ.
+    """
+
+    STATUS_PROCESSING = "processing"
+    STATUS_COMPLETED = "completed"
+    STATUS_CHOICES = [
+        (STATUS_PROCESSING, "Выполняется"),
+        (STATUS_COMPLETED, "Выполнен"),
+    ]
+
+    key = models.CharField(max_length=255, verbose_name="Ключ идемпотентности")
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="idempotency_keys",
+        verbose_name="Пользователь",
+    )
+    endpoint = models.CharField(max_length=100, verbose_name="Эндпоинт")
+    request_hash = models.CharField(max_length=64, verbose_name="Хеш тела запроса")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PROCESSING,
+        verbose_name="Статус",
+    )
+    response_status = models.PositiveSmallIntegerField(
+        null=True, blank=True, verbose_name="HTTP статус ответа"
+    )
+    response_body = models.JSONField(null=True, blank=True, verbose_name="Тело ответа")
+    # Пока не истекло, запрос выполняется владельцем записи; после -
+    # считается прерванным, и повтор с тем же ключом выполняет его заново
+    locked_until = models.DateTimeField(
+        null=True, blank=True, verbose_name="Выполняется до"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    expires_at = models.DateTimeField(verbose_name="Действителен до")
+
+    class Meta:
+        verbose_name = "Ключ идемпотентности"
+        verbose_name_plural = "Ключи идемпотентности"
+        unique_together = ["user", "endpoint", "key"]
+        indexes = [models.Index(fields=["expires_at"])]
+
+    def __str__(self):
+        return f"{self.endpoint}: {self.key}"
+
+
+class PaymentRollup(models.Model):
+    """
+    Агрегат выручки за день по курсу/уроку и способу оплаты.
+    Обновляется инкрементально при изменении статуса платежа
+    и пересобирается командой rebuild_payment_rollups.
+    """
+
+    day = models.DateField(verbose_name="День")
+    course = models.ForeignKey(
+        "materials.Course",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="payment_rollups",
+        verbose_name="Курс",
+    )
+    lesson = models.ForeignKey(
+        "materials.Lesson",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="payment_rollups",
+        verbose_name="Урок",
+    )
+    payment_method = models.CharField(
+        max_length=10,
+        choices=Payment.PAYMENT_METHOD_CHOICES,
+        verbose_name="Способ оплаты",
+    )
+    total_amount = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, verbose_name="Сумма"
+    )
+    payments_count = models.PositiveIntegerField(
+        default=0, verbose_name="Количество платежей"
+    )
+
+    class Meta:
+        verbose_name = "Выручка за день"
+        verbose_name_plural = "Выручка по дням"
+        # NULL в уникальном индексе не считается равным NULL,
+        # поэтому на каждый вариант ключа - свой частичный индекс
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "course", "payment_method"],
+                condition=models.Q(lesson__isnull=True),
+                name="rollup_course_day_uniq",
+            ),
+            models.UniqueConstraint(
+                fields=["day", "lesson", "payment_method"],
+                condition=models.Q(course__isnull=True),
+                name="rollup_lesson_day_uniq",
+            ),
+            models.UniqueConstraint(
+                fields=["day", "payment_method"],
+                condition=models.Q(course__isnull=True, lesson__isnull=True),
+                name="rollup_day_uniq",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["day"], name="rollup_day_idx"),
+            models.Index(fields=["course", "day"], name="rollup_course_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.total_amount} руб. ({self.payments_count})"
+
+
+class Upload(models.Model):
+    """
+    Загрузка изображения (превью курса или урока, аватар).
+
+    Файл принимается целиком (multipart) или частями (PATCH с
+    Upload-Offset), лежит во временном каталоге UPLOAD_STAGING_DIR и
+    переносится в поле объекта задачей users.tasks.process_upload.
+    """
+
+    TARGET_COURSE = "course"
+    TARGET_LESSON = "lesson"
+    TARGET_AVATAR = "avatar"
+    TARGET_CHOICES = [
+        (TARGET_COURSE, "Превью курса"),
+        (TARGET_LESSON, "Превью урока"),
+        (TARGET_AVATAR, "Аватар"),
+    ]
+
+    STATUS_UPLOADING = "uploading"
+    STATUS_PROCESSING = "processing"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_UPLOADING, "Загружается"),
+        (STATUS_PROCESSING, "Обрабатывается"),
+        (STATUS_DONE, "Готово"),
+        (STATUS_FAILED, "Ошибка"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="uploads",
+        verbose_name="Пользователь",
+    )
+    target = models.CharField(
+        max_length=10, choices=TARGET_CHOICES, verbose_name="Назначение"
+    )
+    object_id = models.PositiveBigIntegerField(verbose_name="ID объекта")
+    filename = models.CharField(max_length=255, blank=True, verbose_name="Имя файла")
+    size = models.PositiveBigIntegerField(verbose_name="Размер, байт")
+    offset = models.PositiveBigIntegerField(default=0, verbose_name="Получено, байт")
+    # Из заголовка изображения, известны после первых байт файла
+    format = models.CharField(max_length=10, blank=True, verbose_name="Формат")
+    width = models.PositiveIntegerField(null=True, blank=True, verbose_name="Ширина")
+    height = models.PositiveIntegerField(null=True, blank=True, verbose_name="Высота")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_UPLOADING,
+        verbose_name="Статус",
+    )
+    error = models.CharField(max_length=255, blank=True, verbose_name="Ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Загрузка"
+        verbose_name_plural = "Загрузки"
+        indexes = [models.Index(fields=["updated_at"])]
+
+    def __str__(self):
+        return f"{self.target} {self.object_id}: {self.filename} ({self.status})"
@@ -0,0 +1,224 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.db.models.query import QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PaymentKeysetPagination(BasePagination):
+    """
+    Keyset-пагинатор для платежей по паре (payment_date, id).
+
+    Вместо OFFSET следующая страница выбирается условием
+    "строго после последней записи", поэтому стоимость запроса не зависит
+    от номера страницы и опирается на индекс (payment_date, id).
+
+    Параметры запроса:
+    - ?cursor=... - курсор из ссылок next/previous
+    - ?page_size=20 - размер страницы (максимум 100)
+    - ?ordering=payment_date - по возрастанию (по умолчанию -payment_date)
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    ordering_query_param = "ordering"
+    invalid_cursor_message = "Неверный курсор"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.descending = (
+            request.query_params.get(self.ordering_query_param) != "payment_date"
+        )
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor["reverse"])
+
+        # Для предыдущей страницы идём от курсора в обратную сторону
+        descending = self.descending != reverse
+        if cursor:
+            queryset = queryset.filter(self._after(cursor, descending))
+
+        if descending:
+            queryset = queryset.order_by("-payment_date", "-id")
+        else:
+            queryset = queryset.order_by("payment_date", "id")
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = results
+        return results
+
+    def _after(self, cursor, descending):
+        """
+        Условие "после курсора" в форме, удобной для индексного диапазона:
+        payment_date <= d AND (payment_date < d OR id < pk).
+        """
+        date, pk = cursor["payment_date"], cursor["id"]
+        if descending:
+            return Q(payment_date__lte=date) & (Q(payment_date__lt=date) | Q(id__lt=pk))
+        return Q(payment_date__gte=date) & (Q(payment_date__gt=date) | Q(id__gt=pk))
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            cursor = {
+                "payment_date": parse_datetime(data["d"]),
+                "id": int(data["i"]),
+                "reverse": bool(data.get("r")),
+            }
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if cursor["payment_date"] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, payment, reverse):
+        data = {"d": payment.payment_date.isoformat(), "i": payment.id}
+        if reverse:
+            data["r"] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode("ascii"))
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded.decode("ascii")
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Курсор страницы из ссылок next/previous",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": f"Размер страницы (максимум {self.max_page_size})",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+
+class UserCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация справочника пользователей по уникальному email.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = "email"
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор админки для больших таблиц.
+
+    В PostgreSQL вместо COUNT(*) берётся оценка планировщика:
+    pg_class.reltuples для таблицы без фильтров и "Plan Rows" из EXPLAIN
+    для отфильтрованного списка. Точный COUNT выполняется, только если
+    оценка меньше ADMIN_EXACT_COUNT_LIMIT.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return super().count
+
+        estimate = self.estimate(queryset, connection)
+        if estimate < settings.ADMIN_EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
+
+    @staticmethod
+    def estimate(queryset, connection):
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+                # -1 - таблица ещё ни разу не анализировалась
+                if row and row[0] >= 0:
+                    return row[0]
+
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from services.db_router import primary_reads
+from services.tiered_cache import TieredCache
+
+from .models import Payment
+
+history_cache = TieredCache("payment_history")
+
+
+def _cache_timeout():
+    # 0 - кеш выключен
+    return getattr(settings, "PAYMENT_HISTORY_CACHE_TIMEOUT", 0)
+
+
+def latest_payments(user_ids, limit):
+    """
+    Последние limit платежей каждого пользователя одним запросом:
+    ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY payment_date DESC, id DESC).
+    """
+    return (
+        Payment.objects.filter(user_id__in=user_ids)
+        .annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F("user_id")],
+                order_by=[F("payment_date").desc(), F("id").desc()],
+            )
+        )
+        .filter(row_number__lte=limit)
+        .order_by("user_id", "row_number")
+    )
+
+
+def load_payment_history(user_ids, limit=None):
+    """
+    История платежей для списка пользователей: сначала из кеша,
+    недостающее - одним запросом с оконной функцией.
+
+    Returns:
+        dict: {user_id: [сериализованные платежи]}
+    """
+    from .serializers import PaymentSerializer
+
+    limit = limit or settings.PAYMENT_HISTORY_LIMIT
+    user_ids = list(dict.fromkeys(user_ids))
+
+    timeout = _cache_timeout()
+    history = {}
+    if timeout:
+        history = history_cache.get_many(user_ids)
+
+    missing = [user_id for user_id in user_ids if user_id not in history]
+    if missing:
+        payments = {user_id: [] for user_id in missing}
+        # Кеш заполняется с основной БД, как и кеш курсов
+        with primary_reads():
+            for payment in latest_payments(missing, limit):
+                payments[payment.user_id].append(payment)
+            loaded = {
+                user_id: list(PaymentSerializer(items, many=True).data)
+                for user_id, items in payments.items()
+            }
+        if timeout:
+            history_cache.set_many(loaded, timeout)
+        history.update(loaded)
+
+    return history
+
+
+def invalidate_payment_history(*user_ids):
+    """
+    Сбрасывает закешированную историю платежей пользователей.
+    """
+    if _cache_timeout():
+        history_cache.invalidate(*user_ids)
@@ -1,9 +1,41 @@
 from rest_framework import permissions
 
+MODERATORS_GROUP = "moderators"
+
+
+def is_moderator(user):
+    """
+    Состоит ли пользователь в группе модераторов.
+    Результат запоминается на объекте пользователя, поэтому за запрос
+    к группам обращаемся не больше одного раза.
+    """
+    if not user.is_authenticated:
+        return False
+
+    cached = getattr(user, "_is_moderator", None)
+    if cached is None:
+        cached = user.groups.filter(name=MODERATORS_GROUP).exists()
+        user._is_moderator = cached
+    return cached
+
+
+async def ais_moderator(user):
+    """
+    Асинхронный вариант is_moderator.
+    """
+    if not user.is_authenticated:
+        return False
+
+    cached = getattr(user, "_is_moderator", None)
+    if cached is None:
+        cached = await user.groups.filter(name=MODERATORS_GROUP).aexists()
+        user._is_moderator = cached
+    return cached
+
 
 class IsModerator(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name="moderators").exists()
+        return is_moderator(request.user)
 
     def has_object_permission(self, request, view, obj):
         return self.has_permission(request, view)
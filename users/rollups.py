@@ -0,0 +1,222 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Payment, PaymentRollup
+from .payment_history import invalidate_payment_history
+
+# Условие "платеж учитывается в выручке" - то же, что Payment.is_paid
+PAID_Q = ~Q(payment_method="stripe") | Q(stripe_payment_status="paid")
+
+
+def rollup_key(payment):
+    """
+    Ключ агрегата для платежа или None, если платеж не учитывается в выручке.
+
+    Returns:
+        tuple | None: (day, course_id, lesson_id, payment_method)
+    """
+    if payment.pk is None or not payment.is_paid or payment.payment_date is None:
+        return None
+    return (
+        timezone.localdate(payment.payment_date),
+        payment.course_id,
+        payment.lesson_id,
+        payment.payment_method,
+    )
+
+
+def apply_delta(key, amount, count):
+    """
+    Прибавляет сумму и количество к агрегату, создавая его при необходимости.
+    """
+    day, course_id, lesson_id, payment_method = key
+    lookup = {
+        "day": day,
+        "course_id": course_id,
+        "lesson_id": lesson_id,
+        "payment_method": payment_method,
+    }
+
+    with transaction.atomic():
+        updated = PaymentRollup.objects.filter(**lookup).update(
+            total_amount=F("total_amount") + amount,
+            payments_count=F("payments_count") + count,
+        )
+        if updated:
+            return
+
+        try:
+            with transaction.atomic():
+                PaymentRollup.objects.create(
+                    total_amount=amount, payments_count=count, **lookup
+                )
+        except IntegrityError:
+            # Агрегат только что создал параллельный запрос
+            PaymentRollup.objects.filter(**lookup).update(
+                total_amount=F("total_amount") + amount,
+                payments_count=F("payments_count") + count,
+            )
+
+
+def apply_transition(before, after):
+    """
+    Переносит вклад платежа из старого агрегата в новый.
+
+    Args:
+        before (tuple | None): (ключ, сумма) до изменения
+        after (tuple | None): (ключ, сумма) после изменения
+    """
+    if before == after:
+        return
+    if before is not None:
+        apply_delta(before[0], -before[1], -1)
+    if after is not None:
+        apply_delta(after[0], after[1], 1)
+
+
+def contribution(payment):
+    """
+    Вклад платежа в агрегаты: (ключ, сумма) или None.
+    """
+    key = rollup_key(payment)
+    if key is None:
+        return None
+    return key, Decimal(payment.amount)
+
+
+def update_session_status(session_id, status):
+    """
+    Обновляет статус всех платежей сессии Stripe одним UPDATE
+    и переносит их вклад в агрегаты выручки.
+    """
+    with transaction.atomic():
+        payments = list(
+            Payment.objects.select_for_update().filter(stripe_session_id=session_id)
+        )
+        Payment.objects.filter(stripe_session_id=session_id).update(
+            stripe_payment_status=status
+        )
+
+        for payment in payments:
+            before = contribution(payment)
+            payment.stripe_payment_status = status
+            apply_transition(before, contribution(payment))
+
+    invalidate_payment_history(*{payment.user_id for payment in payments})
+
+
+def _aggregate_with_db(payments):
+    """
+    Агрегация средствами БД: GROUP BY по дню, курсу, уроку и способу оплаты.
+    """
+    rows = (
+        payments.annotate(day=TruncDate("payment_date"))
+        .values("day", "course_id", "lesson_id", "payment_method")
+        .annotate(total_amount=Sum("amount"), payments_count=Count("id"))
+        .order_by()
+    )
+    return [
+        (
+            (row["day"], row["course_id"], row["lesson_id"], row["payment_method"]),
+            row["total_amount"],
+            row["payments_count"],
+        )
+        for row in rows
+    ]
+
+
+def _aggregate_with_numpy(payments, chunk_size):
+    """
+    Векторная агрегация: строки читаются курсором пачками, каждой строке
+    сопоставляется номер группы, а суммы в копейках и количества
+    считаются через np.bincount.
+    """
+    import numpy as np
+
+    totals, counts = Counter(), Counter()
+    rows = payments.values_list(
+        "payment_date", "course_id", "lesson_id", "payment_method", "amount"
+    ).iterator(chunk_size=chunk_size)
+
+    def flush(chunk):
+        keys = [
+            (timezone.localdate(date), course_id, lesson_id, method)
+            for date, course_id, lesson_id, method, _ in chunk
+        ]
+        cents = np.fromiter(
+            (int(amount * 100) for *_, amount in chunk),
+            dtype=np.int64,
+            count=len(chunk),
+        )
+        index = {}
+        inverse = np.fromiter(
+            (index.setdefault(key, len(index)) for key in keys),
+            dtype=np.int64,
+            count=len(keys),
+        )
+        sums = np.bincount(inverse, weights=cents, minlength=len(index))
+        numbers = np.bincount(inverse, minlength=len(index))
+        for key, position in index.items():
+            totals[key] += int(sums[position])
+            counts[key] += int(numbers[position])
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    return [(key, Decimal(totals[key]) / 100, counts[key]) for key in totals]
+
+
+def rebuild_rollups(date_from=None, date_to=None, use_numpy=False, chunk_size=50000):
+    """
+    Пересобирает агрегаты выручки за период (по умолчанию - за всё время).
+
+    Returns:
+        int: Количество записанных агрегатов
+    """
+    payments = Payment.objects.filter(PAID_Q)
+    rollups = PaymentRollup.objects.all()
+    if date_from:
+        payments = payments.filter(payment_date__date__gte=date_from)
+        rollups = rollups.filter(day__gte=date_from)
+    if date_to:
+        payments = payments.filter(payment_date__date__lte=date_to)
+        rollups = rollups.filter(day__lte=date_to)
+
+    if use_numpy:
+        aggregated = _aggregate_with_numpy(payments, chunk_size)
+    else:
+        aggregated = _aggregate_with_db(payments)
+
+    with transaction.atomic():
+        rollups.delete()
+        PaymentRollup.objects.bulk_create(
+            [
+                PaymentRollup(
+                    day=day,
+                    course_id=course_id,
+                    lesson_id=lesson_id,
+                    payment_method=payment_method,
+                    total_amount=total_amount,
+                    payments_count=payments_count,
+                )
+                for (
+                    (day, course_id, lesson_id, payment_method),
+                    total_amount,
+                    payments_count,
+                ) in aggregated
+            ],
+            batch_size=1000,
+        )
+
+    return len(aggregated)
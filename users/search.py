@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+# Поля поиска пользователей (под них есть индексы из миграций 0007 и 0009)
+USER_SEARCH_FIELDS = ("email", "first_name", "last_name")
+
+BACKENDS = {
+    "postgresql": "users.search.TrigramSearchBackend",
+}
+DEFAULT_BACKEND = "users.search.PrefixSearchBackend"
+
+
+class SearchBackend:
+    """
+    Базовый поиск: каждое слово запроса должно найтись хотя бы в одном
+    из полей (как в search_fields админки).
+    """
+
+    lookup = "icontains"
+
+    def get_lookup(self, word):
+        return self.lookup
+
+    def search(self, queryset, fields, term):
+        for word in term.split():
+            lookup = self.get_lookup(word)
+            condition = Q()
+            for field in fields:
+                condition |= Q(**{f"{field}__{lookup}": word})
+            queryset = queryset.filter(condition)
+        return queryset
+
+
+class PrefixSearchBackend(SearchBackend):
+    """
+    Поиск по началу строки - работает на любой БД и использует
+    префиксные индексы (COLLATE NOCASE в SQLite, text_pattern_ops в PostgreSQL).
+    """
+
+    lookup = "istartswith"
+
+
+class TrigramSearchBackend(SearchBackend):
+    """
+    Поиск по подстроке для PostgreSQL: UPPER(col) LIKE '%x%' использует
+    GIN-индексы pg_trgm. Триграммный индекс не помогает словам короче
+    трёх символов - для них поиск по началу строки.
+    """
+
+    min_length = 3
+
+    def get_lookup(self, word):
+        return "icontains" if len(word) >= self.min_length else "istartswith"
+
+
+def get_search_backend(using="default"):
+    """
+    Бэкенд поиска из SEARCH_BACKEND или выбранный по СУБД.
+    """
+    path = settings.SEARCH_BACKEND or BACKENDS.get(
+        connections[using].vendor, DEFAULT_BACKEND
+    )
+    return import_string(path)()
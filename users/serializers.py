@@ -1,6 +1,16 @@
+from django.conf import settings
 from rest_framework import serializers
+from rest_framework.exceptions import PermissionDenied
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
-from .models import Payment, User
+from materials.models import Course, Lesson
+from services.images import ImageVariantsField
+
+from .authentication import MODERATOR_CLAIM
+from .hashing import make_password
+from .models import Payment, Upload, User
+from .payment_history import load_payment_history
+from .permissions import is_moderator
 
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -9,6 +19,18 @@ class PaymentSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class UserDetailListSerializer(serializers.ListSerializer):
+    """
+    Загружает историю платежей сразу для всех пользователей списка,
+    а не отдельным запросом на каждого.
+    """
+
+    def to_representation(self, data):
+        users = list(data.all() if hasattr(data, "all") else data)
+        self.child.payment_history = load_payment_history([user.pk for user in users])
+        return super().to_representation(users)
+
+
 # !!! СТАРЫЙ UserSerializer переименуем в UserDetailSerializer !!!
 class UserDetailSerializer(serializers.ModelSerializer):
     """
@@ -16,6 +38,7 @@ class UserDetailSerializer(serializers.ModelSerializer):
     """
 
     payment_history = serializers.SerializerMethodField()
+    avatar_variants = ImageVariantsField()
 
     class Meta:
         model = User
@@ -25,34 +48,112 @@ class UserDetailSerializer(serializers.ModelSerializer):
             "phone",
             "city",
             "avatar",
+            "avatar_variants",
             "first_name",
             "last_name",
             "password",
             "payment_history",
         )
         extra_kwargs = {"password": {"write_only": True}}
+        list_serializer_class = UserDetailListSerializer
 
     def get_payment_history(self, obj):
         """
         Возвращает историю платежей пользователя
         """
-        payments = obj.payments.all().order_by("-payment_date")[:10]
-        return PaymentSerializer(payments, many=True).data
+        preloaded = getattr(self, "payment_history", None)
+        if preloaded is not None and obj.pk in preloaded:
+            return preloaded[obj.pk]
+        return load_payment_history([obj.pk])[obj.pk]
+
+    def create(self, validated_data):
+        # Хеш считается до сохранения - пользователь создаётся одним INSERT
+        validated_data["password"] = make_password(validated_data["password"])
+        user = super().create(validated_data)
+        # У нового пользователя платежей нет
+        self.payment_history = {user.pk: []}
+        return user
+
+    def update(self, instance, validated_data):
+        if "password" in validated_data:
+            validated_data["password"] = make_password(validated_data["password"])
+        return super().update(instance, validated_data)
+
+
+def requested_fields(request, serializer_class):
+    """
+    Поля из параметра ?fields=id,email, которые есть в сериализаторе.
+    Пустой список - параметр не передан.
+    """
+    if request is None or not request.query_params.get("fields"):
+        return []
+
+    allowed = serializer_class.Meta.fields
+    fields = [
+        field.strip()
+        for field in request.query_params["fields"].split(",")
+        if field.strip() in allowed
+    ]
+    # id нужен всегда: по нему строится курсор и ссылки
+    return ["id"] + [field for field in fields if field != "id"]
+
+
+class DynamicFieldsMixin:
+    """
+    Оставляет в ответе только поля из ?fields=..., если параметр передан.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get("request"), type(self))
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
 
 # !!! СОЗДАЕМ НОВЫЙ ДЛЯ ПУБЛИЧНОГО ПРОСМОТРА !!!
-class UserPublicSerializer(serializers.ModelSerializer):
+class UserPublicSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Публичная информация о пользователе (для просмотра другими пользователями).
     Не включает: пароль, фамилию, историю платежей.
     """
 
+    avatar_variants = ImageVariantsField()
+
     class Meta:
         model = User
-        fields = ("id", "email", "phone", "city", "avatar", "first_name")
+        fields = (
+            "id",
+            "email",
+            "phone",
+            "city",
+            "avatar",
+            "avatar_variants",
+            "first_name",
+        )
         read_only_fields = fields  # Все поля только для чтения
 
 
+class UserSearchSerializer(serializers.ModelSerializer):
+    """
+    Результат поиска пользователей для сотрудников поддержки.
+    """
+
+    class Meta:
+        model = User
+        fields = (
+            "id",
+            "email",
+            "first_name",
+            "last_name",
+            "phone",
+            "is_active",
+            "date_joined",
+            "last_login",
+        )
+        read_only_fields = fields
+
+
 class PaymentCreateSerializer(serializers.ModelSerializer):
     """
     Сериализатор для создания платежа через Stripe.
@@ -94,3 +195,114 @@ class PaymentCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         # Этот метод будет переопределен во view
         pass
+
+
+class CartItemSerializer(serializers.Serializer):
+    """
+    Позиция корзины: курс или урок и его цена.
+    """
+
+    course_id = serializers.IntegerField(required=False)
+    lesson_id = serializers.IntegerField(required=False)
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+
+    def validate(self, data):
+        course_id = data.get("course_id")
+        lesson_id = data.get("lesson_id")
+
+        if not course_id and not lesson_id:
+            raise serializers.ValidationError(
+                "Необходимо указать course_id или lesson_id"
+            )
+
+        if course_id and lesson_id:
+            raise serializers.ValidationError("Укажите только курс ИЛИ урок")
+
+        return data
+
+
+class CartCheckoutSerializer(serializers.Serializer):
+    """
+    Сериализатор для оплаты корзины одной сессией Stripe.
+    """
+
+    items = CartItemSerializer(many=True, allow_empty=False, max_length=50)
+
+    def validate_items(self, items):
+        keys = [(item.get("course_id"), item.get("lesson_id")) for item in items]
+        if len(set(keys)) != len(keys):
+            raise serializers.ValidationError("Позиции корзины не должны повторяться")
+        return items
+
+
+class UploadSerializer(serializers.ModelSerializer):
+    """
+    Загрузка изображения. Для превью курса или урока нужен object_id
+    объекта, который пользователь может редактировать; для аватара
+    object_id не передаётся.
+    """
+
+    object_id = serializers.IntegerField(required=False, allow_null=True)
+    size = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = Upload
+        fields = (
+            "id",
+            "target",
+            "object_id",
+            "filename",
+            "size",
+            "offset",
+            "format",
+            "width",
+            "height",
+            "status",
+            "error",
+            "created_at",
+        )
+        read_only_fields = (
+            "offset",
+            "format",
+            "width",
+            "height",
+            "status",
+            "error",
+            "created_at",
+        )
+
+    def validate_size(self, value):
+        if value > settings.IMAGE_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Файл больше {settings.IMAGE_UPLOAD_MAX_SIZE // 2**20} МБ"
+            )
+        return value
+
+    def validate(self, data):
+        user = self.context["request"].user
+        if data["target"] == Upload.TARGET_AVATAR:
+            data["object_id"] = user.pk
+            return data
+
+        model = Course if data["target"] == Upload.TARGET_COURSE else Lesson
+        instance = model.objects.filter(pk=data.get("object_id")).only("owner").first()
+        if instance is None:
+            raise serializers.ValidationError({"object_id": "Объект не найден"})
+        # Превью меняют владелец и модераторы, как и через PATCH объекта
+        if instance.owner_id != user.pk and not is_moderator(user):
+            raise PermissionDenied("Нет прав на изменение этого объекта")
+        return data
+
+
+class LmsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Выдача JWT. В режиме AUTH_STATELESS_ROLES роль модератора
+    записывается в токен, чтобы не проверять группы на каждый запрос.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        if settings.AUTH_STATELESS_ROLES:
+            token[MODERATOR_CLAIM] = is_moderator(user)
+        return token
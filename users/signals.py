@@ -0,0 +1,81 @@
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from services.images import needs_variants
+
+from .auth_cache import invalidate_user
+from .models import Payment, User
+from .payment_history import invalidate_payment_history
+from .rollups import apply_transition, contribution
+
+
+@receiver(post_save, sender=Payment)
+def invalidate_payment_owner_history(sender, instance, **kwargs):
+    # Агрегаты выручки обновляет Payment.save() в своей транзакции
+    invalidate_payment_history(instance.user_id)
+
+
+@receiver(post_delete, sender=Payment)
+def remove_payment_from_rollups(sender, instance, **kwargs):
+    # Вызывается внутри транзакции удаления
+    apply_transition(contribution(instance), None)
+    invalidate_payment_history(instance.user_id)
+
+
+def invalidate_users_on_commit(*user_ids):
+    """
+    Сброс сразу (код той же транзакции не увидит старые данные) и ещё раз
+    после коммита: параллельный запрос мог закешировать данные, которые
+    транзакция (форма админки) ещё не зафиксировала.
+    """
+    invalidate_user(*user_ids)
+    transaction.on_commit(lambda: invalidate_user(*user_ids))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Сбрасываем пользователя из кеша аутентификации при изменении.
+    """
+    invalidate_users_on_commit(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_cached_user_groups(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Смена групп меняет роль модератора, закешированную вместе с пользователем.
+    """
+    if action not in ("post_add", "post_remove", "post_clear", "pre_clear"):
+        return
+
+    if not reverse:
+        invalidate_users_on_commit(instance.pk)
+    elif pk_set:
+        invalidate_users_on_commit(*pk_set)
+    else:
+        # group.user_set.clear() - pk_set не передаётся
+        invalidate_users_on_commit(*instance.user_set.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_group_members(sender, instance, **kwargs):
+    invalidate_users_on_commit(*instance.user_set.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=User)
+def schedule_avatar_variants(sender, instance, update_fields=None, **kwargs):
+    """
+    Новый или изменённый аватар - копии создаёт задача после коммита.
+    """
+    if needs_variants(instance, "avatar", update_fields):
+        from .tasks import generate_avatar_variants
+
+        transaction.on_commit(lambda: generate_avatar_variants.delay(instance.pk))
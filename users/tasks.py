@@ -1,25 +1,181 @@
+import time
 from datetime import timedelta
 
 from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DatabaseError, transaction
+from django.db.models import Q
 from django.utils import timezone
 
-from users.models import User
+from services.db_router import replica_reads
+from services.images import update_variants
+from services.uploads import UploadRejected, attach_upload, remove_staged
+from users.auth_cache import invalidate_user
+from users.models import IdempotencyKey, Upload, User
 
+DEACTIVATION_CHECKPOINT_KEY = "deactivate_inactive_users:last_pk"
 
-@shared_task
-def deactivate_inactive_users():
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def deactivate_inactive_users(batch_size=None, pause=None):
     """
-    Блокирует пользователей, которые не заходили более 30 дней.
+    Блокирует пользователей, которые не заходили более 30 дней
+    (или ни разу не заходили и зарегистрировались больше 30 дней назад).
+
+    Работает пачками по первичному ключу: каждая пачка - короткая транзакция,
+    между пачками пауза, чтобы не держать блокировки и не раздувать WAL.
+    Последний обработанный id сохраняется в кеш, поэтому прерванный
+    запуск продолжается с того же места - в том числе повторно выданный
+    брокером после падения воркера (acks_late).
     """
-    month_ago = timezone.now() - timedelta(days=30)
+    batch_size = batch_size or settings.DEACTIVATION_BATCH_SIZE
+    pause = settings.DEACTIVATION_BATCH_PAUSE if pause is None else pause
+    started = time.monotonic()
+    cutoff = timezone.now() - timedelta(days=settings.INACTIVE_USER_DAYS)
 
     # Ищем пользователей, которые:
-    # 1. Не заходили больше месяца
+    # 1. Не заходили больше месяца (или не заходили ни разу)
     # 2. Ещё активны
-    inactive_users = User.objects.filter(last_login__lt=month_ago, is_active=True)
+    inactive_users = User.objects.filter(is_active=True).filter(
+        Q(last_login__lt=cutoff) | Q(last_login__isnull=True, date_joined__lt=cutoff)
+    )
+
+    last_pk = cache.get(DEACTIVATION_CHECKPOINT_KEY, 0)
+    if last_pk:
+        print(f"↪️ Продолжаем с пользователя id > {last_pk}")
+
+    count = batches = 0
+    while True:
+        # Кандидаты ищутся на реплике, UPDATE ниже перепроверяет условия
+        with replica_reads():
+            user_ids = list(
+                inactive_users.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+        if not user_ids:
+            break
+
+        with transaction.atomic():
+            # Условия проверяем повторно: пользователь мог зайти между выборкой и UPDATE
+            count += inactive_users.filter(pk__in=user_ids).update(is_active=False)
+
+        # update() не вызывает сигналы - сбрасываем кеш аутентификации вручную
+        invalidate_user(*user_ids)
+
+        batches += 1
+        last_pk = user_ids[-1]
+        cache.set(DEACTIVATION_CHECKPOINT_KEY, last_pk, timeout=24 * 60 * 60)
+
+        if len(user_ids) < batch_size:
+            break
+        time.sleep(pause)
+
+    cache.delete(DEACTIVATION_CHECKPOINT_KEY)
+    duration = time.monotonic() - started
+
+    print(
+        f"🚫 Заблокировано пользователей: {count} "
+        f"(пачек: {batches}, за {duration:.1f} с)"
+    )
+    return {"deactivated": count, "batches": batches, "duration": round(duration, 3)}
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def clear_expired_idempotency_keys():
+    """
+    Удаляет просроченные ключи идемпотентности.
+    """
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+
+    print(f"🧹 Удалено ключей идемпотентности: {deleted}")
+    return f"Deleted {deleted} idempotency keys"
+
+
+@shared_task(ignore_result=True)
+def generate_avatar_variants(user_id, force=False):
+    """
+    Уменьшенные копии аватара пользователя.
+    """
+    user = User.objects.filter(pk=user_id).first()
+    if user is not None and update_variants(user, "avatar", force=force):
+        invalidate_user(user_id)
+
+
+@shared_task(
+    acks_late=True,
+    reject_on_worker_lost=True,
+    ignore_result=True,
+    autoretry_for=(OSError, DatabaseError),
+    retry_backoff=30,
+    retry_backoff_max=600,
+    max_retries=5,
+)
+def process_upload(upload_id):
+    """
+    Переносит принятый файл загрузки в поле изображения объекта.
+
+    Повторный запуск после сбоя воркера безопасен: задача выполняется,
+    пока загрузка в статусе processing. Сбой хранилища или БД - повтор
+    с нарастающей паузой; загрузку, так и не обработанную за
+    UPLOAD_EXPIRE, завершает ошибкой clear_stale_uploads.
+    """
+    upload = Upload.objects.filter(
+        pk=upload_id, status=Upload.STATUS_PROCESSING
+    ).first()
+    if upload is None:
+        return
+
+    try:
+        attach_upload(upload)
+    except ObjectDoesNotExist:
+        upload.status, upload.error = Upload.STATUS_FAILED, "Объект удалён"
+    except FileNotFoundError:
+        # Повтор не поможет: файла загрузки нет
+        upload.status, upload.error = Upload.STATUS_FAILED, "Файл загрузки не найден"
+    except UploadRejected as e:
+        upload.status, upload.error = Upload.STATUS_FAILED, str(e)
+    else:
+        upload.status = Upload.STATUS_DONE
+    upload.save(update_fields=["status", "error", "updated_at"])
+    remove_staged(upload.pk)
+
+
+@shared_task
+def clear_stale_uploads():
+    """
+    Удаляет записи и файлы загрузок, не менявшихся дольше UPLOAD_EXPIRE
+    (брошенные докачки, завершённые и ошибочные). Обрабатываемые дольше
+    UPLOAD_EXPIRE (повторы process_upload исчерпаны или задача потеряна)
+    завершает ошибкой: клиент увидит статус, запись удалится позже.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.UPLOAD_EXPIRE)
+    stale = Upload.objects.filter(updated_at__lt=cutoff)
+    deleted = 0
+    for upload_id in (
+        stale.exclude(status=Upload.STATUS_PROCESSING)
+        .values_list("pk", flat=True)
+        .iterator()
+    ):
+        remove_staged(upload_id)
+        deleted += Upload.objects.filter(pk=upload_id).delete()[0]
 
-    count = inactive_users.count()
-    inactive_users.update(is_active=False)
+    failed = 0
+    for upload_id in (
+        stale.filter(status=Upload.STATUS_PROCESSING)
+        .values_list("pk", flat=True)
+        .iterator()
+    ):
+        remove_staged(upload_id)
+        failed += Upload.objects.filter(
+            pk=upload_id, status=Upload.STATUS_PROCESSING
+        ).update(
+            status=Upload.STATUS_FAILED,
+            error="Файл не обработан",
+            updated_at=timezone.now(),
+        )
 
-    print(f"🚫 Заблокировано пользователей: {count}")
-    return f"Deactivated {count} users"
+    print(f"🧹 Удалено загрузок: {deleted}, не обработано: {failed}")
+    return f"Deleted {deleted} uploads, failed {failed}"
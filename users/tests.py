@@ -1,8 +1,14 @@
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
 User = get_user_model()
 
@@ -83,6 +89,207 @@ class UserAPITestCase(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_user_list_paginated_search(self):
+        """
+        Тест: справочник пользователей с курсорной пагинацией и поиском.
+        """
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse("user-list") + "?search=OTHER")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("next", response.data)
+        self.assertEqual(
+            [user["email"] for user in response.data["results"]],
+            ["otheruser@example.com"],
+        )
+
+    def test_user_list_fields(self):
+        """
+        Тест: ?fields= оставляет в ответе только нужные поля.
+        """
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse("user-list") + "?fields=email,avatar")
+
+        self.assertEqual(set(response.data["results"][0]), {"id", "email", "avatar"})
+
+    def test_user_retrieve_single_fetch(self):
+        """
+        Тест: пользователь читается из БД один раз (плюс проверка роли).
+        """
+        self.client.force_authenticate(user=self.user)
+        url = reverse("user-detail", kwargs={"pk": self.other_user.pk})
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertNotIn("payment_history", response.data)
+
+    def test_cached_jwt_user(self):
+        """
+        Тест: повторный запрос с токеном не читает пользователя из БД
+        для аутентификации, хеш пароля в кеш не попадает.
+        """
+        from django.core.cache import cache
+
+        from users.auth_cache import CACHE_KEY
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.get_token(self.user)}"
+        )
+        url = reverse("user-me")
+        self.client.get(url)
+
+        # Остаются профиль и история платежей
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.data["email"], self.user.email)
+
+        cached = cache.get(CACHE_KEY.format(user_id=self.user.pk))
+        self.assertNotIn(self.user.password, str(cached))
+
+    def test_cached_jwt_user_invalidated_on_deactivation(self):
+        """
+        Тест: деактивированный пользователь сразу теряет доступ.
+        """
+        from users.tasks import deactivate_inactive_users
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.get_token(self.user)}"
+        )
+        url = reverse("user-me")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        User.objects.filter(pk=self.user.pk).update(
+            last_login=timezone.now() - timedelta(days=60)
+        )
+        deactivate_inactive_users()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_user_invalidated_after_commit(self):
+        """
+        Тест: кеш аутентификации сбрасывается и после коммита - данные,
+        закешированные параллельным запросом до коммита, не остаются.
+        """
+        from django.contrib.auth.models import Group
+        from django.core.cache import cache
+
+        from users.auth_cache import CACHE_KEY
+
+        key = CACHE_KEY.format(user_id=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+            # Параллельный запрос до коммита читает прежнее состояние
+            cache.set(key, "stale")
+        self.assertIsNone(cache.get(key))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(Group.objects.create(name="moderators"))
+            cache.set(key, "stale")
+        self.assertIsNone(cache.get(key))
+
+    @override_settings(AUTH_STATELESS_ROLES=True)
+    def test_stateless_moderator_claim(self):
+        """
+        Тест: роль модератора попадает в токен при логине.
+        """
+        from django.contrib.auth.models import Group
+
+        self.user.groups.add(Group.objects.create(name="moderators"))
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"email": "testuser@example.com", "password": "testpass123"},
+            format="json",
+        )
+        token = AccessToken(response.data["access"])
+        self.assertTrue(token["is_moderator"])
+
+    def test_registration_single_insert(self):
+        """
+        Тест: регистрация - проверка email и один INSERT, пароль захеширован.
+        """
+        data = {"email": "single@example.com", "password": "newpass123"}
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse("register"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(
+            User.objects.get(email="single@example.com").check_password("newpass123")
+        )
+
+    def test_async_login(self):
+        """
+        Тест асинхронной выдачи токенов.
+        """
+        url = reverse("token_obtain_async")
+        response = self.client.post(
+            url,
+            {"email": "testuser@example.com", "password": "testpass123"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            AccessToken(response.json()["access"])["user_id"], str(self.user.pk)
+        )
+
+        response = self.client.post(
+            url, {"email": "testuser@example.com", "password": "wrong"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_async_me_matches_sync(self):
+        """
+        Тест: async /users/me/ отдаёт то же, что sync.
+        """
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.get_token(self.user)}"
+        )
+        response = self.client.get(reverse("async-user-me"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), self.client.get(reverse("user-me")).json())
+
+    def test_async_registration(self):
+        """
+        Тест асинхронной регистрации.
+        """
+        url = reverse("register_async")
+        data = {"email": "async@example.com", "password": "newpass123"}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["payment_history"], [])
+        self.assertTrue(
+            User.objects.get(email="async@example.com").check_password("newpass123")
+        )
+
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_hashing_pool_busy(self):
+        """
+        Тест: при переполненном пуле хеширования логин отклоняется с 503.
+        """
+        from users.hashing import HashingPoolBusy
+
+        data = {"email": "testuser@example.com", "password": "testpass123"}
+        with mock.patch("users.hashing._submit", side_effect=HashingPoolBusy):
+            for name in ("token_obtain_pair", "token_obtain_async"):
+                response = self.client.post(reverse(name), data, format="json")
+                self.assertEqual(
+                    response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+
+    def test_hashing_pool_busy_admin_login(self):
+        """
+        Тест: вход в админку при переполненном пуле отклоняется формой, без 500.
+        """
+        from django.test import Client
+
+        from users.hashing import HashingPoolBusy
+
+        data = {"username": "testuser@example.com", "password": "testpass123"}
+        with mock.patch("users.hashing._submit", side_effect=HashingPoolBusy):
+            response = Client().post(reverse("admin:login"), data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.context["form"].errors)
+
 
 class PaymentAPITestCase(APITestCase):
     """
@@ -161,3 +368,1857 @@ class PaymentAPITestCase(APITestCase):
         )
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_payment_list_scoped_to_owner(self):
+        """
+        Тест: пользователь не видит чужие платежи, модератор видит все.
+        """
+        from django.contrib.auth.models import Group
+
+        from users.models import Payment
+
+        stranger = User.objects.create(email="stranger@example.com")
+        Payment.objects.create(
+            user=stranger, course=self.course, amount=10, payment_method="cash"
+        )
+        url = reverse("payment-list")
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), 2)
+
+        moderator = User.objects.create(email="moderator@example.com")
+        moderator.groups.add(Group.objects.create(name="moderators"))
+        self.client.force_authenticate(user=moderator)
+        response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_payment_keyset_pagination(self):
+        """
+        Тест: проход по курсору возвращает все платежи без повторов.
+        """
+        from users.models import Payment
+
+        Payment.objects.bulk_create(
+            Payment(user=self.user, course=self.course, amount=i, payment_method="cash")
+            for i in range(5)
+        )
+        self.client.force_authenticate(user=self.user)
+
+        seen, url = [], reverse("payment-list") + "?page_size=3"
+        while url:
+            response = self.client.get(url)
+            seen += [payment["id"] for payment in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+        # Ссылка previous с последней страницы возвращает предыдущую
+        response = self.client.get(response.data["previous"])
+        self.assertEqual(
+            [payment["id"] for payment in response.data["results"]], seen[3:6]
+        )
+
+    def test_payment_filter_by_amount_range(self):
+        """
+        Тест: фильтр по диапазону сумм.
+        """
+        url = reverse("payment-list") + "?amount__gte=600&amount__lte=2000"
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(url)
+        self.assertEqual(
+            [payment["id"] for payment in response.data["results"]],
+            [self.payment1.id],
+        )
+
+    def test_payment_export_csv(self):
+        """
+        Тест: потоковая выгрузка в CSV с фильтром.
+        """
+        url = reverse("payment-export") + "?payment_method=transfer"
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:2], ["id", "user_email"])
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f"{self.payment1.id},payer@example.com"))
+
+    def test_payment_export_ndjson_gzip(self):
+        """
+        Тест: выгрузка в NDJSON со сжатием gzip.
+        """
+        import gzip
+        import json
+
+        url = reverse("payment-export") + "?output=ndjson&gzip=1"
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(url)
+
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        content = gzip.decompress(b"".join(response.streaming_content))
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(
+            [row["id"] for row in rows], [self.payment1.id, self.payment2.id]
+        )
+
+    def test_me_payment_history_constant_queries(self):
+        """
+        Тест: /users/me/ с историей платежей - один запрос к БД.
+        """
+        from users.models import Payment
+
+        Payment.objects.bulk_create(
+            Payment(user=self.user, course=self.course, amount=i, payment_method="cash")
+            for i in range(15)
+        )
+        self.client.force_authenticate(user=self.user)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("user-me"))
+        self.assertEqual(len(response.data["payment_history"]), 10)
+
+    def test_payment_history_batched_for_many_users(self):
+        """
+        Тест: история платежей для списка пользователей - один запрос.
+        """
+        from users.models import Payment
+        from users.serializers import UserDetailSerializer
+
+        other = User.objects.create(email="second_payer@example.com")
+        Payment.objects.create(
+            user=other, course=self.course, amount=10, payment_method="cash"
+        )
+
+        with self.assertNumQueries(2):
+            data = UserDetailSerializer(
+                User.objects.filter(email__in=[self.user.email, other.email]),
+                many=True,
+            ).data
+        self.assertEqual(sorted(len(user["payment_history"]) for user in data), [1, 2])
+
+    @override_settings(PAYMENT_HISTORY_CACHE_TIMEOUT=60)
+    def test_payment_history_cache_invalidated_on_payment(self):
+        """
+        Тест: кеш истории платежей сбрасывается при новом платеже.
+        """
+        from django.core.cache import cache
+
+        from users.models import Payment
+
+        cache.clear()
+        self.client.force_authenticate(user=self.user)
+        self.client.get(reverse("user-me"))
+        with self.assertNumQueries(0):
+            self.client.get(reverse("user-me"))
+
+        Payment.objects.create(
+            user=self.user, course=self.course, amount=10, payment_method="cash"
+        )
+        response = self.client.get(reverse("user-me"))
+        self.assertEqual(len(response.data["payment_history"]), 3)
+
+
+class IdempotentPaymentTestCase(APITestCase):
+    """
+    Тесты Idempotency-Key для создания платежа через Stripe.
+    """
+
+    def setUp(self):
+        from materials.models import Course
+        from services.throttling import limiter
+
+        # Лимит stripe_payments общий для всех тестов процесса
+        limiter.reset()
+        self.addCleanup(limiter.reset)
+
+        self.user = User.objects.create(email="retry@example.com")
+        self.course = Course.objects.create(
+            title="Курс", description="Описание", owner=self.user
+        )
+        self.url = reverse("payment-create-stripe-payment")
+        self.client.force_authenticate(user=self.user)
+
+        patchers = {
+            "product": mock.patch(
+                "users.views.create_stripe_product",
+                return_value=SimpleNamespace(id="prod_1"),
+            ),
+            "price": mock.patch(
+                "users.views.create_stripe_price",
+                return_value=SimpleNamespace(id="price_1"),
+            ),
+            "session": mock.patch(
+                "users.views.create_stripe_checkout_session",
+                return_value=SimpleNamespace(
+                    id="cs_1", url="https://checkout.stripe.com/pay/cs_1"
+                ),
+            ),
+        }
+        self.stripe = {name: p.start() for name, p in patchers.items()}
+        for p in patchers.values():
+            self.addCleanup(p.stop)
+
+    def post(self, data, key):
+        return self.client.post(self.url, data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_repeated_request_returns_stored_response(self):
+        """
+        Тест: повтор с тем же ключом не создаёт второй платеж.
+        """
+        from users.models import Payment
+
+        data = {
+            "course_id": self.course.id,
+            "amount": "100.00",
+            "payment_method": "stripe",
+        }
+        first = self.post(data, "key-1")
+        second = self.post(data, "key-1")
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Payment.objects.count(), 1)
+        self.stripe["session"].assert_called_once()
+        self.assertEqual(
+            self.stripe["session"].call_args.kwargs["idempotency_key"],
+            f"{self.user.id}:key-1:session",
+        )
+
+    def test_same_key_with_other_body(self):
+        """
+        Тест: ключ нельзя переиспользовать с другими данными.
+        """
+        self.post(
+            {
+                "course_id": self.course.id,
+                "amount": "100.00",
+                "payment_method": "stripe",
+            },
+            "key-2",
+        )
+        response = self.post(
+            {"course_id": self.course.id, "amount": "1.00", "payment_method": "stripe"},
+            "key-2",
+        )
+        self.assertEqual(response.status_code, 422)
+
+    def test_server_error_is_not_stored(self):
+        """
+        Тест: ответ с ошибкой Stripe не сохраняется, повтор выполняется заново.
+        """
+        data = {
+            "course_id": self.course.id,
+            "amount": "100.00",
+            "payment_method": "stripe",
+        }
+        self.stripe["product"].side_effect = RuntimeError("stripe down")
+        self.assertEqual(self.post(data, "key-3").status_code, 500)
+
+        self.stripe["product"].side_effect = None
+        self.assertEqual(self.post(data, "key-3").status_code, 201)
+
+    def test_interrupted_request_taken_over_after_lease(self):
+        """
+        Тест: запись запроса, прерванного без ответа, блокирует повторы
+        только до истечения срока выполнения, затем повтор выполняется.
+        """
+        from services.idempotency import _request_hash
+        from users.models import IdempotencyKey, Payment
+
+        data = {
+            "course_id": self.course.id,
+            "amount": "100.00",
+            "payment_method": "stripe",
+        }
+        record = IdempotencyKey.objects.create(
+            user=self.user,
+            endpoint="create-stripe-payment",
+            key="key-4",
+            request_hash=_request_hash(data),
+            locked_until=timezone.now() + timedelta(minutes=1),
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+        with override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0):
+            response = self.post(data, "key-4")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response["Retry-After"], "1")
+
+        record.locked_until = timezone.now() - timedelta(seconds=1)
+        record.save(update_fields=["locked_until"])
+        response = self.post(data, "key-4")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Payment.objects.count(), 1)
+        record.refresh_from_db()
+        self.assertEqual(record.status, IdempotencyKey.STATUS_COMPLETED)
+
+
+class CartCheckoutTestCase(APITestCase):
+    """
+    Тесты оплаты корзины одной сессией Stripe.
+    """
+
+    def setUp(self):
+        from materials.models import Course, Lesson
+
+        self.user = User.objects.create(email="cart@example.com")
+        self.course = Course.objects.create(
+            title="Курс", description="Описание", owner=self.user
+        )
+        self.lessons = [
+            Lesson.objects.create(
+                title=f"Урок {i}",
+                description="Описание",
+                video_link="https://www.youtube.com/watch?v=test",
+                course=self.course,
+                owner=self.user,
+            )
+            for i in range(3)
+        ]
+        self.url = reverse("payment-create-stripe-cart")
+        self.client.force_authenticate(user=self.user)
+
+        patcher = mock.patch(
+            "users.views.create_stripe_cart_checkout_session",
+            return_value=SimpleNamespace(
+                id="cs_cart", url="https://checkout.stripe.com/pay/cs_cart"
+            ),
+        )
+        self.stripe_session = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cart_checkout(self):
+        """
+        Тест: вся корзина оплачивается одной сессией, платежи связаны session_id.
+        """
+        from users.models import Payment
+
+        items = [{"course_id": self.course.id, "amount": "1000.00"}] + [
+            {"lesson_id": lesson.id, "amount": "100.00"} for lesson in self.lessons
+        ]
+        response = self.client.post(self.url, {"items": items}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["payment_ids"]), 4)
+        self.stripe_session.assert_called_once()
+        self.assertEqual(len(self.stripe_session.call_args.kwargs["items"]), 4)
+        self.assertEqual(Payment.objects.filter(stripe_session_id="cs_cart").count(), 4)
+
+    @override_settings(PAYMENT_HISTORY_CACHE_TIMEOUT=60)
+    def test_cart_checkout_invalidates_payment_history(self):
+        """
+        Тест: платежи корзины сразу видны в закешированной истории платежей.
+        """
+        from django.core.cache import cache
+
+        cache.clear()
+        self.assertEqual(
+            self.client.get(reverse("user-me")).data["payment_history"], []
+        )
+
+        items = [
+            {"lesson_id": lesson.id, "amount": "100.00"} for lesson in self.lessons
+        ]
+        self.client.post(self.url, {"items": items}, format="json")
+
+        response = self.client.get(reverse("user-me"))
+        self.assertEqual(len(response.data["payment_history"]), 3)
+
+    def test_cart_unknown_lesson(self):
+        """
+        Тест: несуществующий урок в корзине даёт 404 без обращения к Stripe.
+        """
+        items = [{"lesson_id": 9999, "amount": "100.00"}]
+        response = self.client.post(self.url, {"items": items}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.stripe_session.assert_not_called()
+
+    def test_cart_duplicate_items(self):
+        """
+        Тест: одна и та же позиция не может быть в корзине дважды.
+        """
+        items = [{"course_id": self.course.id, "amount": "1000.00"}] * 2
+        response = self.client.post(self.url, {"items": items}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PaymentRollupTestCase(APITestCase):
+    """
+    Тесты агрегатов выручки и эндпоинта /api/payments/stats/.
+    """
+
+    def setUp(self):
+        from materials.models import Course
+
+        self.owner = User.objects.create(email="author@example.com")
+        self.buyer = User.objects.create(email="buyer@example.com")
+        self.course = Course.objects.create(
+            title="Курс", description="Описание", owner=self.owner
+        )
+
+    def create_payment(self, amount, method="cash", **kwargs):
+        from users.models import Payment
+
+        return Payment.objects.create(
+            user=self.buyer,
+            course=self.course,
+            amount=amount,
+            payment_method=method,
+            **kwargs,
+        )
+
+    def rollup_totals(self):
+        from users.models import PaymentRollup
+
+        return sorted(
+            PaymentRollup.objects.filter(payments_count__gt=0).values_list(
+                "payment_method", "total_amount", "payments_count"
+            )
+        )
+
+    def test_rollups_follow_status_transitions(self):
+        """
+        Тест: платеж Stripe попадает в выручку только после оплаты.
+        """
+        from users.rollups import update_session_status
+
+        self.create_payment(1000)
+        self.create_payment(300, method="stripe", stripe_session_id="cs_1")
+        self.assertEqual(self.rollup_totals(), [("cash", 1000, 1)])
+
+        update_session_status("cs_1", "paid")
+        self.assertEqual(self.rollup_totals(), [("cash", 1000, 1), ("stripe", 300, 1)])
+
+        update_session_status("cs_1", "unpaid")
+        self.assertEqual(self.rollup_totals(), [("cash", 1000, 1)])
+
+    def test_rollups_saved_with_payment(self):
+        """
+        Тест: изменение платежа и его вклад в агрегаты - одна транзакция,
+        ошибка при обновлении агрегатов откатывает и сохранение платежа.
+        """
+        from users.models import Payment
+
+        payment = self.create_payment(1000)
+        payment.amount = 700
+        with mock.patch("users.rollups.apply_delta", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                payment.save()
+        self.assertEqual(Payment.objects.get(pk=payment.pk).amount, 1000)
+        self.assertEqual(self.rollup_totals(), [("cash", 1000, 1)])
+
+        payment.save()
+        self.assertEqual(self.rollup_totals(), [("cash", 700, 1)])
+
+    def test_rebuild_matches_incremental(self):
+        """
+        Тест: пересборка (через БД и через NumPy) даёт те же агрегаты.
+        """
+        from users.rollups import rebuild_rollups
+
+        self.create_payment(1000)
+        self.create_payment(500, method="transfer")
+        self.create_payment(250).delete()
+        incremental = self.rollup_totals()
+
+        rebuild_rollups()
+        self.assertEqual(self.rollup_totals(), incremental)
+
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            return
+        rebuild_rollups(use_numpy=True, chunk_size=1)
+        self.assertEqual(self.rollup_totals(), incremental)
+
+    def test_stats_endpoint(self):
+        """
+        Тест: владелец курса видит выручку, посторонний - нет.
+        """
+        self.create_payment(1000)
+        self.create_payment(500, method="transfer")
+        url = reverse("payment-stats") + "?group_by=payment_method"
+
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total_amount"], 1500)
+        self.assertEqual(response.data["payments_count"], 2)
+        self.assertEqual(
+            [row["payment_method"] for row in response.data["results"]],
+            ["cash", "transfer"],
+        )
+
+        self.client.force_authenticate(user=self.buyer)
+        response = self.client.get(url)
+        self.assertEqual(response.data["payments_count"], 0)
+
+    def test_stats_invalid_group_by(self):
+        """
+        Тест: группировка по неизвестному полю даёт 400.
+        """
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.get(reverse("payment-stats") + "?group_by=user")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stats_invalid_object_id(self):
+        """
+        Тест: нечисловой course/lesson даёт 400, а не 500.
+        """
+        self.client.force_authenticate(user=self.owner)
+        for param in ("course", "lesson"):
+            response = self.client.get(reverse("payment-stats") + f"?{param}=abc")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DeactivateInactiveUsersTestCase(APITestCase):
+    """
+    Тесты пакетной блокировки неактивных пользователей.
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        old = timezone.now() - timedelta(days=60)
+        self.stale = [
+            User.objects.create(email=f"stale{i}@example.com", last_login=old)
+            for i in range(5)
+        ]
+        self.never_logged_in = User.objects.create(email="ghost@example.com")
+        User.objects.filter(pk=self.never_logged_in.pk).update(date_joined=old)
+        self.recent = User.objects.create(
+            email="recent@example.com", last_login=timezone.now()
+        )
+        self.new_user = User.objects.create(email="newbie@example.com")
+
+    def test_deactivate_in_batches(self):
+        """
+        Тест: блокируются давно не заходившие и ни разу не заходившие.
+        """
+        from users.tasks import deactivate_inactive_users
+
+        result = deactivate_inactive_users(batch_size=2, pause=0)
+
+        self.assertEqual(result["deactivated"], 6)
+        self.assertEqual(result["batches"], 3)
+        self.assertEqual(
+            set(User.objects.filter(is_active=True).values_list("email", flat=True)),
+            {"recent@example.com", "newbie@example.com"},
+        )
+
+    def test_token_login_keeps_user_active(self):
+        """
+        Тест: вход через JWT записывает last_login, давно
+        зарегистрированный, но активный пользователь не блокируется.
+        """
+        from users.tasks import deactivate_inactive_users
+
+        self.never_logged_in.set_password("testpass123")
+        self.never_logged_in.save(update_fields=["password"])
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"email": "ghost@example.com", "password": "testpass123"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        deactivate_inactive_users(pause=0)
+        self.never_logged_in.refresh_from_db()
+        self.assertTrue(self.never_logged_in.is_active)
+        self.assertIsNotNone(self.never_logged_in.last_login)
+
+    def test_resume_from_checkpoint(self):
+        """
+        Тест: прерванный запуск продолжается с сохранённого id.
+        """
+        from django.core.cache import cache
+
+        from users.tasks import DEACTIVATION_CHECKPOINT_KEY, deactivate_inactive_users
+
+        cache.set(DEACTIVATION_CHECKPOINT_KEY, self.stale[2].pk)
+        result = deactivate_inactive_users(batch_size=100, pause=0)
+
+        self.assertEqual(result["deactivated"], 3)
+        self.assertTrue(User.objects.get(pk=self.stale[0].pk).is_active)
+        self.assertIsNone(cache.get(DEACTIVATION_CHECKPOINT_KEY))
+
+
+class ThrottlingTestCase(APITestCase):
+    """
+    Тесты ограничения частоты запросов (token bucket).
+    """
+
+    def setUp(self):
+        from services.throttling import limiter
+
+        limiter.reset()
+        self.addCleanup(limiter.reset)
+
+        self.user = User.objects.create(email="throttled@example.com")
+        self.user.set_password("testpass123")
+        self.user.save()
+
+    def rates(self, **rates):
+        from django.conf import settings
+
+        return self.settings(
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}
+        )
+
+    def test_login_throttled_per_ip(self):
+        """
+        Тест: после исчерпания лимита логин возвращает 429 с Retry-After.
+        """
+        from services.throttling import limiter
+
+        data = {"email": "throttled@example.com", "password": "testpass123"}
+        for name in ("token_obtain_pair", "token_obtain_async"):
+            # Оба view используют одну область "login"
+            limiter.reset()
+            with self.rates(login="2/min"):
+                for _ in range(2):
+                    response = self.client.post(reverse(name), data, format="json")
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                response = self.client.post(reverse(name), data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertGreater(int(response["Retry-After"]), 0)
+
+    def test_user_and_ip_buckets(self):
+        """
+        Тест: авторизованный запрос списывает токены пользователя и IP,
+        анонимный - только IP.
+        """
+        from services.throttling import scope_buckets
+
+        with self.rates(scope="5/min", scope_ip="50/hour"):
+            user_buckets = scope_buckets("scope", self.user.pk, "10.0.0.1")
+            anonymous_buckets = scope_buckets("scope", None, "10.0.0.1")
+        self.assertEqual(
+            [(bucket.capacity, bucket.duration) for bucket in user_buckets],
+            [(5, 60), (50, 3600)],
+        )
+        self.assertEqual(len(anonymous_buckets), 1)
+        self.assertTrue(anonymous_buckets[0].key.endswith(":ip:10.0.0.1"))
+
+    @override_settings(THROTTLE_BACKEND="redis")
+    def test_falls_back_to_local_memory(self):
+        """
+        Тест: без Redis лимиты продолжают считаться в памяти процесса.
+        """
+        import redis
+
+        from services.throttling import Bucket, limiter
+
+        client = mock.Mock()
+        client.register_script.return_value = mock.Mock(
+            side_effect=redis.ConnectionError
+        )
+        limiter._script = None
+        self.addCleanup(setattr, limiter, "_script", None)
+        buckets = [Bucket("throttle:test:ip:1", 1, 60)]
+        with mock.patch("services.throttling.get_redis", return_value=client):
+            self.assertEqual(limiter.consume(buckets), 0)
+            self.assertGreater(limiter.consume(buckets), 0)
+        client.register_script.return_value.assert_called_once()
+
+
+class ImportUsersTestCase(APITestCase):
+    """
+    Тесты массового импорта пользователей.
+    """
+
+    def setUp(self):
+        from django.contrib.auth.models import Group
+
+        from materials.models import Course
+
+        self.group = Group.objects.create(name="partners")
+        self.course = Course.objects.create(title="Курс партнёра")
+        self.existing = User.objects.create(email="existing@example.com")
+
+    def import_file(self, content, suffix=".csv"):
+        import os
+        import tempfile
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=suffix, delete=False, encoding="utf-8"
+        ) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+
+        out = StringIO()
+        self.err = StringIO()
+        call_command(
+            "import_users",
+            file.name,
+            "--workers=1",
+            f"--group={self.group.name}",
+            f"--course={self.course.pk}",
+            stdout=out,
+            stderr=self.err,
+        )
+        return out.getvalue()
+
+    def test_import_csv(self):
+        """
+        Тест: новые пользователи создаются с хешированным паролем,
+        дубли и некорректные строки пропускаются, группы и подписки
+        назначаются, повторный импорт ничего не дублирует.
+        """
+        content = (
+            "email,password,first_name\n"
+            "new@example.com,secret123,Новый\n"
+            "new@EXAMPLE.COM,other,Дубль\n"
+            "not-an-email,secret123,\n"
+            "existing@example.com,secret123,\n"
+            "nopassword@example.com,,\n"
+        )
+        output = self.import_file(content)
+        self.assertIn("Создано: 2, пропущено: 2, с ошибками: 1", output)
+        self.assertIn("Строки с ошибками: 4", self.err.getvalue())
+        self.assertIn("новых подписок: 3", output)
+
+        user = User.objects.get(email="new@example.com")
+        self.assertTrue(user.check_password("secret123"))
+        self.assertEqual(user.first_name, "Новый")
+        self.assertFalse(
+            User.objects.get(email="nopassword@example.com").has_usable_password()
+        )
+        self.assertEqual(self.group.user_set.count(), 3)
+        self.assertEqual(self.course.subscriptions.count(), 3)
+
+        output = self.import_file(content)
+        self.assertIn("Создано: 0", output)
+        self.assertIn("новых подписок: 0", output)
+        self.assertEqual(self.course.subscriptions.count(), 3)
+
+    def test_import_jsonl(self):
+        """
+        Тест импорта JSONL.
+        """
+        self.import_file(
+            '{"email": "json@example.com", "password": "secret123"}\n\n',
+            suffix=".jsonl",
+        )
+        self.assertTrue(
+            User.objects.get(email="json@example.com").check_password("secret123")
+        )
+
+    def test_import_jsonl_malformed_rows(self):
+        """
+        Тест: нестроковые значения приводятся к строке, битый JSON и
+        строки не-объекты считаются ошибочными с номерами строк.
+        """
+        output = self.import_file(
+            '{"email": "typed@example.com", "phone": 79001234567, "city": null}\n'
+            '{"email": "broken@example.com",\n'
+            "\n"
+            "[1, 2]\n"
+            '{"email": "after@example.com"}\n',
+            suffix=".jsonl",
+        )
+        self.assertIn("Создано: 2, пропущено: 0, с ошибками: 2", output)
+        self.assertIn("Строки с ошибками: 2, 4", self.err.getvalue())
+        user = User.objects.get(email="typed@example.com")
+        self.assertEqual(user.phone, "79001234567")
+        self.assertIsNone(user.city)
+
+
+class PaymentAdminTestCase(APITestCase):
+    """
+    Тесты списка платежей в админке.
+    """
+
+    def setUp(self):
+        from materials.models import Course
+        from users.models import Payment
+
+        self.admin = User.objects.create_superuser("admin@example.com", "adminpass")
+        self.course = Course.objects.create(title="Курс", description="Описание")
+        self.other_course = Course.objects.create(title="Другой", description="")
+        Payment.objects.bulk_create(
+            Payment(
+                user=self.admin,
+                course=self.course if i % 3 else self.other_course,
+                amount=i,
+                payment_method="cash",
+            )
+            for i in range(30)
+        )
+        self.client.force_login(self.admin)
+        self.url = reverse("admin:users_payment_changelist")
+
+    def test_changelist_queries_do_not_grow(self):
+        """
+        Тест: число запросов списка не зависит от количества строк.
+        """
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url, {"course": self.other_course.pk})
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(small), len(large))
+
+    def test_filter_by_course_id(self):
+        """
+        Тест фильтра по ID курса.
+        """
+        response = self.client.get(self.url, {"course": self.other_course.pk})
+        self.assertEqual(response.context["cl"].result_count, 10)
+
+    def test_search_by_email_and_course(self):
+        """
+        Тест поиска платежей по email пользователя и названию курса.
+        """
+        response = self.client.get(self.url, {"q": "admin@"})
+        self.assertEqual(response.context["cl"].result_count, 30)
+        response = self.client.get(self.url, {"q": "Друг"})
+        self.assertEqual(response.context["cl"].result_count, 10)
+
+    def test_estimated_count(self):
+        """
+        Тест: на больших таблицах PostgreSQL COUNT(*) не выполняется.
+        """
+        from django.db import connection
+
+        from users.models import Payment
+        from users.paginators import EstimatedCountPaginator
+
+        paginator = EstimatedCountPaginator(Payment.objects.order_by("id"), 100)
+        with mock.patch.object(connection, "vendor", "postgresql"), mock.patch.object(
+            EstimatedCountPaginator, "estimate", return_value=10_000_000
+        ), self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 10_000_000)
+
+
+class StaffUserSearchTestCase(APITestCase):
+    """
+    Тесты поиска пользователей для сотрудников.
+    """
+
+    def setUp(self):
+        self.staff = User.objects.create(email="support@example.com", is_staff=True)
+        self.user = User.objects.create(
+            email="ivan.petrov@example.com", first_name="Иван", last_name="Петров"
+        )
+        User.objects.create(email="maria@example.com", first_name="Мария")
+        self.url = reverse("user-staff-search")
+
+    def test_prefix_search(self):
+        """
+        Тест: на SQLite по умолчанию поиск по началу email/имени.
+        """
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(self.url, {"q": "ivan"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [user["email"] for user in response.data["results"]],
+            ["ivan.petrov@example.com"],
+        )
+        response = self.client.get(self.url, {"q": "Петр"})
+        self.assertEqual(len(response.data["results"]), 1)
+
+    @override_settings(SEARCH_BACKEND="users.search.TrigramSearchBackend")
+    def test_substring_search(self):
+        """
+        Тест: триграммный бэкенд ищет по подстроке.
+        """
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(self.url, {"q": "petrov"})
+        self.assertEqual(len(response.data["results"]), 1)
+        response = self.client.get(self.url, {"q": "example", "limit": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_invalid_limit(self):
+        """
+        Тест: нечисловой и неположительный limit дают 400, а не 500.
+        """
+        self.client.force_authenticate(user=self.staff)
+        for limit in ("abc", "0", "-5"):
+            response = self.client.get(self.url, {"q": "ivan", "limit": limit})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_requires_staff(self):
+        """
+        Тест: обычный пользователь не может искать пользователей.
+        """
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url, {"q": "ivan"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class DatabasePoolStatsTestCase(APITestCase):
+    """
+    Тесты статистики соединений с БД.
+    """
+
+    def setUp(self):
+        self.url = reverse("db-pool-stats")
+        self.pool = mock.Mock()
+        self.pool.get_stats.return_value = {
+            "requests_num": 5,
+            "requests_queued": 2,
+            "requests_errors": 1,
+        }
+        self.pooled = SimpleNamespace(
+            alias="default",
+            settings_dict={"OPTIONS": {"pool": {"max_size": 4}}},
+            _connection_pools={"default": self.pool},
+            connection=object(),
+        )
+
+    def test_stats_for_admin_only(self):
+        """
+        Тест: статистика доступна только администратору.
+        """
+        self.client.force_authenticate(user=User.objects.create(email="u@e.com"))
+        self.assertEqual(
+            self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN
+        )
+
+        admin = User.objects.create(email="admin@e.com", is_staff=True)
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["default"]["mode"], "persistent")
+
+    def test_pool_stats(self):
+        """
+        Тест: выдачи, ожидания и таймауты берутся из статистики пула.
+        """
+        from services import db_pool
+
+        with mock.patch.object(db_pool, "connections", {"default": self.pooled}):
+            stats = db_pool.pool_stats()["default"]
+        self.assertEqual(stats["mode"], "pool")
+        self.assertEqual(
+            (stats["checkouts"], stats["waits"], stats["timeouts"]), (5, 2, 1)
+        )
+        self.assertEqual(stats["available"], 0)
+
+    def test_reset_after_fork(self):
+        """
+        Тест: после fork пул и соединение родителя забываются без закрытия.
+        """
+        from services import db_pool
+
+        with mock.patch.object(db_pool, "connections", {"default": self.pooled}):
+            db_pool.reset_after_fork()
+        self.assertEqual(self.pooled._connection_pools, {})
+        self.assertIsNone(self.pooled.connection)
+        self.pool.close.assert_not_called()
+        self.assertIn(self.pool, db_pool._inherited)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTestCase(APITestCase):
+    """
+    Тесты маршрутизации чтений на реплики.
+    """
+
+    def setUp(self):
+        from django.core.cache import cache
+        from django.test import RequestFactory
+
+        cache.clear()
+        self.factory = RequestFactory()
+        self.user = User.objects.create(email="reader@example.com")
+        self.other_user = User.objects.create(email="other_reader@example.com")
+
+    def request(self, method, path, user, write=False):
+        """
+        Проводит запрос через middleware и возвращает БД, выбранную
+        роутером для чтения внутри view.
+        """
+        from django.db import router
+
+        from services.db_router import ReplicaRoutingMiddleware
+
+        token = RefreshToken.for_user(user).access_token
+        request = getattr(self.factory, method)(
+            path, headers={"authorization": f"Bearer {token}"}
+        )
+        chosen = []
+
+        def view(request):
+            if write:
+                router.db_for_write(User)
+            # Как DRF после аутентификации
+            request.user = user
+            chosen.append(router.db_for_read(User))
+            return None
+
+        ReplicaRoutingMiddleware(view)(request)
+        return chosen[0]
+
+    def test_safe_api_reads_use_replica(self):
+        """
+        Тест: GET к API читает с реплики, админка и POST - с основной БД.
+        """
+        self.assertEqual(self.request("get", "/api/courses/", self.user), "replica")
+        self.assertEqual(self.request("get", "/admin/", self.user), "default")
+        self.assertEqual(self.request("post", "/api/courses/", self.user), "default")
+
+    def test_read_your_writes(self):
+        """
+        Тест: после записи пользователь читает с основной БД.
+        """
+        self.assertEqual(
+            self.request("get", "/api/courses/", self.user, write=True), "default"
+        )
+        self.assertEqual(self.request("get", "/api/courses/", self.user), "default")
+        self.assertEqual(
+            self.request("get", "/api/courses/", self.other_user), "replica"
+        )
+
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            self.request("post", "/api/courses/", self.other_user, write=True)
+        self.assertEqual(
+            self.request("get", "/api/courses/", self.other_user), "replica"
+        )
+
+    @override_settings(DATABASE_REPLICAS=["replica", "replica2"])
+    def test_one_replica_per_request(self):
+        """
+        Тест: все чтения одного запроса идут с одной реплики.
+        """
+        from django.db import router
+
+        from services.db_router import replica_reads
+
+        with replica_reads():
+            chosen = {router.db_for_read(User) for _ in range(20)}
+        self.assertEqual(len(chosen), 1)
+
+    @override_settings(PAYMENT_HISTORY_CACHE_TIMEOUT=60)
+    async def test_shared_caches_filled_from_primary(self):
+        """
+        Тест: кеш аутентификации и истории платежей заполняется с основной
+        БД, даже когда чтения разрешены с реплики.
+        """
+        from asgiref.sync import sync_to_async
+
+        from services.db_router import replica_reads
+        from users.auth_cache import aget_cached_user, get_cached_user, invalidate_user
+        from users.payment_history import (
+            invalidate_payment_history,
+            load_payment_history,
+        )
+
+        # Реплики "replica" нет среди DATABASES: чтение с неё упало бы
+        with replica_reads():
+            user = await sync_to_async(get_cached_user)(self.user.pk)
+            self.assertTrue(user.is_active)
+            await sync_to_async(invalidate_user)(self.user.pk)
+            user = await aget_cached_user(self.user.pk)
+            self.assertTrue(user.is_active)
+            await sync_to_async(invalidate_payment_history)(self.user.pk)
+            history = await sync_to_async(load_payment_history)([self.user.pk])
+            self.assertEqual(history, {self.user.pk: []})
+
+    async def test_async_middleware(self):
+        """
+        Тест: в ASGI middleware вызывается без адаптера и пинит писавшего.
+        """
+        from asgiref.sync import iscoroutinefunction
+        from django.db import router
+
+        from services.db_router import ReplicaRoutingMiddleware, is_pinned
+
+        token = RefreshToken.for_user(self.user).access_token
+        chosen = []
+
+        async def view(request):
+            chosen.append(router.db_for_read(User))
+            if request.method == "POST":
+                router.db_for_write(User)
+                request.user = self.user
+            return None
+
+        middleware = ReplicaRoutingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        headers = {"authorization": f"Bearer {token}"}
+        await middleware(self.factory.get("/api/courses/", headers=headers))
+        await middleware(self.factory.post("/api/courses/", headers=headers))
+        self.assertEqual(chosen, ["replica", "default"])
+        self.assertTrue(is_pinned(self.user.pk))
+
+    def test_replica_reads_block(self):
+        """
+        Тест: replica_reads() для сканов вне запроса.
+        """
+        from django.db import router
+
+        from services.db_router import replica_reads
+
+        self.assertEqual(router.db_for_read(User), "default")
+        with replica_reads():
+            self.assertEqual(router.db_for_read(User), "replica")
+        self.assertEqual(router.db_for_read(User), "default")
+
+
+class CeleryQueuesTestCase(APITestCase):
+    """
+    Тесты маршрутизации задач по очередям и замера задержки очередей.
+    """
+
+    def test_routes(self):
+        """
+        Тест: задачи попадают в очереди своего класса нагрузки.
+        """
+        from django_lms_project.celery import app
+
+        routes = {
+            "materials.tasks.send_course_update_email": "notifications",
+            "users.tasks.deactivate_inactive_users": "maintenance",
+            "users.tasks.clear_expired_idempotency_keys": "maintenance",
+            "users.tasks.refund_payment": "payments",
+            "lms.queue_probe": "default",
+        }
+        for name, queue in routes.items():
+            self.assertEqual(app.amqp.router.route({}, name)["queue"].name, queue)
+
+    def test_task_options(self):
+        """
+        Тест: письма не пишут результат, задачи обслуживания - acks_late.
+        """
+        from materials.tasks import send_course_update_email
+        from users.tasks import deactivate_inactive_users
+
+        self.assertTrue(send_course_update_email.ignore_result)
+        self.assertTrue(deactivate_inactive_users.acks_late)
+
+    def test_queue_latency(self):
+        """
+        Тест: время ожидания считается от отметки при отправке.
+        """
+        import time
+
+        from django.core.cache import cache
+
+        from services.queue_latency import (
+            PUBLISHED_HEADER,
+            queue_latencies,
+            stamp_published,
+        )
+        from services.task_stats import _running, flush, task_started
+
+        cache.clear()
+        headers = {}
+        stamp_published(headers=headers)
+        task = SimpleNamespace(
+            name="users.tasks.refund_payment",
+            request=SimpleNamespace(
+                delivery_info={"routing_key": "payments"},
+                **{PUBLISHED_HEADER: headers[PUBLISHED_HEADER] - 2},
+            ),
+        )
+        task_started(task_id="t1", task=task)
+        self.addCleanup(_running.pop, "t1", None)
+        # Замер пишется в кеш пачкой вместе со статистикой задач
+        self.assertIsNone(queue_latencies(["payments"])["payments"])
+        flush()
+
+        latencies = queue_latencies(["payments", "notifications"])
+        self.assertGreaterEqual(latencies["payments"]["latency"], 2)
+        self.assertIsNone(latencies["notifications"])
+        self.assertLess(time.time() - latencies["payments"]["at"], 5)
+
+
+class ApiSchemaTestCase(APITestCase):
+    """
+    Тесты отдачи собранной схемы OpenAPI.
+    """
+
+    def setUp(self):
+        import tempfile
+        from pathlib import Path
+
+        from django_lms_project import api_schema
+
+        self.schema_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.schema_dir.cleanup)
+        path = Path(self.schema_dir.name)
+        (path / "schema-v1.json").write_bytes(b'{"swagger": "2.0"}')
+        settings_override = override_settings(API_SCHEMA_DIR=path, API_VERSION="v1")
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        api_schema._schemas.clear()
+        self.addCleanup(api_schema._schemas.clear)
+
+    def test_schema_served_with_etag(self):
+        """
+        Тест: схема из файла со строгим ETag и долгим кешированием.
+        """
+        response = self.client.get(reverse("schema-json", args=[".json"]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, b'{"swagger": "2.0"}')
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("max-age=", response["Cache-Control"])
+
+        response = self.client.get(
+            reverse("schema-json", args=[".json"]),
+            headers={"if-none-match": response["ETag"]},
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_regenerated_schema_reloaded(self):
+        """
+        Тест: пересобранный файл схемы отдаётся с новым ETag без перезапуска.
+        """
+        import os
+
+        from django.conf import settings
+
+        url = reverse("schema-json", args=[".json"])
+        etag = self.client.get(url)["ETag"]
+
+        path = settings.API_SCHEMA_DIR / "schema-v1.json"
+        path.write_bytes(b'{"swagger": "2.0", "info": {}}')
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, b'{"swagger": "2.0", "info": {}}')
+        self.assertNotEqual(response["ETag"], etag)
+
+    @override_settings(API_DOCS_ENABLED=False)
+    def test_missing_schema_without_docs(self):
+        """
+        Тест: без файла и с выключенной документацией - 404, схема не строится.
+        """
+        from django.conf import settings
+
+        url = reverse("schema-json", args=[".yaml"])
+        with mock.patch("django_lms_project.api_schema.generate_schema") as generate:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        generate.assert_not_called()
+
+        # Отсутствие не запоминается: собранный позже файл отдаётся
+        (settings.API_SCHEMA_DIR / "schema-v1.yaml").write_bytes(b"swagger: '2.0'\n")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+
+class StartupTestCase(APITestCase):
+    """
+    Тесты холодного запуска веб-процесса и воркера Celery.
+    """
+
+    def test_parse_importtime(self):
+        """
+        Тест: разбор вывода python -X importtime.
+        """
+        from services.startup import ImportTiming, by_package, parse_importtime
+
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   django.utils\n"
+            "import time:       300 |        420 | django\n"
+            "Traceback (most recent call last):\n"
+        )
+        timings = parse_importtime(output)
+        self.assertEqual(
+            timings,
+            [
+                ImportTiming("django.utils", 120, 120, 1),
+                ImportTiming("django", 300, 420, 0),
+            ],
+        )
+        self.assertEqual(by_package(timings), {"django": 420})
+
+    def test_cold_start_within_budget(self):
+        """
+        Тест: время импорта при запуске не выходит за бюджет, тяжёлые
+        необязательные модули не загружаются до первого использования.
+        """
+        from django.conf import settings
+
+        from services.startup import TARGETS, measure
+
+        for target in TARGETS:
+            with self.subTest(target=target):
+                result = measure(target)
+                modules = {timing.module for timing in result["timings"]}
+                self.assertIn("django_lms_project.celery", modules)
+                self.assertNotIn("stripe", modules)
+                self.assertNotIn("drf_yasg.views", modules)
+                self.assertLessEqual(
+                    result["import_seconds"], settings.STARTUP_IMPORT_BUDGET
+                )
+
+
+@override_settings(DEBUG=True)
+class MetricsTestCase(APITestCase):
+    """
+    Тесты метрик Prometheus.
+    """
+
+    def setUp(self):
+        self.url = reverse("metrics")
+
+    def test_request_metrics_by_view_and_action(self):
+        """
+        Тест: время и число SQL-запросов по классу представления и действию.
+        """
+        from prometheus_client import REGISTRY
+
+        labels = {"view": "UserViewSet", "action": "me"}
+        before = (
+            REGISTRY.get_sample_value("lms_http_request_db_queries_count", labels) or 0
+        )
+        self.client.force_authenticate(user=User.objects.create(email="m@e.com"))
+        self.client.get(reverse("user-me"))
+
+        self.assertEqual(
+            REGISTRY.get_sample_value("lms_http_request_db_queries_count", labels),
+            before + 1,
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(
+            b'lms_http_request_duration_seconds_count{action="me",method="GET",'
+            b'status="200",view="UserViewSet"}',
+            response.content,
+        )
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token(self):
+        """
+        Тест: с METRICS_TOKEN метрики отдаются только с токеном.
+        """
+        self.assertEqual(
+            self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        response = self.client.get(self.url, headers={"authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(DEBUG=False)
+    def test_private_without_token(self):
+        """
+        Тест: без METRICS_TOKEN и DEBUG метрики не отдаются.
+        """
+        self.assertEqual(
+            self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND
+        )
+
+    async def test_async_middleware(self):
+        """
+        Тест: в ASGI middleware вызывается без адаптера и считает запросы.
+        """
+        from types import SimpleNamespace
+
+        from asgiref.sync import iscoroutinefunction, sync_to_async
+        from django.db import connection
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from prometheus_client import REGISTRY
+
+        from services.metrics import MetricsMiddleware
+
+        labels = {"view": "async_view", "action": ""}
+
+        def count_users():
+            # Другой поток со своим соединением, как у запроса в ASGIHandler
+            try:
+                return User.objects.count()
+            finally:
+                connection.close()
+
+        async def async_view(request):
+            await sync_to_async(count_users, thread_sensitive=False)()
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        request.resolver_match = SimpleNamespace(
+            func=async_view, view_name="async_view"
+        )
+        middleware = MetricsMiddleware(async_view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        before = (
+            REGISTRY.get_sample_value("lms_http_request_db_queries_sum", labels) or 0
+        )
+        await middleware(request)
+        self.assertEqual(
+            REGISTRY.get_sample_value("lms_http_request_db_queries_sum", labels),
+            before + 1,
+        )
+
+    def test_dead_worker_marked(self):
+        """
+        Тест: завершение процесса Celery и воркера uvicorn отмечается
+        в многопроцессном режиме prometheus_client.
+        """
+        import os
+
+        from asgiref.sync import async_to_sync
+
+        from django_lms_project.asgi import application
+        from django_lms_project.celery import mark_metrics_process_dead
+
+        messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        with mock.patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": "/tmp/m"}):
+            with mock.patch("prometheus_client.multiprocess.mark_process_dead") as mark:
+                mark_metrics_process_dead(pid=123)
+                async_to_sync(application)({"type": "lifespan"}, receive, send)
+        self.assertEqual(
+            [call.args[0] for call in mark.call_args_list], [123, os.getpid()]
+        )
+        self.assertEqual(
+            sent, ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+        )
+
+    def test_stripe_errors_counted(self):
+        """
+        Тест: время вызовов Stripe и ошибки по типам.
+        """
+        from prometheus_client import REGISTRY
+
+        from services.stripe_service import create_stripe_product, get_stripe
+
+        stripe = get_stripe()
+        errors = {"operation": "create_product", "error": "APIConnectionError"}
+        before = REGISTRY.get_sample_value("lms_stripe_errors_total", errors) or 0
+        with mock.patch.object(
+            stripe.Product,
+            "create",
+            side_effect=stripe.error.APIConnectionError("down"),
+        ):
+            with self.assertRaises(stripe.error.APIConnectionError):
+                create_stripe_product("Курс")
+
+        self.assertEqual(
+            REGISTRY.get_sample_value("lms_stripe_errors_total", errors), before + 1
+        )
+        self.assertGreaterEqual(
+            REGISTRY.get_sample_value(
+                "lms_stripe_request_duration_seconds_count",
+                {"operation": "create_product"},
+            ),
+            1,
+        )
+
+    def test_multiprocess_aggregation(self):
+        """
+        Тест: значения процессов разных сервисов суммируются из общего каталога.
+        """
+        import os
+        import subprocess
+        import sys
+        import tempfile
+
+        from prometheus_client import CollectorRegistry
+
+        from services.metrics import AggregateCollector
+
+        script = (
+            "from services.metrics import STRIPE_ERRORS; "
+            "STRIPE_ERRORS.labels('create_price', 'CardError').inc()"
+        )
+        with tempfile.TemporaryDirectory() as root:
+            for service in ("backend", "celery"):
+                subprocess.run(
+                    [sys.executable, "-c", script],
+                    env={
+                        **os.environ,
+                        "PROMETHEUS_MULTIPROC_DIR": os.path.join(root, service),
+                    },
+                    check=True,
+                )
+            registry = CollectorRegistry()
+            registry.register(AggregateCollector(root))
+            value = registry.get_sample_value(
+                "lms_stripe_errors_total",
+                {"operation": "create_price", "error": "CardError"},
+            )
+        self.assertEqual(value, 2)
+
+
+class TaskStatsTestCase(APITestCase):
+    """
+    Тесты статистики задач Celery.
+    """
+
+    def setUp(self):
+        import tempfile
+        from pathlib import Path
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            TASK_STATS_BACKEND="sqlite",
+            TASK_STATS_SQLITE_PATH=str(Path(directory.name) / "stats.sqlite3"),
+            TASK_STATS_SAMPLES=3,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = mock.patch("services.task_stats._store", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_task(self, task_id, waited=0.0, error=None):
+        import time
+
+        from services.queue_latency import PUBLISHED_HEADER
+        from services.task_stats import task_failed, task_finished, task_started
+
+        task = SimpleNamespace(
+            name="materials.tasks.send_course_update_email",
+            request=SimpleNamespace(
+                delivery_info={"routing_key": "notifications"},
+                eta=None,
+                **{PUBLISHED_HEADER: time.time() - waited},
+            ),
+        )
+        task_started(task_id=task_id, task=task)
+        if error is not None:
+            task_failed(task_id=task_id, exception=error)
+        task_finished(
+            task_id=task_id,
+            task=task,
+            state="FAILURE" if error is not None else "SUCCESS",
+        )
+
+    def test_events_recorded_and_summarized(self):
+        """
+        Тест: ожидание, выполнение и причины ошибок по задаче.
+        """
+        from services.task_stats import flush, get_store, summarize
+
+        self.run_task("t1", waited=2)
+        self.run_task("t2", error=ConnectionRefusedError())
+        flush()
+
+        events = get_store().read()["materials.tasks.send_course_update_email"]
+        summary = summarize(events)
+        self.assertEqual(summary["count"], 2)
+        self.assertEqual(summary["states"], {"SUCCESS": 1, "FAILURE": 1})
+        self.assertEqual(summary["reasons"], {"ConnectionRefusedError": 1})
+        self.assertGreaterEqual(summary["wait"]["max"], 2)
+        self.assertLess(summary["wait"]["p50"], 1)
+        self.assertEqual({event.queue for event in events}, {"notifications"})
+
+    def test_rolling_window(self):
+        """
+        Тест: хранятся только последние TASK_STATS_SAMPLES событий задачи.
+        """
+        from services.task_stats import flush, get_store
+
+        for i in range(5):
+            self.run_task(f"t{i}", waited=i)
+            flush()
+
+        events = get_store().read()["materials.tasks.send_course_update_email"]
+        self.assertEqual(len(events), 3)
+        # Последние события - с самым долгим ожиданием
+        self.assertGreaterEqual(min(event.wait for event in events), 2)
+
+    def test_percentile(self):
+        """
+        Тест: перцентили методом ближайшего ранга.
+        """
+        from services.task_stats import percentile
+
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([5], 95), 5)
+        self.assertIsNone(percentile([], 50))
+
+    def test_command(self):
+        """
+        Тест: команда celery_stats выводит перцентили по задачам.
+        """
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        self.run_task("t1", waited=1)
+        out = StringIO()
+        call_command("celery_stats", stdout=out)
+        output = out.getvalue()
+        self.assertIn("materials.tasks.send_course_update_email", output)
+        self.assertIn("SUCCESS 1", output)
+        self.assertIn("p95", output)
+
+        call_command("celery_stats", "--reset", stdout=StringIO())
+        out = StringIO()
+        call_command("celery_stats", stdout=out)
+        self.assertIn("Событий нет", out.getvalue())
+
+
+class UploadTestCase(APITestCase):
+    """
+    Тесты потоковой загрузки изображений и загрузки частями.
+    """
+
+    def setUp(self):
+        import tempfile
+
+        from materials.models import Course
+
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.owner = User.objects.create(email="uploads_owner@example.com")
+        self.course = Course.objects.create(
+            title="Курс", description="", owner=self.owner
+        )
+        self.client.force_authenticate(user=self.owner)
+        self.url = reverse("upload-list")
+
+    def image(self, size=(64, 48), fmt="PNG", noise=False):
+        import os
+        from io import BytesIO
+
+        from PIL import Image
+
+        if noise:
+            image = Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+        else:
+            image = Image.new("RGB", size, "blue")
+        buffer = BytesIO()
+        image.save(buffer, fmt)
+        return buffer.getvalue()
+
+    def post_file(self, content, name="photo.png", **data):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        data = {"target": "course", "object_id": self.course.pk, **data}
+        data["file"] = SimpleUploadedFile(name, content)
+        with mock.patch("users.views.process_upload.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.url, data, format="multipart")
+        return response, delay
+
+    def patch_chunk(self, upload_id, offset, data):
+        url = reverse("upload-detail", args=[upload_id])
+        with mock.patch("users.views.process_upload.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.generic(
+                    "PATCH",
+                    url,
+                    data,
+                    content_type="application/offset+octet-stream",
+                    HTTP_UPLOAD_OFFSET=str(offset),
+                )
+        return response, delay
+
+    def process(self, upload_id):
+        from users.tasks import process_upload
+
+        with mock.patch("materials.tasks.generate_preview_variants.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                process_upload(upload_id)
+        return delay
+
+    def test_file_upload_processed_by_worker(self):
+        """
+        Тест: файл из multipart принят (202) с размерами из заголовка,
+        воркер сохраняет его в превью курса и ставит задачу копий.
+        """
+        from services.uploads import staging_path
+
+        from .models import Upload
+
+        response, delay = self.post_file(self.image((640, 480)))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], Upload.STATUS_PROCESSING)
+        self.assertEqual(
+            (response.data["format"], response.data["width"], response.data["height"]),
+            ("PNG", 640, 480),
+        )
+        upload_id = response.data["id"]
+        delay.assert_called_once_with(upload_id)
+        self.assertTrue(staging_path(upload_id).exists())
+
+        variants_delay = self.process(upload_id)
+        self.course.refresh_from_db()
+        self.assertTrue(self.course.preview.name.startswith("courses/photo"))
+        self.assertTrue(self.course.preview.name.endswith(".png"))
+        variants_delay.assert_called_once_with("course", self.course.pk)
+        self.assertFalse(staging_path(upload_id).exists())
+
+        response = self.client.get(reverse("upload-detail", args=[upload_id]))
+        self.assertEqual(response.data["status"], Upload.STATUS_DONE)
+
+    def test_invalid_files_rejected(self):
+        """
+        Тест: не изображение и слишком большое по пикселям изображение
+        отклоняются по заголовку, загрузка не создаётся.
+        """
+        from .models import Upload
+
+        response, delay = self.post_file(b"not an image at all", name="doc.png")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("file", response.data)
+
+        with override_settings(IMAGE_UPLOAD_MAX_PIXELS=1000):
+            response, delay = self.post_file(self.image((100, 100)))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("100x100", response.data["file"][0])
+
+        with override_settings(IMAGE_UPLOAD_MAX_SIZE=1000):
+            response, delay = self.post_file(self.image((300, 300), noise=True))
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        delay.assert_not_called()
+        self.assertFalse(Upload.objects.exists())
+
+    def test_foreign_object_forbidden(self):
+        """
+        Тест: превью чужого курса загрузить нельзя, аватар - только свой.
+        """
+        from .models import Upload
+
+        other = User.objects.create(email="uploads_other@example.com")
+        self.client.force_authenticate(user=other)
+        response, _ = self.post_file(self.image())
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response, _ = self.post_file(self.image(), target="avatar", object_id="")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(Upload.objects.get().object_id, other.pk)
+
+    def test_resumable_upload(self):
+        """
+        Тест: загрузка частями с проверкой смещения, размеры известны после
+        первой части, последняя часть отдаёт файл воркеру.
+        """
+        from materials.models import Lesson
+        from services.uploads import staging_path
+
+        from .models import Upload
+
+        lesson = Lesson.objects.create(
+            title="Урок", course=self.course, owner=self.owner
+        )
+        content = self.image((400, 300), fmt="JPEG", noise=True)
+        response = self.client.post(
+            self.url,
+            {
+                "target": "lesson",
+                "object_id": lesson.pk,
+                "filename": "lesson.jpg",
+                "size": len(content),
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload_id = response.data["id"]
+
+        third = len(content) // 3
+        response, _ = self.patch_chunk(upload_id, 0, content[:third])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["offset"], third)
+        self.assertEqual(response.data["width"], 400)
+
+        # Повтор уже принятой части (клиент не получил ответ)
+        response, _ = self.patch_chunk(upload_id, 0, content[:third])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response["Upload-Offset"], str(third))
+
+        response, delay = self.patch_chunk(upload_id, third, content[third:])
+        self.assertEqual(response.data["status"], Upload.STATUS_PROCESSING)
+        delay.assert_called_once_with(upload_id)
+        with open(staging_path(upload_id), "rb") as file:
+            self.assertEqual(file.read(), content)
+
+        self.process(upload_id)
+        lesson.refresh_from_db()
+        self.assertTrue(lesson.preview.name.endswith("lesson.jpg"))
+
+    def test_resumable_rejects_non_image_and_stale_cleared(self):
+        """
+        Тест: часть не с изображением завершает загрузку ошибкой, брошенные
+        загрузки удаляются вместе с файлами, зависшие в обработке -
+        завершаются ошибкой.
+        """
+        from services.uploads import staging_path
+
+        from .models import Upload
+        from .tasks import clear_stale_uploads
+
+        response = self.client.post(
+            self.url,
+            {"target": "avatar", "filename": "a.png", "size": 20},
+            format="json",
+        )
+        failed_id = response.data["id"]
+        response, delay = self.patch_chunk(failed_id, 0, b"x" * 20)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Upload.objects.get(pk=failed_id).status, Upload.STATUS_FAILED)
+        self.assertFalse(staging_path(failed_id).exists())
+        delay.assert_not_called()
+
+        response = self.client.post(
+            self.url,
+            {"target": "avatar", "filename": "a.png", "size": 1000},
+            format="json",
+        )
+        abandoned_id = response.data["id"]
+        self.patch_chunk(abandoned_id, 0, self.image()[:10])
+        # Повторы обработки исчерпаны: загрузка осталась в processing
+        stuck_id = self.post_file(self.image())[0].data["id"]
+        Upload.objects.update(updated_at=timezone.now() - timedelta(days=2))
+
+        clear_stale_uploads()
+        stuck = Upload.objects.get()
+        self.assertEqual(str(stuck.pk), stuck_id)
+        self.assertEqual(stuck.status, Upload.STATUS_FAILED)
+        self.assertFalse(staging_path(abandoned_id).exists())
+        self.assertFalse(staging_path(stuck_id).exists())
+
+    def test_processing_retried(self):
+        """
+        Тест: сбой хранилища при обработке - повтор задачи, а не ошибка
+        загрузки.
+        """
+        from services.uploads import attach_upload
+
+        from .models import Upload
+        from .tasks import process_upload
+
+        upload_id = self.post_file(self.image())[0].data["id"]
+
+        def flaky_attach(upload):
+            if attach.call_count == 1:
+                raise OSError("storage unavailable")
+            return attach_upload(upload)
+
+        with mock.patch(
+            "users.tasks.attach_upload", side_effect=flaky_attach
+        ) as attach:
+            with mock.patch("materials.tasks.generate_preview_variants.delay"):
+                process_upload.apply(args=[upload_id])
+        self.assertEqual(attach.call_count, 2)
+        self.assertEqual(Upload.objects.get(pk=upload_id).status, Upload.STATUS_DONE)
@@ -3,10 +3,12 @@ from rest_framework.permissions import AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from users.views import UserCreateAPIView
+from users.views_async import AsyncRegisterView, AsyncTokenObtainPairView
 
 
 class PublicTokenObtainPairView(TokenObtainPairView):
     permission_classes = [AllowAny]
+    throttle_scope = "login"
 
 
 class PublicTokenRefreshView(TokenRefreshView):
@@ -17,4 +19,7 @@ urlpatterns = [
     path("token/", PublicTokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", PublicTokenRefreshView.as_view(), name="token_refresh"),
     path("register/", UserCreateAPIView.as_view(), name="register"),
+    # Асинхронные варианты для запуска под ASGI
+    path("async/token/", AsyncTokenObtainPairView.as_view(), name="token_obtain_async"),
+    path("async/register/", AsyncRegisterView.as_view(), name="register_async"),
 ]
@@ -1,40 +1,109 @@
+from datetime import date, timedelta
 from decimal import Decimal
 
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg import openapi
-from drf_yasg.utils import swagger_auto_schema
+from drf_yasg.utils import no_body, swagger_auto_schema
 from rest_framework import generics, permissions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.filters import OrderingFilter
+from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
 
 from materials.models import Course, Lesson
+from services.idempotency import idempotent, stripe_idempotency_key
 from services.stripe_service import (
+    create_stripe_cart_checkout_session,
     create_stripe_checkout_session,
     create_stripe_price,
     create_stripe_product,
 )
+from services.uploads import (
+    ImageUploadHandler,
+    UploadRejected,
+    read_file_header,
+    remove_staged,
+    staging_path,
+    write_chunk,
+)
 
+from .exports import EXPORT_FORMATS, export_stream
 from .filters import PaymentFilter
-from .models import Payment, User
-from .permissions import IsModerator, IsOwner
+from .models import Payment, PaymentRollup, Upload, User
+from .paginators import PaymentKeysetPagination, UserCursorPagination
+from .payment_history import invalidate_payment_history
+from .permissions import IsModerator, IsOwner, is_moderator
+from .rollups import update_session_status
+from .search import USER_SEARCH_FIELDS, get_search_backend
 from .serializers import (
+    CartCheckoutSerializer,
     PaymentCreateSerializer,
     PaymentSerializer,
+    UploadSerializer,
     UserDetailSerializer,
     UserPublicSerializer,
+    UserSearchSerializer,
+    requested_fields,
 )
+from .tasks import process_upload
+
+# Максимум результатов staff-поиска пользователей
+SEARCH_MAX_LIMIT = 50
 
 
 class UserViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet для работы с пользователями.
+
+    Список отдаётся курсорной пагинацией по email.
+
+    Параметры списка (query parameters):
+    - ?search=ivan - поиск по началу email, имени или фамилии
+    - ?fields=id,email - вернуть только указанные поля
+    """
+
     queryset = User.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = UserCursorPagination
+    filter_backends = [SearchFilter]
+    # ^ - поиск по началу строки, его поддерживают индексы из миграции 0007
+    search_fields = ["^email", "^first_name", "^last_name"]
+
+    def get_queryset(self):
+        """
+        Для списка с ?fields= читаем из БД только нужные колонки.
+        """
+        queryset = super().get_queryset()
+        if self.action == "list":
+            fields = requested_fields(self.request, UserPublicSerializer)
+            if fields:
+                # email нужен курсору пагинации
+                queryset = queryset.only(*fields, "email")
+        return queryset
+
+    def get_object(self):
+        """
+        Объект загружается один раз за запрос: его использует и выбор
+        сериализатора, и сам retrieve/update.
+        """
+        if not hasattr(self, "_object"):
+            self._object = super().get_object()
+        return self._object
 
     def get_serializer_class(self):
         """
         Выбираем сериализатор в зависимости от действия и прав.
         """
+        if getattr(self, "swagger_fake_view", False):
+            return UserDetailSerializer
+
         if self.action == "retrieve":
             # Для просмотра детальной информации
             # Если пользователь смотрит свой профиль или он модератор - полная информация
@@ -81,9 +150,67 @@ class UserViewSet(viewsets.ModelViewSet):
         """
         Эндпоинт для получения информации о текущем пользователе.
         """
-        serializer = UserDetailSerializer(request.user)
+        user = request.user
+        if user.get_deferred_fields():
+            # Пользователь из кеша аутентификации - без полей профиля
+            user = User.objects.get(pk=user.pk)
+        serializer = UserDetailSerializer(user)
         return Response(serializer.data)
 
+    @swagger_auto_schema(
+        tags=["Пользователи"],
+        operation_description=(
+            "Поиск пользователей по части email, имени или фамилии "
+            "(для сотрудников и модераторов)"
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                "q", openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True
+            ),
+            openapi.Parameter(
+                "limit",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_INTEGER,
+                description=f"Максимум {SEARCH_MAX_LIMIT}",
+            ),
+        ],
+        responses={200: UserSearchSerializer(many=True)},
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="search",
+        permission_classes=[permissions.IsAdminUser | IsModerator],
+    )
+    def staff_search(self, request):
+        """
+        Поиск через SEARCH_BACKEND: в PostgreSQL - по подстроке
+        с триграммными индексами, иначе - по началу строки.
+        """
+        term = request.query_params.get("q", "").strip()
+        if not term:
+            return Response(
+                {"error": "Параметр q обязателен"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(request.query_params.get("limit", 20))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response(
+                {"error": "limit должен быть положительным числом"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = min(limit, SEARCH_MAX_LIMIT)
+
+        users = get_search_backend().search(
+            User.objects.only(*UserSearchSerializer.Meta.fields),
+            USER_SEARCH_FIELDS,
+            term,
+        )
+        serializer = UserSearchSerializer(users.order_by("email")[:limit], many=True)
+        return Response({"results": serializer.data})
+
 
 class UserCreateAPIView(generics.CreateAPIView):
     """
@@ -96,11 +223,6 @@ class UserCreateAPIView(generics.CreateAPIView):
     )
     permission_classes = [permissions.AllowAny]
 
-    def perform_create(self, serializer):
-        user = serializer.save()
-        user.set_password(serializer.validated_data["password"])
-        user.save()
-
 
 class PaymentViewSet(viewsets.ModelViewSet):
     """
@@ -110,16 +232,26 @@ class PaymentViewSet(viewsets.ModelViewSet):
     - list: Получить список платежей с фильтрацией
     - retrieve: Получить детальную информацию о платеже
     - create: Создать новый платеж
+    - create-stripe-payment: Оплатить курс или урок через Stripe
+    - create-stripe-cart: Оплатить несколько курсов/уроков одной сессией Stripe
+    - stats: Выручка по дням, курсам и способам оплаты (из агрегатов)
+    - export: Потоковая выгрузка платежей в CSV/NDJSON (с фильтрами)
+
+    Пользователь видит только свои платежи, модератор - все.
+    Список отдаётся keyset-пагинацией по (payment_date, id).
 
     Фильтрация (query parameters):
     - ?ordering=payment_date (или -payment_date для DESC)
-    - ?course_id=1 - фильтр по курсу
-    - ?lesson_id=1 - фильтр по уроку
+    - ?course=1 - фильтр по курсу
+    - ?lesson=1 - фильтр по уроку
     - ?payment_method=cash|transfer - фильтр по способу оплаты
+    - ?payment_date__gte=...&payment_date__lte=... - диапазон дат
+    - ?amount__gte=...&amount__lte=... - диапазон сумм
 
     Примеры запросов:
     - GET /api/payments/?ordering=-payment_date
-    - GET /api/payments/?course_id=1&payment_method=transfer
+    - GET /api/payments/?course=1&payment_method=transfer
+    - GET /api/payments/?payment_date__gte=2026-01-01&amount__gte=1000
     """
 
     queryset = Payment.objects.all()
@@ -127,12 +259,47 @@ class PaymentViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_class = PaymentFilter
     ordering_fields = ["payment_date"]
+    pagination_class = PaymentKeysetPagination
     permission_classes = [permissions.IsAuthenticated]
+    # Задаётся для отдельных действий (создание платежей в Stripe)
+    throttle_scope = None
+
+    # Поля группировки для /stats/ и соответствующие поля агрегата
+    STATS_GROUP_FIELDS = {
+        "day": "day",
+        "course": "course_id",
+        "lesson": "lesson_id",
+        "payment_method": "payment_method",
+    }
+
+    def get_queryset(self):
+        """
+        Модератор видит все платежи, остальные - только свои.
+        """
+        queryset = super().get_queryset().select_related("user", "course", "lesson")
+
+        # Swagger строит схему без настоящего пользователя
+        if getattr(self, "swagger_fake_view", False):
+            return queryset.none()
+
+        if is_moderator(self.request.user):
+            return queryset
+
+        return queryset.filter(user=self.request.user)
 
     @swagger_auto_schema(
         tags=["Платежи"],
         operation_description="Создать платеж через Stripe и получить ссылку для оплаты",
         request_body=PaymentCreateSerializer,
+        manual_parameters=[
+            openapi.Parameter(
+                "Idempotency-Key",
+                openapi.IN_HEADER,
+                type=openapi.TYPE_STRING,
+                required=False,
+                description="Ключ для безопасного повтора запроса",
+            )
+        ],
         responses={
             201: openapi.Response(
                 description="Платеж создан, ссылка на оплату сгенерирована",
@@ -154,11 +321,20 @@ class PaymentViewSet(viewsets.ModelViewSet):
             ),
         },
     )
-    @action(detail=False, methods=["post"], url_path="create-stripe-payment")
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="create-stripe-payment",
+        throttle_scope="stripe_payments",
+    )
+    @idempotent("create-stripe-payment")
     def create_stripe_payment(self, request):
         """
         Создает платеж и сессию оплаты в Stripe.
         Возвращает ссылку для оплаты.
+
+        Поддерживает заголовок Idempotency-Key: повторный запрос с тем же
+        ключом вернёт сохранённый ответ, не создавая новый платеж.
         """
         serializer = PaymentCreateSerializer(
             data=request.data, context={"request": request}
@@ -190,11 +366,14 @@ class PaymentViewSet(viewsets.ModelViewSet):
                     if product_obj.description
                     else product_name
                 ),
+                idempotency_key=stripe_idempotency_key(request, "product"),
             )
 
             # 2. Создаем цену в Stripe
             stripe_price = create_stripe_price(
-                product_id=stripe_product.id, amount=amount
+                product_id=stripe_product.id,
+                amount=amount,
+                idempotency_key=stripe_idempotency_key(request, "price"),
             )
 
             # 3. Создаем сессию оплаты в Stripe
@@ -213,6 +392,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 success_url=success_url,
                 cancel_url=cancel_url,
                 metadata=metadata,
+                idempotency_key=stripe_idempotency_key(request, "session"),
             )
 
             # 4. Создаем запись платежа в нашей БД
@@ -241,6 +421,332 @@ class PaymentViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({"error": f"Ошибка создания платежа: {str(e)}"}, status=500)
 
+    @swagger_auto_schema(
+        tags=["Платежи"],
+        operation_description=(
+            "Оплатить несколько курсов и уроков одной сессией Stripe"
+        ),
+        request_body=CartCheckoutSerializer,
+        manual_parameters=[
+            openapi.Parameter(
+                "Idempotency-Key",
+                openapi.IN_HEADER,
+                type=openapi.TYPE_STRING,
+                required=False,
+                description="Ключ для безопасного повтора запроса",
+            )
+        ],
+        responses={
+            201: openapi.Response(
+                description="Платежи созданы, ссылка на оплату сгенерирована",
+                examples={
+                    "application/json": {
+                        "payment_ids": [1, 2, 3],
+                        "stripe_session_id": "cs_test_...",
+                        "stripe_payment_url": "https://checkout.stripe.com/pay/cs_test_...",
+                        "message": "Для оплаты перейдите по ссылке",
+                    }
+                },
+            ),
+            400: openapi.Response(description="Ошибка валидации"),
+            404: openapi.Response(
+                description="Курс или урок не найден",
+                examples={"application/json": {"error": "Курсы не найдены: [7]"}},
+            ),
+        },
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="create-stripe-cart",
+        throttle_scope="stripe_payments",
+    )
+    @idempotent("create-stripe-cart")
+    def create_stripe_cart(self, request):
+        """
+        Создает платежи за несколько курсов/уроков и одну сессию оплаты в Stripe.
+
+        Курсы и уроки загружаются двумя запросами, в Stripe уходит один запрос,
+        платежи записываются одним bulk_create - независимо от размера корзины.
+        Все платежи корзины связаны общим stripe_session_id.
+        """
+        serializer = CartCheckoutSerializer(
+            data=request.data, context={"request": request}
+        )
+
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        user = request.user
+        items = serializer.validated_data["items"]
+
+        course_ids = [item["course_id"] for item in items if item.get("course_id")]
+        lesson_ids = [item["lesson_id"] for item in items if item.get("lesson_id")]
+        courses = Course.objects.in_bulk(course_ids)
+        lessons = Lesson.objects.in_bulk(lesson_ids)
+
+        missing_courses = sorted(set(course_ids) - set(courses))
+        if missing_courses:
+            return Response(
+                {"error": f"Курсы не найдены: {missing_courses}"}, status=404
+            )
+        missing_lessons = sorted(set(lesson_ids) - set(lessons))
+        if missing_lessons:
+            return Response(
+                {"error": f"Уроки не найдены: {missing_lessons}"}, status=404
+            )
+
+        cart = []
+        for item in items:
+            if item.get("course_id"):
+                product_obj = courses[item["course_id"]]
+                product_name = f"Курс: {product_obj.title}"
+            else:
+                product_obj = lessons[item["lesson_id"]]
+                product_name = f"Урок: {product_obj.title}"
+
+            cart.append(
+                {
+                    "course": product_obj if item.get("course_id") else None,
+                    "lesson": product_obj if item.get("lesson_id") else None,
+                    "name": product_name,
+                    "description": (
+                        product_obj.description[:500]
+                        if product_obj.description
+                        else product_name
+                    ),
+                    "amount": Decimal(str(item["amount"])),
+                }
+            )
+
+        try:
+            success_url = f"{request.build_absolute_uri('/')}api/payments/success/"
+            cancel_url = f"{request.build_absolute_uri('/')}api/payments/cancel/"
+
+            metadata = {
+                "user_id": str(user.id),
+                "user_email": user.email,
+                "product_type": "cart",
+                "items_count": str(len(cart)),
+            }
+
+            stripe_session = create_stripe_cart_checkout_session(
+                items=cart,
+                success_url=success_url,
+                cancel_url=cancel_url,
+                metadata=metadata,
+                idempotency_key=stripe_idempotency_key(request, "cart-session"),
+            )
+
+            payments = Payment.objects.bulk_create(
+                [
+                    Payment(
+                        user=user,
+                        course=item["course"],
+                        lesson=item["lesson"],
+                        amount=item["amount"],
+                        payment_method="stripe",
+                        stripe_session_id=stripe_session.id,
+                        stripe_payment_status="pending",
+                        stripe_payment_url=stripe_session.url,
+                    )
+                    for item in cart
+                ]
+            )
+            # bulk_create не отправляет post_save
+            invalidate_payment_history(user.id)
+
+            return Response(
+                {
+                    "payment_ids": [payment.id for payment in payments],
+                    "stripe_session_id": stripe_session.id,
+                    "stripe_payment_url": stripe_session.url,
+                    "message": "Для оплаты перейдите по ссылке",
+                },
+                status=201,
+            )
+
+        except Exception as e:
+            return Response({"error": f"Ошибка создания платежа: {str(e)}"}, status=500)
+
+    @swagger_auto_schema(
+        tags=["Платежи"],
+        operation_description=(
+            "Выручка за период по дням, курсам, урокам и способам оплаты. "
+            "Считается по заранее собранным агрегатам, а не по таблице платежей."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                "date_from",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                description="Начало периода (по умолчанию 30 дней назад)",
+            ),
+            openapi.Parameter(
+                "date_to",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                description="Конец периода включительно (по умолчанию сегодня)",
+            ),
+            openapi.Parameter("course", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter("lesson", openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter(
+                "payment_method", openapi.IN_QUERY, type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter(
+                "group_by",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Через запятую: day, course, lesson, payment_method",
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Выручка за период",
+                examples={
+                    "application/json": {
+                        "date_from": "2026-01-01",
+                        "date_to": "2026-01-31",
+                        "total_amount": "15000.00",
+                        "payments_count": 3,
+                        "results": [
+                            {
+                                "day": "2026-01-10",
+                                "total_amount": "15000.00",
+                                "payments_count": 3,
+                            }
+                        ],
+                    }
+                },
+            ),
+            400: openapi.Response(description="Неверные параметры"),
+        },
+    )
+    @action(detail=False, methods=["get"], url_path="stats")
+    def stats(self, request):
+        """
+        Выручка за период из агрегатов PaymentRollup.
+
+        Модератор видит выручку по всем курсам, остальные - по своим
+        курсам и урокам.
+        """
+        params = request.query_params
+        today = timezone.localdate()
+        try:
+            date_to = date.fromisoformat(params.get("date_to", today.isoformat()))
+            date_from = date.fromisoformat(
+                params.get("date_from", (date_to - timedelta(days=30)).isoformat())
+            )
+        except ValueError:
+            return Response(
+                {"error": "Даты должны быть в формате YYYY-MM-DD"}, status=400
+            )
+
+        group_by = [
+            field for field in params.get("group_by", "day").split(",") if field
+        ]
+        unknown = set(group_by) - set(self.STATS_GROUP_FIELDS)
+        if unknown:
+            return Response(
+                {"error": f"Нельзя группировать по: {sorted(unknown)}"}, status=400
+            )
+
+        rollups = PaymentRollup.objects.filter(day__gte=date_from, day__lte=date_to)
+        if not is_moderator(request.user):
+            rollups = rollups.filter(
+                Q(course__owner=request.user) | Q(lesson__course__owner=request.user)
+            )
+        for field in ("course", "lesson"):
+            if params.get(field):
+                try:
+                    object_id = int(params[field])
+                except ValueError:
+                    return Response(
+                        {"error": f"{field} должен быть числом"}, status=400
+                    )
+                rollups = rollups.filter(**{field: object_id})
+        if params.get("payment_method"):
+            rollups = rollups.filter(payment_method=params["payment_method"])
+
+        values = [self.STATS_GROUP_FIELDS[field] for field in group_by]
+        rows = (
+            rollups.values(*values)
+            .annotate(
+                total_amount=Sum("total_amount"), payments_count=Sum("payments_count")
+            )
+            .order_by(*values)
+        )
+        results = [
+            {
+                **{field: row[self.STATS_GROUP_FIELDS[field]] for field in group_by},
+                "total_amount": row["total_amount"],
+                "payments_count": row["payments_count"],
+            }
+            for row in rows
+        ]
+
+        return Response(
+            {
+                "date_from": date_from,
+                "date_to": date_to,
+                "total_amount": sum(
+                    (row["total_amount"] for row in results), Decimal("0")
+                ),
+                "payments_count": sum(row["payments_count"] for row in results),
+                "results": results,
+            }
+        )
+
+    @swagger_auto_schema(
+        tags=["Платежи"],
+        operation_description=(
+            "Потоковая выгрузка платежей в CSV или NDJSON. "
+            "Поддерживает те же фильтры, что и список платежей."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                "output",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                enum=list(EXPORT_FORMATS),
+                description="Формат выгрузки (по умолчанию csv)",
+            ),
+            openapi.Parameter(
+                "gzip",
+                openapi.IN_QUERY,
+                type=openapi.TYPE_BOOLEAN,
+                description="Сжать выгрузку gzip",
+            ),
+        ],
+        responses={200: openapi.Response(description="Файл выгрузки")},
+    )
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """
+        Отдаёт выгрузку потоком: строки читаются серверным курсором пачками,
+        поэтому память не растёт с количеством платежей.
+        """
+        export_format = request.query_params.get("output", "csv")
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"Поддерживаемые форматы: {', '.join(EXPORT_FORMATS)}"},
+                status=400,
+            )
+        compress = request.query_params.get("gzip") in ("1", "true", "True")
+
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            export_stream(queryset, export_format, compress),
+            content_type=(
+                "application/gzip" if compress else EXPORT_FORMATS[export_format]
+            ),
+        )
+        filename = f"payments.{export_format}" + (".gz" if compress else "")
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
     @swagger_auto_schema(
         tags=["Платежи"],
         operation_description="Проверить статус платежа в Stripe",
@@ -281,9 +787,9 @@ class PaymentViewSet(viewsets.ModelViewSet):
 
             status_info = get_stripe_session_status(payment.stripe_session_id)
 
-            # Обновляем статус в нашей БД
-            payment.stripe_payment_status = status_info["status"]
-            payment.save()
+            # Обновляем статус в нашей БД - для всех платежей этой сессии,
+            # т.к. корзина оплачивается одной сессией Stripe
+            update_session_status(payment.stripe_session_id, status_info["status"])
 
             return Response(
                 {
@@ -295,3 +801,192 @@ class PaymentViewSet(viewsets.ModelViewSet):
 
         except Exception as e:
             return Response({"error": f"Ошибка проверки статуса: {str(e)}"}, status=500)
+
+
+# Запас на заголовки частей multipart и поля формы сверх размера файла
+MULTIPART_OVERHEAD = 64 * 2**10
+
+
+class UploadViewSet(viewsets.GenericViewSet):
+    """
+    Загрузка превью курсов и уроков и аватаров без чтения файла в память.
+
+    - POST multipart (target, object_id, file) - файл целиком, 202;
+    - POST JSON (target, object_id, filename, size) - начать загрузку
+      частями (для больших превью уроков), 201;
+    - PATCH /{id}/ с заголовком Upload-Offset - следующая часть файла
+      в теле запроса (application/offset+octet-stream);
+    - GET /{id}/ - статус и принятое смещение, с которого продолжать
+      после обрыва.
+
+    Принятый файл сохраняет в объект задача process_upload.
+    """
+
+    serializer_class = UploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [JSONParser, MultiPartParser]
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Upload.objects.none()
+        return Upload.objects.filter(user=self.request.user)
+
+    @swagger_auto_schema(tags=["Загрузки"])
+    def retrieve(self, request, pk=None):
+        return Response(self.get_serializer(self.get_object()).data)
+
+    @swagger_auto_schema(
+        tags=["Загрузки"],
+        operation_description=(
+            "multipart с полем file - файл целиком; JSON с size - загрузка "
+            "частями через PATCH"
+        ),
+    )
+    def create(self, request):
+        if request.content_type.startswith("multipart/"):
+            return self.create_from_file(request)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.save(user=request.user)
+        staging_path(upload.pk).touch()
+        return Response(
+            self.get_serializer(upload).data,
+            status=status.HTTP_201_CREATED,
+            headers={"Upload-Offset": "0"},
+        )
+
+    def create_from_file(self, request):
+        """
+        Файл из multipart: слишком большой запрос отклоняется по
+        Content-Length до чтения тела, остальное пишется во временный файл
+        частями с проверкой заголовка изображения.
+        """
+        content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        if content_length > settings.IMAGE_UPLOAD_MAX_SIZE + MULTIPART_OVERHEAD:
+            return Response(
+                {"error": f"Файл больше {settings.IMAGE_UPLOAD_MAX_SIZE // 2**20} МБ"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        handler = ImageUploadHandler(request._request)
+        request._request.upload_handlers = [handler]
+        file = request.FILES.get("file")
+        if handler.error or file is None:
+            return Response(
+                {"file": [handler.error or "Файл не передан"]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = self.get_serializer(
+            data={
+                "target": request.data.get("target"),
+                "object_id": request.data.get("object_id") or None,
+                "filename": file.name,
+                "size": file.size,
+            }
+        )
+        serializer.is_valid(raise_exception=True)
+        info = file.image_info
+        upload = serializer.save(
+            user=request.user,
+            offset=file.size,
+            format=info.format,
+            width=info.width,
+            height=info.height,
+            status=Upload.STATUS_PROCESSING,
+        )
+        # Временный файл переносится без копирования (тот же том)
+        file_move_safe(file.temporary_file_path(), staging_path(upload.pk))
+        transaction.on_commit(lambda: process_upload.delay(str(upload.pk)))
+        return Response(
+            self.get_serializer(upload).data, status=status.HTTP_202_ACCEPTED
+        )
+
+    @swagger_auto_schema(
+        tags=["Загрузки"],
+        operation_description="Следующая часть файла в теле запроса",
+        manual_parameters=[
+            openapi.Parameter(
+                "Upload-Offset",
+                openapi.IN_HEADER,
+                type=openapi.TYPE_INTEGER,
+                required=True,
+                description="Смещение части, равное принятому (offset)",
+            )
+        ],
+        request_body=no_body,
+    )
+    def partial_update(self, request, pk=None):
+        """
+        Дописывает часть файла. Заголовок изображения проверяется, как
+        только получено достаточно байт; последняя часть отдаёт файл
+        на обработку.
+        """
+        upload = self.get_object()
+        try:
+            offset = int(request.headers["Upload-Offset"])
+        except (KeyError, ValueError):
+            return Response(
+                {"error": "Нужен заголовок Upload-Offset"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+        if not length:
+            return Response(
+                {"error": "Пустая часть"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            # Блокировка строки на время записи: параллельный запрос с тем
+            # же смещением ждёт и получает 409, а не пишет в файл поверх
+            upload = Upload.objects.select_for_update().get(pk=upload.pk)
+            if upload.status != Upload.STATUS_UPLOADING:
+                return Response(
+                    {"error": "Загрузка уже завершена"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            if offset != upload.offset:
+                return Response(
+                    {
+                        "error": "Смещение не совпадает с принятым",
+                        "offset": upload.offset,
+                    },
+                    status=status.HTTP_409_CONFLICT,
+                    headers={"Upload-Offset": str(upload.offset)},
+                )
+            if (
+                length > settings.IMAGE_UPLOAD_CHUNK_MAX_SIZE
+                or offset + length > upload.size
+            ):
+                return Response(
+                    {"error": "Часть больше допустимой или выходит за размер файла"},
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )
+
+            path = staging_path(upload.pk)
+            received = offset + write_chunk(path, request.stream, offset, length)
+            complete = received == upload.size
+            changes = {"offset": received, "updated_at": timezone.now()}
+            if not upload.format:
+                try:
+                    info = read_file_header(path, received, complete)
+                except UploadRejected as e:
+                    Upload.objects.filter(pk=upload.pk).update(
+                        status=Upload.STATUS_FAILED, error=str(e), **changes
+                    )
+                    remove_staged(upload.pk)
+                    return Response(
+                        {"error": str(e)}, status=status.HTTP_400_BAD_REQUEST
+                    )
+                if info is not None:
+                    changes.update(info._asdict())
+            if complete:
+                changes["status"] = Upload.STATUS_PROCESSING
+                transaction.on_commit(lambda: process_upload.delay(str(upload.pk)))
+            Upload.objects.filter(pk=upload.pk).update(**changes)
+
+        upload.refresh_from_db()
+        return Response(
+            self.get_serializer(upload).data, headers={"Upload-Offset": str(received)}
+        )
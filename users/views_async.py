@@ -0,0 +1,109 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import aauthenticate
+from django.contrib.auth.models import update_last_login
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.exceptions import Throttled
+from rest_framework_simplejwt.settings import api_settings
+
+from services.async_views import AsyncAPIView
+from services.throttling import throttle_wait
+
+from .authentication import CachedJWTAuthentication
+from .hashing import amake_password
+from .models import User
+from .payment_history import load_payment_history
+from .serializers import UserDetailSerializer
+
+
+class AsyncTokenObtainPairView(AsyncAPIView):
+    """
+    Выдача пары JWT-токенов (аналог TokenObtainPairView).
+    Пароль проверяется в пуле хеширования через PooledModelBackend.
+    """
+
+    throttle_scope = "login"
+
+    async def post(self, request):
+        wait = await sync_to_async(throttle_wait)(self.throttle_scope, request)
+        if wait:
+            raise Throttled(wait)
+
+        data = self.read_data(request)
+        if data is None:
+            return JsonResponse(
+                {"detail": "Некорректное тело запроса."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        user = await aauthenticate(
+            request,
+            **{
+                User.USERNAME_FIELD: data.get(User.USERNAME_FIELD),
+                "password": data.get("password"),
+            },
+        )
+        if user is None:
+            return JsonResponse(
+                {"detail": "No active account found with the given credentials"},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        # get_token может обратиться к группам (AUTH_STATELESS_ROLES)
+        token_serializer = import_string(api_settings.TOKEN_OBTAIN_SERIALIZER)
+        refresh = await sync_to_async(token_serializer.get_token)(user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            await sync_to_async(update_last_login)(None, user)
+
+        return JsonResponse(
+            {"refresh": str(refresh), "access": str(refresh.access_token)}
+        )
+
+
+class AsyncRegisterView(AsyncAPIView):
+    """
+    Регистрация пользователя (аналог UserCreateAPIView): хеш пароля
+    считается в пуле, пользователь создаётся одним INSERT.
+    """
+
+    async def post(self, request):
+        data = self.read_data(request)
+        if data is None:
+            return JsonResponse(
+                {"detail": "Некорректное тело запроса."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = UserDetailSerializer(data=data)
+        # Проверка уникальности email обращается к БД
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        validated_data = dict(serializer.validated_data)
+        validated_data["password"] = await amake_password(validated_data["password"])
+        user = await User.objects.acreate(**validated_data)
+
+        # У нового пользователя платежей нет - без запроса к БД
+        response_serializer = UserDetailSerializer(user)
+        response_serializer.payment_history = {user.pk: []}
+        return JsonResponse(response_serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AsyncMeView(AsyncAPIView):
+    """
+    Профиль текущего пользователя (аналог /users/me/).
+    """
+
+    authentication_classes = (CachedJWTAuthentication,)
+
+    async def get(self, request):
+        user = request.user
+        if user.get_deferred_fields():
+            # Пользователь из кеша аутентификации - без полей профиля
+            user = await User.objects.aget(pk=user.pk)
+        serializer = UserDetailSerializer(user)
+        serializer.payment_history = await sync_to_async(load_payment_history)(
+            [user.pk]
+        )
+        return JsonResponse(serializer.data)